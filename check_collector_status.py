@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """Check collector thread status in detail"""
 import sys
+import threading
 sys.path.insert(0, '/usr/lib/python3/dist-packages')
 
 import odoo
@@ -33,18 +34,19 @@ with registry.cursor() as cr:
         print(f"   Running: {collector.running}")
         print(f"   DB Name: {collector.dbname}")
         print(f"   User ID: {collector.uid}")
-        print(f"   Devices tracked: {len(collector._clients)}")
+        print(f"   Devices tracked: {len(collector._collectors)}")
         
-        # Check thread
-        if hasattr(collector, '_collection_thread'):
-            thread = collector._collection_thread
-            if thread:
-                print(f"\n🧵 Thread Info:")
-                print(f"   Alive: {thread.is_alive()}")
-                print(f"   Daemon: {thread.daemon}")
-                print(f"   Name: {thread.name}")
-            else:
-                print(f"\n❌ No collection thread exists!")
+        # Check the shared event loop thread (collector.pool)
+        thread = next(
+            (t for t in threading.enumerate() if t.name == "mikrotik-routeros-loop"), None
+        )
+        if thread:
+            print(f"\n🧵 Thread Info:")
+            print(f"   Alive: {thread.is_alive()}")
+            print(f"   Daemon: {thread.daemon}")
+            print(f"   Name: {thread.name}")
+        else:
+            print(f"\n❌ No collector loop thread exists!")
         
         # Check devices
         Device = env['mikrotik.device']
@@ -58,10 +60,10 @@ with registry.cursor() as cr:
             print(f"   Tier: {device.collection_tier}")
             
             # Check if in collector clients
-            if device.id in collector._clients:
-                print(f"   ✅ Device in collector._clients")
+            if device.id in collector._collectors:
+                print(f"   ✅ Device in collector._collectors")
             else:
-                print(f"   ❌ Device NOT in collector._clients!")
+                print(f"   ❌ Device NOT in collector._collectors!")
     else:
         print("\n❌ Collector is still None after start attempt!")
         print("   Check if collector module is loaded correctly.")
@@ -2,6 +2,7 @@
 """Check if collector thread is alive"""
 import sys
 import threading
+import time
 sys.path.insert(0, '/usr/lib/python3/dist-packages')
 
 import odoo
@@ -32,13 +33,12 @@ with registry.cursor() as cr:
         # Check collector internals
         print(f"\n📊 Collectors registered: {len(collector._collectors)}")
         
-        if len(collector._collectors) > 0:
-            # Manually trigger collection
-            print(f"\n🔨 Manually triggering collection...")
-            try:
-                collector._collect_all(env)
-                print(f"   ✅ Collection triggered successfully!")
-            except Exception as e:
-                print(f"   ❌ Error: {e}")
-                import traceback
-                traceback.print_exc()
+        for device_id, device_collector in list(collector._collectors.items()):
+            print(f"   Device {device_id}: next poll in "
+                  f"{device_collector.next_run() - time.monotonic():.1f}s, "
+                  f"last error: {device_collector.last_error}")
+        
+        # Devices poll on their own schedule; reloading picks up new ones now
+        print(f"\n🔨 Reloading collector configuration...")
+        collector.reload_configuration()
+        print(f"   ✅ Reload requested!")
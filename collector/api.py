@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""Non-blocking RouterOS API client (asyncio).
+
+Speaks the binary API protocol on 8728 (plain) and 8729 (TLS) directly
+over asyncio streams, so one event loop can poll hundreds of routers
+without a thread per connection.
+"""
+
+import asyncio
+import binascii
+import hashlib
+import logging
+import ssl
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8728
+DEFAULT_SSL_PORT = 8729
+
+
+class RouterOSError(Exception):
+    """Error reply (!trap / !fatal) or protocol failure."""
+
+
+class RouterOSConnectionError(RouterOSError):
+    """Session is unusable (!fatal or not connected); a !trap is not."""
+
+
+# Errors leaving the API session unusable (EOFError: connection closed
+# mid-reply); any other RouterOSError is a !trap and fails only its call
+TRANSPORT_ERRORS = (OSError, EOFError, asyncio.TimeoutError, RouterOSConnectionError)
+
+
+def resolve_port(port, use_ssl=False):
+    """Return port, or the default API port of the transport when unset (0 / None)."""
+    return port or (DEFAULT_SSL_PORT if use_ssl else DEFAULT_PORT)
+
+
+def _encode_length(length):
+    if length < 0x80:
+        return bytes((length,))
+    if length < 0x4000:
+        return (length | 0x8000).to_bytes(2, "big")
+    if length < 0x200000:
+        return (length | 0xC00000).to_bytes(3, "big")
+    if length < 0x10000000:
+        return (length | 0xE0000000).to_bytes(4, "big")
+    return b"\xf0" + length.to_bytes(4, "big")
+
+
+def _encode_sentence(words):
+    data = bytearray()
+    for word in words:
+        raw = word.encode("utf-8")
+        data += _encode_length(len(raw)) + raw
+    data += b"\x00"
+    return bytes(data)
+
+
+def _ssl_context():
+    """TLS context accepting the self-signed / anonymous setups RouterOS ships with."""
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    try:
+        # api-ssl without a certificate only offers anonymous DH
+        context.set_ciphers("DEFAULT:ADH:@SECLEVEL=0")
+    except ssl.SSLError:
+        pass
+    return context
+
+
+class RouterOSClient:
+    """One authenticated API session.
+
+    Commands are serialized per connection (no tagging); use one client
+    per device.
+    """
+
+    def __init__(self, host, username, password, port=None, use_ssl=False, timeout=10):
+        self.host = host
+        self.username = username or ""
+        self.password = password or ""
+        self.use_ssl = use_ssl
+        self.port = resolve_port(port, use_ssl)
+        self.timeout = timeout
+        self._reader = None
+        self._writer = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def connected(self):
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def connect(self):
+        """Open the connection and log in.
+
+        Raises:
+            RouterOSError: on rejected login
+            OSError / asyncio.TimeoutError: on network failures
+        """
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(
+                self.host,
+                self.port,
+                ssl=_ssl_context() if self.use_ssl else None,
+            ),
+            self.timeout,
+        )
+        try:
+            await self._login()
+        except BaseException:
+            await self.close()
+            raise
+        return True
+
+    async def _login(self):
+        reply = await self._talk(["/login", f"=name={self.username}", f"=password={self.password}"])
+        challenge = reply[0].get("ret") if reply else None
+        if challenge:
+            # RouterOS < 6.43: MD5 challenge-response
+            digest = hashlib.md5(
+                b"\x00" + self.password.encode("utf-8") + binascii.unhexlify(challenge)
+            ).hexdigest()
+            await self._talk(["/login", f"=name={self.username}", f"=response=00{digest}"])
+
+    async def close(self):
+        writer, self._reader, self._writer = self._writer, None, None
+        if writer is None:
+            return
+        writer.close()
+        try:
+            await asyncio.wait_for(writer.wait_closed(), 2)
+        except (OSError, asyncio.TimeoutError, ssl.SSLError):
+            pass
+
+    async def call(self, command, attrs=None, queries=None):
+        """Run an API command and return its !re replies.
+
+        Args:
+            command: API path, e.g. "/interface/print"
+            attrs: dict of attribute words (=key=value)
+            queries: list of raw query words, e.g. ["?type=ether"]
+
+        Returns:
+            list of dicts, one per !re sentence
+        """
+        words = [command]
+        words += [f"={key}={value}" for key, value in (attrs or {}).items()]
+        words += list(queries or [])
+        try:
+            return await asyncio.wait_for(self._talk(words), self.timeout)
+        except asyncio.TimeoutError:
+            # Reply may still arrive; the stream is out of sync now
+            await self.close()
+            raise
+
+    async def _talk(self, words):
+        async with self._lock:
+            # Checked under the lock: a concurrent call may have closed
+            # the session while this one was waiting
+            if not self.connected:
+                raise RouterOSConnectionError("not connected")
+            self._writer.write(_encode_sentence(words))
+            await self._writer.drain()
+
+            replies = []
+            error = None
+            while True:
+                sentence = await self._read_sentence()
+                kind, attrs = sentence[0], self._parse_attrs(sentence[1:])
+                if kind == "!re":
+                    replies.append(attrs)
+                elif kind == "!trap":
+                    error = attrs.get("message", "command failed")
+                elif kind == "!fatal":
+                    await self.close()
+                    raise RouterOSConnectionError(sentence[1] if len(sentence) > 1 else "fatal")
+                elif kind == "!done":
+                    if attrs:
+                        # Login challenge and other data returned on !done
+                        replies.append(attrs)
+                    break
+            if error:
+                raise RouterOSError(error)
+            return replies
+
+    @staticmethod
+    def _parse_attrs(words):
+        attrs = {}
+        for word in words:
+            if word.startswith("="):
+                key, _sep, value = word[1:].partition("=")
+                attrs[key] = value
+        return attrs
+
+    async def _read_sentence(self):
+        words = []
+        while True:
+            length = await self._read_length()
+            if not length:
+                return words
+            data = await self._reader.readexactly(length)
+            words.append(data.decode("utf-8", errors="replace"))
+
+    async def _read_length(self):
+        first = (await self._reader.readexactly(1))[0]
+        if first < 0x80:
+            return first
+        if first < 0xC0:
+            extra, value = 1, first & 0x3F
+        elif first < 0xE0:
+            extra, value = 2, first & 0x1F
+        elif first < 0xF0:
+            extra, value = 3, first & 0x0F
+        else:
+            extra, value = 4, 0
+        for byte in await self._reader.readexactly(extra):
+            value = (value << 8) | byte
+        return value
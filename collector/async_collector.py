@@ -0,0 +1,525 @@
+# -*- coding: utf-8 -*-
+"""In-process asyncio collector.
+
+Runs on the shared event loop of collector.pool with a polling task per
+device. Every poll holds a slot of a shared semaphore (concurrency cap)
+and each of its tiers is bounded by the device timeout, so a slow or dead
+router only delays itself and a failing tier does not cost the others
+their results. RouterOS I/O is non-blocking and goes through the pooled
+sessions (kept alive, reconnected with backoff); the blocking database
+writes are batched across devices and run in a worker thread, one
+transaction per flush.
+
+Tunables (ir.config_parameter, re-read on every configuration reload):
+- mikrotik_monitoring.collector_concurrency: parallel polls (default 50)
+- mikrotik_monitoring.collector_device_timeout: seconds per tier (default 10)
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from datetime import datetime
+
+from psycopg2.extensions import TransactionRollbackError
+
+import odoo
+from odoo import api, SUPERUSER_ID
+
+from ..models.mikrotik_session import MikrotikSession
+from .api import TRANSPORT_ERRORS, RouterOSConnectionError, RouterOSError
+from .pool import PoolBackoff, get_loop, get_pool
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 50
+DEFAULT_DEVICE_TIMEOUT = 10
+# Seconds between device configuration reloads (writes trigger one early)
+CONFIG_RELOAD_INTERVAL = 30
+# Seconds results are gathered before one database flush
+FLUSH_INTERVAL = 1.0
+# Attempts per flush when it loses a concurrency race (serialization failure)
+STORE_ATTEMPTS = 3
+
+TIERS = ("realtime", "short", "medium")
+CONFIG_FIELDS = [
+    "device_uid", "host", "api_port", "username", "password", "use_ssl",
+    "realtime_interval", "short_interval", "medium_interval",
+]
+PPP_SESSION_TYPES = ("pppoe", "pptp", "l2tp", "sstp", "ovpn")
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class DeviceCollector:
+    """Polling state of one device: tier schedule and counters."""
+
+    def __init__(self, device_id, config, timeout=DEFAULT_DEVICE_TIMEOUT):
+        self.device_id = device_id
+        self.config = config
+        self.timeout = timeout
+        self.client = None
+        self.last_error = None
+        # Spread the first polls so devices do not fire in lockstep
+        offset = time.monotonic() + random.uniform(0, self.intervals["realtime"])
+        self._next = dict.fromkeys(TIERS, offset)
+        # interface name -> (monotonic ts, rx bytes, tx bytes)
+        self._counters = {}
+
+    @property
+    def connected(self):
+        return self.client is not None and self.client.connected
+
+    @property
+    def intervals(self):
+        return {
+            "realtime": max(self.config["realtime_interval"] or 5, 1),
+            "short": max(self.config["short_interval"] or 60, 1),
+            "medium": max(self.config["medium_interval"] or 300, 1),
+        }
+
+    async def connect(self):
+        """Take the pooled session of the device, logging in if needed."""
+        self.client = await get_pool().acquire(
+            self.device_id,
+            self.config["host"],
+            self.config["username"],
+            self.config["password"],
+            port=self.config["api_port"] or None,
+            use_ssl=self.config["use_ssl"],
+            timeout=self.timeout,
+        )
+        return True
+
+    async def disconnect(self, error=None):
+        """Drop the pooled session; with an error the device backs off."""
+        self.client = None
+        await get_pool().discard(self.device_id, error)
+
+    def next_run(self):
+        return min(self._next.values())
+
+    def due_tiers(self, now):
+        return [tier for tier in TIERS if self._next[tier] <= now]
+
+    def reschedule(self, tiers, now, failed=False):
+        """Advance the schedule of the polled tiers.
+
+        Successful tiers keep their cadence (next = previous + interval)
+        unless they fell behind; failed ones retry at the realtime pace.
+        """
+        intervals = self.intervals
+        for tier in tiers:
+            if failed:
+                self._next[tier] = now + min(intervals[tier], intervals["realtime"])
+                continue
+            nxt = self._next[tier] + intervals[tier]
+            self._next[tier] = nxt if nxt > now else now + intervals[tier]
+
+    def log_error(self, scope, error):
+        """Log a failure once until it changes or a poll succeeds."""
+        error = f"{scope}: {str(error) or type(error).__name__}"
+        if error != self.last_error:
+            _logger.warning("Collection from %s failed: %s", self.config["host"], error)
+        self.last_error = error
+
+    async def collect(self, tiers, now):
+        """Poll the given tiers, each under its own timeout.
+
+        A !trap fails only its tier and keeps the session; a transport
+        error (connection lost, timeout, !fatal) drops the pooled session
+        and fails the tiers not polled yet. Results of the tiers that
+        succeeded are returned either way.
+
+        Raises:
+            PoolBackoff, RouterOSError, OSError, asyncio.TimeoutError:
+                the session could not be opened (all tiers failed)
+
+        Returns:
+            tuple (result for the writer or None, list of failed tiers)
+        """
+        await asyncio.wait_for(self.connect(), self.timeout)
+
+        result = {
+            "device_id": self.device_id,
+            "device_uid": self.config["device_uid"],
+            "ts": time.time(),
+            "metrics": {},
+        }
+        shared = {}
+        failed = []
+        for tier in tiers:
+            if not self.connected:
+                failed.append(tier)
+                continue
+            try:
+                await asyncio.wait_for(self._collect_tier(tier, now, result, shared), self.timeout)
+            except TRANSPORT_ERRORS as e:
+                self.log_error(tier, e)
+                failed.append(tier)
+                await self.disconnect(e)
+            except RouterOSError as e:
+                self.log_error(tier, e)
+                failed.append(tier)
+        if len(failed) == len(tiers):
+            return None, failed
+        if not failed:
+            self.last_error = None
+        return result, failed
+
+    async def _collect_tier(self, tier, now, result, shared):
+        """Add the data of one tier to result; shared caches the interface list."""
+        if tier == "realtime":
+            result["metrics"].update(
+                await self.collect_realtime(now, await self._interfaces(shared))
+            )
+        elif tier == "short":
+            short = await self.collect_short(now)
+            result["metrics"].update(short.pop("metrics"))
+            result.update(short)
+        elif tier == "medium":
+            result["interfaces"] = [
+                {
+                    "name": iface.get("name"),
+                    "type": iface.get("type", ""),
+                    "is_enabled": iface.get("disabled") != "true",
+                    "is_running": iface.get("running") == "true",
+                    "mac_address": iface.get("mac-address"),
+                    "mtu": iface.get("mtu"),
+                }
+                for iface in await self._interfaces(shared)
+            ]
+
+    async def _interfaces(self, shared):
+        if "interfaces" not in shared:
+            shared["interfaces"] = await self.client.call("/interface/print")
+        return shared["interfaces"]
+
+    async def collect_realtime(self, now, interfaces=None):
+        """System resources and interface rates."""
+        rows = await self.client.call("/system/resource/print")
+        resource = rows[0] if rows else {}
+        metrics = {}
+
+        cpu = _to_float(resource.get("cpu-load"))
+        if cpu is not None:
+            metrics["system.cpu.load_pct"] = cpu
+        free_mem = _to_float(resource.get("free-memory"))
+        total_mem = _to_float(resource.get("total-memory"))
+        if free_mem is not None and total_mem:
+            metrics["system.memory.free_bytes"] = free_mem
+            metrics["system.memory.total_bytes"] = total_mem
+            metrics["system.memory.used_pct"] = round((1 - free_mem / total_mem) * 100, 2)
+        free_hdd = _to_float(resource.get("free-hdd-space"))
+        total_hdd = _to_float(resource.get("total-hdd-space"))
+        if free_hdd is not None and total_hdd:
+            metrics["system.disk.used_pct"] = round((1 - free_hdd / total_hdd) * 100, 2)
+        if resource.get("uptime"):
+            metrics["system.uptime_seconds"] = MikrotikSession._parse_uptime(resource["uptime"])
+
+        if interfaces is None:
+            interfaces = await self.client.call("/interface/print")
+        for iface in interfaces:
+            name = iface.get("name")
+            rx, tx = _to_float(iface.get("rx-byte")), _to_float(iface.get("tx-byte"))
+            if not name or rx is None or tx is None:
+                continue
+            prev = self._counters.get(name)
+            self._counters[name] = (now, rx, tx)
+            if not prev or now <= prev[0]:
+                continue
+            elapsed = now - prev[0]
+            # Counter lower than last time: reset, wait for the next sample
+            if rx >= prev[1]:
+                metrics[f"iface.{name}.rx_bps"] = round((rx - prev[1]) * 8 / elapsed, 2)
+            if tx >= prev[2]:
+                metrics[f"iface.{name}.tx_bps"] = round((tx - prev[2]) * 8 / elapsed, 2)
+        return metrics
+
+    async def collect_short(self, now):
+        """DHCP leases and PPP / hotspot sessions."""
+        leases = await self.client.call("/ip/dhcp-server/lease/print")
+        sessions = {session_type: [] for session_type in PPP_SESSION_TYPES}
+        for session in await self.client.call("/ppp/active/print"):
+            if session.get("service") in sessions:
+                sessions[session["service"]].append(session)
+        try:
+            sessions["hotspot"] = await self.client.call("/ip/hotspot/active/print")
+        except RouterOSConnectionError:
+            raise
+        except RouterOSError:
+            # Hotspot not configured on this router
+            pass
+
+        metrics = {
+            "dhcp.total_leases": len(leases),
+            "dhcp.active_leases": sum(1 for lease in leases if lease.get("status") == "bound"),
+            "ppp.active_sessions": sum(len(sessions[t]) for t in PPP_SESSION_TYPES),
+        }
+        if "hotspot" in sessions:
+            metrics["hotspot.active_users"] = len(sessions["hotspot"])
+        return {"metrics": metrics, "leases": leases, "sessions": sessions}
+
+
+class AsyncCollectorService:
+    """Background thread running the collector event loop for one database."""
+
+    def __init__(self, dbname, uid=SUPERUSER_ID):
+        self.dbname = dbname
+        self.uid = uid
+        self.running = False
+        self._collectors = {}
+        self._tasks = {}
+        self._future = None
+        self._loop = None
+        self._wake = None
+        self._queue = None
+        self._semaphore = None
+        self._concurrency = None
+        self._timeout = DEFAULT_DEVICE_TIMEOUT
+
+    # -------------------------------------------------------------------------
+    # THREAD CONTROL (called from Odoo workers)
+    # -------------------------------------------------------------------------
+    def start(self):
+        self.running = True
+        self._future = asyncio.run_coroutine_threadsafe(self._main(), get_loop())
+        self._future.add_done_callback(self._finished)
+
+    def stop(self, timeout=15):
+        self.running = False
+        self._call_soon(self._wake.set if self._wake else None)
+        if self._future is not None:
+            try:
+                self._future.result(timeout)
+            except Exception:
+                pass
+
+    def reload_configuration(self):
+        """Re-read device configuration now instead of at the next reload."""
+        self._call_soon(self._wake.set if self._wake else None)
+
+    def refresh_client(self, device_id):
+        """Drop the pooled session of a device; the next poll reconnects."""
+        self._call_soon(lambda: self._loop.create_task(get_pool().invalidate(device_id)))
+
+    def _call_soon(self, callback):
+        if callback and self._loop and not self._loop.is_closed():
+            try:
+                self._loop.call_soon_threadsafe(callback)
+            except RuntimeError:
+                # Loop closed meanwhile
+                pass
+
+    def _finished(self, future):
+        self.running = False
+        if not future.cancelled() and future.exception():
+            _logger.error(
+                "MikroTik collector stopped unexpectedly",
+                exc_info=future.exception(),
+            )
+
+    # -------------------------------------------------------------------------
+    # EVENT LOOP
+    # -------------------------------------------------------------------------
+    async def _main(self):
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._queue = asyncio.Queue()
+        writer = asyncio.create_task(self._writer())
+        _logger.info("MikroTik collector started for %s", self.dbname)
+        try:
+            while self.running:
+                try:
+                    settings, configs = await self._loop.run_in_executor(None, self._load_configs)
+                except Exception:
+                    _logger.exception("Could not load collector configuration")
+                else:
+                    await self._apply_configs(settings, configs)
+                try:
+                    await asyncio.wait_for(self._wake.wait(), CONFIG_RELOAD_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+        finally:
+            for device_id in list(self._collectors):
+                await self._drop(device_id)
+            # Flush what is queued, then stop the writer
+            self._queue.put_nowait(None)
+            await writer
+            _logger.info("MikroTik collector stopped for %s", self.dbname)
+
+    async def _apply_configs(self, settings, configs):
+        self._timeout = settings["timeout"]
+        if settings["concurrency"] != self._concurrency:
+            # Polls already holding a slot finish on the old semaphore
+            self._concurrency = settings["concurrency"]
+            self._semaphore = asyncio.Semaphore(self._concurrency)
+
+        for device_id in set(self._collectors) - set(configs):
+            await self._drop(device_id)
+        for device_id, config in configs.items():
+            current = self._collectors.get(device_id)
+            if current is not None:
+                if current.config == config:
+                    current.timeout = self._timeout
+                    continue
+                await self._drop(device_id)
+            collector = DeviceCollector(device_id, config, self._timeout)
+            self._collectors[device_id] = collector
+            self._tasks[device_id] = asyncio.create_task(self._poll_device(collector))
+
+    async def _drop(self, device_id):
+        collector = self._collectors.pop(device_id, None)
+        task = self._tasks.pop(device_id, None)
+        if task:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        if collector:
+            await get_pool().invalidate(device_id)
+
+    async def _poll_device(self, collector):
+        """Poll one device on its own schedule until cancelled."""
+        while True:
+            delay = collector.next_run() - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            now = time.monotonic()
+            tiers = collector.due_tiers(now)
+            if not tiers:
+                continue
+            async with self._semaphore:
+                try:
+                    result, failed = await collector.collect(tiers, now)
+                except asyncio.CancelledError:
+                    raise
+                except PoolBackoff:
+                    # Waiting out the reconnect backoff; already logged
+                    collector.reschedule(tiers, now, failed=True)
+                    continue
+                except Exception as e:
+                    collector.log_error("connect", e)
+                    await collector.disconnect(e)
+                    collector.reschedule(tiers, now, failed=True)
+                    continue
+            collector.reschedule([tier for tier in tiers if tier not in failed], now)
+            collector.reschedule(failed, now, failed=True)
+            if result is not None:
+                self._queue.put_nowait(result)
+
+    async def _writer(self):
+        """Flush poll results to the database in batches."""
+        while True:
+            batch = [await self._queue.get()]
+            if batch[0] is not None:
+                await asyncio.sleep(FLUSH_INTERVAL)
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            results = [result for result in batch if result is not None]
+            if results:
+                try:
+                    await self._loop.run_in_executor(None, self._store, results)
+                except Exception:
+                    _logger.exception("Could not store collector results")
+            if len(results) < len(batch):
+                return
+
+    # -------------------------------------------------------------------------
+    # DATABASE (worker threads)
+    # -------------------------------------------------------------------------
+    def _load_configs(self):
+        with odoo.registry(self.dbname).cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            params = env["ir.config_parameter"]
+            settings = {
+                "concurrency": max(int(params.get_param(
+                    "mikrotik_monitoring.collector_concurrency", DEFAULT_CONCURRENCY
+                )), 1),
+                "timeout": float(params.get_param(
+                    "mikrotik_monitoring.collector_device_timeout", DEFAULT_DEVICE_TIMEOUT
+                )),
+            }
+            devices = env["mikrotik.device"].search_read(
+                [("collection_enabled", "=", True)], CONFIG_FIELDS
+            )
+        configs = {
+            device.pop("id"): device
+            for device in devices
+            if device["host"] and device["device_uid"]
+        }
+        return settings, configs
+
+    def _store(self, results):
+        """Write a batch of poll results, retrying it on concurrency failures."""
+        for attempt in range(1, STORE_ATTEMPTS + 1):
+            try:
+                return self._store_batch(results)
+            except TransactionRollbackError as e:
+                if attempt == STORE_ATTEMPTS:
+                    raise
+                _logger.info("Collector flush hit a concurrency failure, retrying: %s", e)
+                time.sleep(random.uniform(0.1, 0.5) * attempt)
+
+    def _store_batch(self, results):
+        """Write a batch of poll results in one transaction."""
+        with odoo.registry(self.dbname).cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            devices_data = [
+                {"device_uid": r["device_uid"], "ts": r["ts"], "metrics": r["metrics"]}
+                for r in results
+                if r["metrics"]
+            ]
+            if devices_data:
+                ingested = env["mikrotik.ingest"].ingest_metrics(devices_data)
+                env["mikrotik.live.subscription"].publish_updates(ingested["devices"])
+
+            for r in results:
+                try:
+                    with cr.savepoint():
+                        if r.get("interfaces") is not None:
+                            env["mikrotik.interface"].sync_from_router(r["device_id"], r["interfaces"])
+                        if r.get("leases") is not None:
+                            env["mikrotik.lease"].sync_leases(r["device_id"], r["leases"])
+                        for session_type, sessions in (r.get("sessions") or {}).items():
+                            env["mikrotik.session"].sync_sessions(
+                                r["device_id"], session_type, sessions,
+                                ts=datetime.utcfromtimestamp(r["ts"]),
+                            )
+                except Exception:
+                    _logger.exception("Could not sync inventory of device %s", r["device_id"])
+
+
+# -----------------------------------------------------------------------------
+# SERVICE SINGLETON
+# -----------------------------------------------------------------------------
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_collector():
+    """Return the collector service of this process, if any."""
+    return _service
+
+
+def start_collector(dbname, uid=SUPERUSER_ID):
+    """Start the collector for dbname unless one is already running."""
+    global _service
+    with _service_lock:
+        if _service is not None and _service.running:
+            return _service
+        _service = AsyncCollectorService(dbname, uid)
+        _service.start()
+        return _service
+
+
+def stop_collector():
+    """Stop the collector of this process."""
+    with _service_lock:
+        if _service is not None:
+            _service.stop()
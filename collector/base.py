@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""Blocking facade over the pooled RouterOS sessions.
+
+For one-off calls from Odoo workers and the helper scripts (connection
+test, capability refresh). Calls run on the shared loop of
+collector.pool, so they reuse the logged-in session of the collector
+for the same device instead of opening a new one.
+"""
+
+import logging
+
+from .api import TRANSPORT_ERRORS, resolve_port
+from .pool import get_pool, run_sync
+
+_logger = logging.getLogger(__name__)
+
+
+class MikroTikCollector:
+    """Synchronous access to the pooled session of one router.
+
+    Pass device_id to share the session with the collector; without it
+    the session is pooled per host, port and username.
+    """
+
+    def __init__(self, host, username, password, port=None, use_ssl=False, timeout=10,
+                 device_id=None):
+        self.host = host
+        self.username = username
+        self.password = password
+        self.port = resolve_port(port, use_ssl)
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self.key = device_id if device_id is not None else ("host", host, self.port, username)
+
+    async def _acquire(self):
+        return await get_pool().acquire(
+            self.key, self.host, self.username, self.password,
+            port=self.port, use_ssl=self.use_ssl, timeout=self.timeout,
+            # Explicit user action: do not wait out a reconnect backoff
+            retry_now=True,
+        )
+
+    async def _call(self, command, attrs=None, queries=None):
+        client = await self._acquire()
+        try:
+            return await client.call(command, attrs, queries)
+        except TRANSPORT_ERRORS as e:
+            # A !trap leaves the session usable; only drop broken ones
+            await get_pool().discard(self.key, e)
+            raise
+
+    def connect(self):
+        """Make sure a logged-in session exists; returns False on failure."""
+        try:
+            run_sync(self._acquire(), self.timeout * 2)
+            return True
+        except Exception as e:
+            _logger.warning("Connection to %s failed: %s", self.host, e)
+            return False
+
+    def disconnect(self):
+        """Release the session; it stays pooled for the next caller."""
+
+    def call(self, command, attrs=None, queries=None):
+        return run_sync(self._call(command, attrs, queries), self.timeout * 2)
+
+    def get_system_resources(self):
+        rows = self.call("/system/resource/print")
+        return rows[0] if rows else {}
+
+    def get_system_info(self):
+        """Return {"resource": {...}, "identity": {...}}."""
+        identity = self.call("/system/identity/print")
+        return {
+            "resource": self.get_system_resources(),
+            "identity": identity[0] if identity else {},
+        }
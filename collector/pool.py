@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""Process-wide pool of authenticated RouterOS API sessions.
+
+Sessions are keyed by device and live on one shared event loop thread,
+which also hosts the collector (collector.async_collector). Polls and
+UI actions (connection test, capability refresh) reuse the same logged-in
+session instead of paying a TCP/TLS handshake and login each time.
+
+- Idle sessions are probed every KEEPALIVE_INTERVAL seconds; sessions
+  unused for IDLE_TIMEOUT are closed.
+- A failed session is closed and the device backs off exponentially
+  (BACKOFF_BASE doubling up to BACKOFF_MAX, with jitter) before the
+  next connection attempt.
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+
+from .api import RouterOSClient, RouterOSError, resolve_port
+
+_logger = logging.getLogger(__name__)
+
+KEEPALIVE_INTERVAL = 30
+IDLE_TIMEOUT = 600
+BACKOFF_BASE = 2
+BACKOFF_MAX = 300
+
+
+class PoolBackoff(RouterOSError):
+    """Device is waiting out its reconnect backoff."""
+
+
+class _PooledSession:
+    __slots__ = ("params", "client", "lock", "failures", "retry_at", "last_used", "last_error")
+
+    def __init__(self, params):
+        self.params = params
+        self.client = None
+        self.lock = asyncio.Lock()
+        self.failures = 0
+        self.retry_at = 0.0
+        self.last_used = time.monotonic()
+        self.last_error = None
+
+
+class ConnectionPool:
+    """RouterOS sessions keyed by device; use only on the pool loop."""
+
+    def __init__(self):
+        self._sessions = {}
+        self._keepalive_task = None
+
+    def __len__(self):
+        return len(self._sessions)
+
+    async def acquire(self, key, host, username, password, port=None, use_ssl=False,
+                      timeout=10, retry_now=False):
+        """Return a connected client for key, connecting if needed.
+
+        Args:
+            key: pool key, normally the device id
+            host, username, password, port, use_ssl: connection settings;
+                a session opened with other settings is replaced
+            timeout: connect / command timeout of the client
+            retry_now: ignore a pending backoff (explicit user action)
+
+        Raises:
+            PoolBackoff: device is backing off and retry_now is not set
+            RouterOSError, OSError, asyncio.TimeoutError: connection failed
+        """
+        self._ensure_keepalive()
+        # Unset and explicit default port are the same session
+        port = resolve_port(port, use_ssl)
+        params = (host, port, username, password, bool(use_ssl))
+        session = self._sessions.get(key)
+        if session is None or session.params != params:
+            if session is not None:
+                await self._close(session)
+            session = self._sessions[key] = _PooledSession(params)
+
+        session.last_used = time.monotonic()
+        async with session.lock:
+            if session.client is not None and session.client.connected:
+                session.client.timeout = timeout
+                return session.client
+            if not retry_now and time.monotonic() < session.retry_at:
+                raise PoolBackoff(
+                    f"reconnect backoff after: {session.last_error}"
+                )
+
+            client = RouterOSClient(
+                host, username, password, port=port, use_ssl=use_ssl, timeout=timeout,
+            )
+            try:
+                await client.connect()
+            except (Exception, asyncio.CancelledError) as e:
+                # Cancelled: the caller's timeout hit during connect/login
+                self._fail(session, e)
+                raise
+            session.client = client
+            session.failures = 0
+            session.last_error = None
+            return client
+
+    async def discard(self, key, error=None):
+        """Close the session of key; with an error, start its backoff.
+
+        Failed connection attempts already count in acquire, so only a
+        session that was established backs off here.
+        """
+        session = self._sessions.get(key)
+        if session is None:
+            return
+        established = session.client is not None
+        await self._close(session)
+        if error is not None and established:
+            self._fail(session, error)
+
+    async def invalidate(self, key):
+        """Close the session of key and clear its backoff (settings changed)."""
+        session = self._sessions.pop(key, None)
+        if session is not None:
+            await self._close(session)
+
+    async def close_all(self):
+        for key in list(self._sessions):
+            await self.invalidate(key)
+
+    def _fail(self, session, error):
+        session.failures += 1
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (session.failures - 1))
+        # Equal jitter: keeps a floor while spreading reconnect storms
+        session.retry_at = time.monotonic() + delay / 2 + random.uniform(0, delay / 2)
+        session.last_error = str(error) or type(error).__name__
+
+    @staticmethod
+    async def _close(session):
+        client, session.client = session.client, None
+        if client is not None:
+            await client.close()
+
+    # -------------------------------------------------------------------------
+    # KEEPALIVE
+    # -------------------------------------------------------------------------
+    def _ensure_keepalive(self):
+        if self._keepalive_task is None or self._keepalive_task.done():
+            self._keepalive_task = asyncio.get_running_loop().create_task(self._keepalive())
+
+    async def _keepalive(self):
+        while True:
+            await asyncio.sleep(KEEPALIVE_INTERVAL)
+            now = time.monotonic()
+            for key, session in list(self._sessions.items()):
+                idle = now - session.last_used
+                if idle >= IDLE_TIMEOUT:
+                    await self.invalidate(key)
+                elif idle >= KEEPALIVE_INTERVAL and session.client is not None:
+                    try:
+                        await session.client.call("/system/identity/print")
+                    except Exception as e:
+                        _logger.info("Keepalive to %s failed: %s", session.params[0], e)
+                        await self.discard(key, e)
+
+
+# -----------------------------------------------------------------------------
+# SHARED LOOP
+# -----------------------------------------------------------------------------
+_loop = None
+_pool = None
+_loop_lock = threading.Lock()
+
+
+def get_loop():
+    """Return the shared event loop, starting its thread on first use."""
+    global _loop, _pool
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            _pool = ConnectionPool()
+            threading.Thread(
+                target=_loop.run_forever,
+                name="mikrotik-routeros-loop",
+                daemon=True,
+            ).start()
+        return _loop
+
+
+def get_pool():
+    """Return the pool; only use it from coroutines running on get_loop()."""
+    get_loop()
+    return _pool
+
+
+def run_sync(coro, timeout=None):
+    """Run a coroutine on the shared loop from a regular thread and wait for it."""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop()).result(timeout)
@@ -2,3 +2,4 @@
 
 from . import ingest
 from . import api
+from . import chart
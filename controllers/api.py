@@ -43,6 +43,8 @@ class MikrotikApiController(http.Controller):
             return {
                 "success": True,
                 "devices": devices,
+                # Catalog IDs for the compact ingest format
+                "metric_ids": env["mikrotik.metric.catalog"]._get_key_id_map(),
             }
             
         except Exception as e:
@@ -72,7 +74,7 @@ class MikrotikApiController(http.Controller):
             Device = env["mikrotik.device"]
             Capability = env["mikrotik.device.capability"]
             
-            device = Device.search([("device_uid", "=", device_uid)], limit=1)
+            device = Device.get_by_uid(device_uid)
             if not device:
                 return {"success": False, "error": "Unknown device"}
             
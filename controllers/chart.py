@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import time
+from datetime import datetime
+
+from odoo import http
+from odoo.http import request
+
+_logger = logging.getLogger(__name__)
+
+
+class MikrotikChartController(http.Controller):
+    """Read endpoints for the backend charts (user session required)."""
+
+    @http.route(
+        "/mikrotik/chart/series",
+        type="json",
+        auth="user",
+        methods=["POST"],
+    )
+    def chart_series(self, device_id=None, metric_keys=None, start=None, end=None,
+                     width=800, interfaces=None, since=None, step=None, **kwargs):
+        """Return pre-bucketed series sized to the chart.
+        
+        Expected payload:
+        {
+            "device_id": 1,
+            "metric_keys": ["iface.rx_bps", "iface.tx_bps"],
+            "start": 1767607200,        # UTC epoch seconds
+            "end": 1767610800,          # defaults to now
+            "width": 1200,              # chart width in pixels
+            "interfaces": ["ether1"]    # optional
+        }
+        
+        Incremental refresh: pass "since" (start of the last bucket the
+        client holds) and the "step" of the first response instead of
+        start/width; only that bucket and newer ones are returned.
+        
+        See mikrotik.metric.rollup.get_series for the response layout.
+        """
+        end = int(end or time.time())
+        if since is not None and step:
+            start = int(since)
+        else:
+            step = None
+        start = int(start or end - 1800)
+        return request.env["mikrotik.metric.rollup"].get_series(
+            int(device_id) if device_id else None,
+            metric_keys or [],
+            start,
+            end,
+            width,
+            interfaces=interfaces,
+            step=step,
+        )
+
+    @http.route(
+        "/mikrotik/usage/top",
+        type="json",
+        auth="user",
+        methods=["POST"],
+    )
+    def usage_top(self, start=None, end=None, limit=10, period="hour",
+                  device_id=None, session_type=None, **kwargs):
+        """Return the top subscribers by traffic.
+        
+        Expected payload:
+        {
+            "start": 1767571200,        # UTC epoch seconds, defaults to end - 24h
+            "end": 1767657600,          # defaults to now
+            "limit": 10,
+            "period": "hour",           # or "day" for long ranges
+            "device_id": 1,             # optional
+            "session_type": "pppoe"     # optional
+        }
+        """
+        Usage = request.env["mikrotik.session.usage"]
+        Usage.check_access_rights("read")
+        end = int(end or time.time())
+        start = int(start or end - 86400)
+        return Usage.sudo().get_top_users(
+            datetime.utcfromtimestamp(start),
+            datetime.utcfromtimestamp(end),
+            limit=min(int(limit), 1000),
+            period=period if period in ("hour", "day") else "hour",
+            device_id=int(device_id) if device_id else None,
+            session_type=session_type,
+        )
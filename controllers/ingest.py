@@ -1,25 +1,39 @@
 # -*- coding: utf-8 -*-
 
-import json
 import logging
 import hmac
 import hashlib
-from datetime import datetime
+import json
+import zlib
+
+from psycopg2 import OperationalError
 
 from odoo import http, fields, SUPERUSER_ID
 from odoo.http import request
 
 _logger = logging.getLogger(__name__)
 
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Upper bound for a decompressed compact payload
+MAX_PAYLOAD_BYTES = 32 * 1024 * 1024
+
 
 class MikrotikIngestController(http.Controller):
     """High-throughput ingestion endpoint for collector service.
     
     Designed for ISP-grade performance:
     - Bulk metric ingestion
+    - Compact msgpack / gzip JSON metric format
     - HMAC authentication
     - Minimal ORM overhead
     - Idempotent operations
+    
+    Database concurrency failures (OperationalError) are re-raised rather
+    than answered as errors, so Odoo rolls back and retries the request.
     """
 
     @http.route(
@@ -67,36 +81,131 @@ class MikrotikIngestController(http.Controller):
             
             # Process in sudo context for performance
             env = request.env(user=SUPERUSER_ID)
+            return self._ingest_devices(env, devices_data)
             
-            total_metrics = 0
-            errors = []
-            
-            for device_data in devices_data:
-                try:
-                    count = self._process_device_metrics(env, device_data)
-                    total_metrics += count
-                except Exception as e:
-                    errors.append({
-                        "device_uid": device_data.get("device_uid"),
-                        "error": str(e),
-                    })
-                    _logger.warning("Error processing device %s: %s", 
-                                    device_data.get("device_uid"), str(e))
-            
-            return {
-                "success": True,
-                "metrics_processed": total_metrics,
-                "errors": errors if errors else None,
-            }
-            
+        except OperationalError:
+            raise
         except Exception as e:
             _logger.exception("Ingest error")
             return {"success": False, "error": str(e)}
 
-    def _validate_signature(self, data):
+    @http.route(
+        "/mikrotik/ingest/metrics/compact",
+        type="http",
+        auth="public",
+        methods=["POST"],
+        csrf=False,
+    )
+    def ingest_metrics_compact(self, **kwargs):
+        """Ingest telemetry metrics in the compact binary format.
+        
+        Authentication travels in headers and the HMAC covers the body:
+            X-Collector-Id: collector-01
+            X-Timestamp: 2026-01-05T10:00:01Z
+            X-Signature: hmac-sha256-hex of "<collector_id>:<timestamp>:" + raw body
+        
+        The body is msgpack (Content-Type: application/msgpack) or JSON,
+        optionally gzip-compressed (Content-Encoding: gzip). Metric keys are
+        replaced by the catalog IDs returned in "metric_ids" by
+        /mikrotik/api/devices, and timestamps may be epoch seconds:
+        {
+            "devices": [
+                {
+                    "device_uid": "MT-0001",
+                    "ts": 1767607201,
+                    "metrics": [
+                        [metric_id, null, 23.5],
+                        [metric_id, "ether1", 4312332],
+                        ...
+                    ]
+                }
+            ]
+        }
+        """
+        try:
+            headers = request.httprequest.headers
+            # Cached: a retried request (concurrency failure) reads the body again
+            body = request.httprequest.get_data()
+            data = {
+                "collector_id": headers.get("X-Collector-Id", ""),
+                "signature": headers.get("X-Signature", ""),
+                "timestamp": headers.get("X-Timestamp", ""),
+            }
+            
+            if not self._validate_signature(data, body=body):
+                return request.make_json_response(
+                    {"success": False, "error": "Authentication failed"}, status=403,
+                )
+            
+            try:
+                payload = self._decode_compact(body, headers)
+            except (ValueError, TypeError, zlib.error) as e:
+                return request.make_json_response(
+                    {"success": False, "error": f"Invalid payload: {e}"}, status=400,
+                )
+            
+            env = request.env(user=SUPERUSER_ID)
+            devices_data, errors = env["mikrotik.ingest"]._expand_compact(payload.get("devices") or [])
+            if not devices_data:
+                return request.make_json_response(
+                    {"success": False, "error": "No devices in payload", "errors": errors or None},
+                )
+            
+            result = self._ingest_devices(env, devices_data)
+            if errors:
+                result["errors"] = errors + (result["errors"] or [])
+            return request.make_json_response(result)
+            
+        except OperationalError:
+            raise
+        except Exception as e:
+            _logger.exception("Compact ingest error")
+            return request.make_json_response({"success": False, "error": str(e)}, status=500)
+
+    def _decode_compact(self, body, headers):
+        """Decompress and decode a compact metrics body.
+        
+        Raises:
+            ValueError: on unsupported encodings or oversized payloads
+        """
+        if "gzip" in (headers.get("Content-Encoding") or "").lower():
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            body = decompressor.decompress(body, MAX_PAYLOAD_BYTES)
+            if decompressor.unconsumed_tail:
+                raise ValueError("payload too large")
+        
+        content_type = (headers.get("Content-Type") or "").lower()
+        if "msgpack" in content_type:
+            if msgpack is None:
+                raise ValueError("msgpack is not installed on the server")
+            payload = msgpack.unpackb(body, raw=False, strict_map_key=False)
+        else:
+            payload = json.loads(body)
+        
+        if not isinstance(payload, dict):
+            raise ValueError("payload must be an object")
+        return payload
+
+    def _ingest_devices(self, env, devices_data):
+        """Store a batch of device payloads and publish them to the bus."""
+        # Whole request is resolved and written as one batch
+        result = env["mikrotik.ingest"].ingest_metrics(devices_data)
+        
+        # Publish to bus for real-time UI: watched devices only, throttled
+        # and coalesced, one _sendmany for the whole request
+        env["mikrotik.live.subscription"].publish_updates(result["devices"])
+        
+        return {
+            "success": True,
+            "metrics_processed": result["metrics_processed"],
+            "errors": result["errors"] or None,
+        }
+
+    def _validate_signature(self, data, body=None):
         """Validate HMAC signature from collector.
         
         For production, the secret should come from system parameters.
+        When body is given (compact route) it is appended to the signed message.
         """
         # Get secret from system parameters
         IrParam = request.env["ir.config_parameter"].sudo()
@@ -114,117 +223,19 @@ class MikrotikIngestController(http.Controller):
         # Create signature from payload
         collector_id = data.get("collector_id", "")
         timestamp = data.get("timestamp", "")
-        message = f"{collector_id}:{timestamp}"
+        message = f"{collector_id}:{timestamp}".encode()
+        if body is not None:
+            # Compact route: the raw body is signed as well
+            message += b":" + body
         
         expected = hmac.new(
             secret.encode(),
-            message.encode(),
+            message,
             hashlib.sha256,
         ).hexdigest()
         
         return hmac.compare_digest(signature, expected)
 
-    def _process_device_metrics(self, env, device_data):
-        """Process metrics for a single device."""
-        device_uid = device_data.get("device_uid")
-        ts_str = device_data.get("ts")
-        metrics = device_data.get("metrics", {})
-        
-        if not device_uid or not metrics:
-            return 0
-        
-        # Find device
-        Device = env["mikrotik.device"]
-        device = Device.search([("device_uid", "=", device_uid)], limit=1)
-        
-        if not device:
-            _logger.debug("Unknown device UID: %s", device_uid)
-            return 0
-        
-        # Parse timestamp - Odoo expects naive datetime (assumes UTC)
-        ts_collected = datetime.fromisoformat(ts_str.replace("Z", "+00:00"))
-        # Convert to naive datetime by removing tzinfo
-        if ts_collected.tzinfo is not None:
-            ts_collected = ts_collected.replace(tzinfo=None)
-        
-        # Update device last_seen
-        device.write({
-            "last_seen": ts_collected,
-            "state": "up",
-        })
-        
-        # Get metric catalog for IDs
-        MetricCatalog = env["mikrotik.metric.catalog"]
-        MetricLatest = env["mikrotik.metric.latest"]
-        MetricPoint = env["mikrotik.metric.point"]
-        
-        # Prepare points for bulk insert
-        points = []
-        latest_updates = {}
-        
-        for metric_key, value in metrics.items():
-            # Parse interface from key if present (e.g., "iface.ether1.rx_bps")
-            interface_name = None
-            base_key = metric_key
-            
-            if metric_key.startswith("iface.") and metric_key.count(".") >= 2:
-                parts = metric_key.split(".", 2)
-                interface_name = parts[1]
-                base_key = f"iface.{parts[2]}"
-            
-            # Get or create metric ID
-            metric_id = MetricCatalog.get_metric_id(base_key)
-            
-            # Prepare for time-series storage
-            points.append({
-                "device_id": device.id,
-                "metric_id": metric_id,
-                "interface_name": interface_name,
-                "ts_collected": ts_collected,
-                "value_float": float(value) if isinstance(value, (int, float)) else None,
-                "value_text": str(value) if not isinstance(value, (int, float)) else None,
-            })
-            
-            # Prepare for latest table
-            latest_key = f"{base_key}:{interface_name or ''}"
-            latest_updates[latest_key] = {
-                "metric_key": base_key,
-                "interface_name": interface_name,
-                "value": value,
-            }
-        
-        # Bulk insert to time-series table
-        if points:
-            MetricPoint.bulk_create(points)
-        
-        # Update latest table
-        for key, data in latest_updates.items():
-            MetricLatest._upsert_single(
-                device.id,
-                data["metric_key"],
-                data["interface_name"],
-                data["value"],
-                ts_collected,
-            )
-        
-        # Publish to bus for real-time UI (throttled)
-        self._publish_to_bus(env, device, metrics, ts_collected)
-        
-        return len(points)
-
-    def _publish_to_bus(self, env, device, metrics, ts_collected):
-        """Publish latest snapshot to Odoo bus for real-time UI."""
-        channel = f"mikrotik_monitoring.device.{device.id}"
-        
-        payload = {
-            "device_id": device.id,
-            "device_uid": device.device_uid,
-            "ts": ts_collected.isoformat(),
-            "metrics": metrics,
-        }
-        
-        env["bus.bus"]._sendone(channel, "mikrotik_update", payload)
-
     @http.route(
         "/mikrotik/ingest/events",
         type="json",
@@ -268,26 +279,35 @@ class MikrotikIngestController(http.Controller):
             Device = env["mikrotik.device"]
             Event = env["mikrotik.event"]
             
-            created = 0
+            # Resolve all device UIDs at once, unknown devices are skipped
+            device_ids = Device.resolve_uids({e.get("device_uid") for e in events_data})
+            Ingest = env["mikrotik.ingest"]
+            rows = []
             for event_data in events_data:
-                device_uid = event_data.get("device_uid")
-                device = Device.search([("device_uid", "=", device_uid)], limit=1)
-                
-                if not device:
+                if event_data.get("device_uid") not in device_ids:
                     continue
-                
-                Event.log_event(
-                    device_id=device.id,
-                    event_type=event_data.get("event_type", "info"),
-                    subject=event_data.get("subject"),
-                    message=event_data.get("message"),
-                    severity=event_data.get("severity", "info"),
-                    data=event_data.get("data"),
-                )
-                created += 1
+                try:
+                    ts = Ingest._parse_ts(event_data.get("ts"))
+                except (TypeError, ValueError, AttributeError) as e:
+                    # Keep the event, stamped with the server time
+                    _logger.warning("Invalid event timestamp from %s: %s", collector_id, e)
+                    ts = None
+                rows.append({
+                    "device_id": device_ids[event_data.get("device_uid")][0],
+                    "ts": ts,
+                    "event_type": event_data.get("event_type", "info"),
+                    "subject": event_data.get("subject"),
+                    "message": event_data.get("message"),
+                    "severity": event_data.get("severity", "info"),
+                    "data": event_data.get("data"),
+                    "source": collector_id,
+                })
+            created = Event.log_events_bulk(rows)
             
             return {"success": True, "events_created": created}
             
+        except OperationalError:
+            raise
         except Exception as e:
             _logger.exception("Event ingest error")
             return {"success": False, "error": str(e)}
@@ -317,14 +337,16 @@ class MikrotikIngestController(http.Controller):
             
             interfaces_data = interfaces or []
             
-            device = Device.search([("device_uid", "=", device_uid)], limit=1)
+            device = Device.get_by_uid(device_uid)
             if not device:
                 return {"success": False, "error": "Unknown device"}
             
-            Interface.sync_from_router(device.id, interfaces_data)
+            changes = Interface.sync_from_router(device.id, interfaces_data)
             
-            return {"success": True, "interfaces_synced": len(interfaces_data)}
+            return {"success": True, "interfaces_synced": len(interfaces_data), "changes": changes}
             
+        except OperationalError:
+            raise
         except Exception as e:
             _logger.exception("Interface ingest error")
             return {"success": False, "error": str(e)}
@@ -354,24 +376,24 @@ class MikrotikIngestController(http.Controller):
             
             leases_data = leases or []
             
-            device = Device.search([("device_uid", "=", device_uid)], limit=1)
+            device = Device.get_by_uid(device_uid)
             if not device:
                 return {"success": False, "error": "Unknown device"}
             
-            Lease.sync_leases(device.id, leases_data)
+            changes = Lease.sync_leases(device.id, leases_data)
             
             # Log aggregate to metrics
             MetricLatest = env["mikrotik.metric.latest"]
-            MetricLatest._upsert_single(
+            MetricLatest.upsert_metrics(
                 device.id,
-                "dhcp.active_leases",
-                None,
-                len([l for l in leases_data if l.get("status") != "expired"]),
+                {"dhcp.active_leases": len([l for l in leases_data if l.get("status") != "expired"])},
                 fields.Datetime.now(),
             )
             
-            return {"success": True, "leases_synced": len(leases_data)}
+            return {"success": True, "leases_synced": len(leases_data), "changes": changes}
             
+        except OperationalError:
+            raise
         except Exception as e:
             _logger.exception("Lease ingest error")
             return {"success": False, "error": str(e)}
@@ -402,25 +424,30 @@ class MikrotikIngestController(http.Controller):
             session_type = session_type or "pppoe"
             sessions_data = sessions or []
             
-            device = Device.search([("device_uid", "=", device_uid)], limit=1)
+            device = Device.get_by_uid(device_uid)
             if not device:
                 return {"success": False, "error": "Unknown device"}
             
-            Session.sync_sessions(device.id, session_type, sessions_data)
+            try:
+                # Poll time of the collector, so a delayed request keeps session start times
+                ts = env["mikrotik.ingest"]._parse_ts(timestamp)
+            except (TypeError, ValueError, AttributeError):
+                ts = None
+            changes = Session.sync_sessions(device.id, session_type, sessions_data, ts=ts)
             
             # Log aggregate to metrics
             MetricLatest = env["mikrotik.metric.latest"]
             metric_key = "ppp.active_sessions" if session_type == "pppoe" else "hotspot.active_users"
-            MetricLatest._upsert_single(
+            MetricLatest.upsert_metrics(
                 device.id,
-                metric_key,
-                None,
-                len([s for s in sessions_data]),
+                {metric_key: len(sessions_data)},
                 fields.Datetime.now(),
             )
             
-            return {"success": True, "sessions_synced": len(sessions_data)}
+            return {"success": True, "sessions_synced": len(sessions_data), "changes": changes}
             
+        except OperationalError:
+            raise
         except Exception as e:
             _logger.exception("Session ingest error")
             return {"success": False, "error": str(e)}
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """Debug collector internals"""
 import sys
+import time
 sys.path.insert(0, '/usr/lib/python3/dist-packages')
 
 import odoo
@@ -25,20 +26,20 @@ with registry.cursor() as cr:
         
         # Access the collectors dictionary
         print(f"\n📊 Collectors registered:")
-        with collector_service._lock:
-            print(f"   Total: {len(collector_service._collectors)}")
-            for device_id, coll in collector_service._collectors.items():
-                print(f"   Device {device_id}: {coll.config.get('host')}")
+        print(f"   Total: {len(collector_service._collectors)}")
+        for device_id, coll in list(collector_service._collectors.items()):
+            print(f"   Device {device_id}: {coll.config.get('host')} "
+                  f"(connected: {coll.connected}, last error: {coll.last_error})")
         
         if len(collector_service._collectors) == 0:
             print(f"\n⚠️  No collectors registered!")
             print(f"   This means devices failed to connect.")
             print(f"\n   Forcing reload...")
             
-            # Force reload
-            collector_service._reload_collectors(env)
+            # Force reload (runs on the collector loop)
+            collector_service.reload_configuration()
+            time.sleep(2)
             
-            with collector_service._lock:
-                print(f"\n   After reload: {len(collector_service._collectors)} collectors")
-                for device_id, coll in collector_service._collectors.items():
-                    print(f"   Device {device_id}: {coll.config.get('host')}")
+            print(f"\n   After reload: {len(collector_service._collectors)} collectors")
+            for device_id, coll in list(collector_service._collectors.items()):
+                print(f"   Device {device_id}: {coll.config.get('host')}")
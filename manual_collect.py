@@ -42,32 +42,30 @@ with registry.cursor() as cr:
     print(f"   Host: {device_collector.config['host']}")
     print(f"   Connected: {device_collector.connected}")
     
-    # Try to connect if not connected
-    if not device_collector.connected:
-        print(f"\n🔌 Attempting connection...")
-        result = device_collector.connect()
-        print(f"   Result: {result}")
-        print(f"   Connected now: {device_collector.connected}")
-    
-    # Try realtime collection
+    # Try realtime collection (runs on the collector loop)
     print(f"\n📊 Attempting realtime collection...")
     try:
         import time
-        metrics = device_collector.collect_realtime(time.time())
+        from odoo.addons.mikrotik_monitoring.collector.pool import run_sync
+        
+        result, failed = run_sync(
+            device_collector.collect(["realtime"], time.monotonic()), 60
+        )
+        print(f"   Connected now: {device_collector.connected}")
         
-        if metrics:
+        if result and result["metrics"]:
+            metrics = result["metrics"]
             print(f"   ✅ Got {len(metrics)} metrics!")
             for key, value in list(metrics.items())[:5]:
                 print(f"      - {key}: {value}")
             
-            # Store metrics
+            # Store metrics (own transaction, like the collector writer)
             print(f"\n💾 Storing metrics...")
-            collector_service._store_metrics(env, device_id, metrics)
-            cr.commit()
+            collector_service._store([result])
             print(f"   ✅ Metrics stored!")
             
         else:
-            print(f"   ⚠️  No metrics returned!")
+            print(f"   ⚠️  No metrics returned! Failed tiers: {failed}")
             
     except Exception as e:
         print(f"   ❌ Error: {e}")
@@ -1,11 +1,18 @@
 # -*- coding: utf-8 -*-
 
+from . import mikrotik_partition
 from . import mikrotik_device
 from . import mikrotik_capability
 from . import mikrotik_metric_catalog
 from . import mikrotik_metric_point
 from . import mikrotik_metric_latest
+from . import mikrotik_metric_rollup
 from . import mikrotik_event
 from . import mikrotik_interface
 from . import mikrotik_lease
+from . import mikrotik_lease_history
 from . import mikrotik_session
+from . import mikrotik_session_usage
+from . import mikrotik_live_subscription
+from . import mikrotik_live_publish
+from . import mikrotik_ingest
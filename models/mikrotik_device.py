@@ -3,11 +3,18 @@
 import logging
 from datetime import datetime, timedelta
 
-from odoo import api, fields, models, _
+from psycopg2.extras import execute_values
+
+from odoo import api, fields, models, tools, _
 from odoo.exceptions import UserError, ValidationError
 
 _logger = logging.getLogger(__name__)
 
+# Stored counters maintained by sync/ingest paths (see _update_counters)
+COUNTER_FIELDS = ("lease_count", "session_count", "ppp_count", "event_count", "uptime_seconds")
+# Uptime metric keys, the catalog key first
+UPTIME_METRIC_KEYS = ("system.uptime_seconds", "system.uptime_sec")
+
 
 class MikrotikDevice(models.Model):
     """MikroTik Router Device - core configuration and status."""
@@ -192,21 +199,32 @@ class MikrotikDevice(models.Model):
         compute="_compute_interface_count",
         store=True,
     )
+    # Stored counters: computed with grouped queries on install/recount and
+    # kept current incrementally by the sync and ingest paths
     lease_count = fields.Integer(
         string="DHCP Leases",
         compute="_compute_lease_count",
+        store=True,
     )
     session_count = fields.Integer(
         string="Sessions",
         compute="_compute_session_count",
+        store=True,
     )
     ppp_count = fields.Integer(
         string="PPP Sessions",
         compute="_compute_ppp_count",
+        store=True,
     )
     event_count = fields.Integer(
         string="Events",
         compute="_compute_event_count",
+        store=True,
+    )
+    uptime_seconds = fields.Integer(
+        string="Uptime (seconds)",
+        compute="_compute_uptime_seconds",
+        store=True,
     )
     uptime_display = fields.Char(
         string="Uptime",
@@ -225,67 +243,192 @@ class MikrotikDevice(models.Model):
         for rec in self:
             rec.interface_count = len(rec.interface_ids)
 
+    def _count_by_device(self, model_name, domain=None):
+        """Return {device_id: count} for the recordset in one grouped query."""
+        ids = [rec.id for rec in self if isinstance(rec.id, int)]
+        if not ids:
+            return {}
+        groups = self.env[model_name]._read_group(
+            (domain or []) + [("device_id", "in", ids)],
+            ["device_id"],
+            ["__count"],
+        )
+        return {device.id: count for device, count in groups}
+
     def _compute_lease_count(self):
+        counts = self._count_by_device("mikrotik.lease")
         for rec in self:
-            rec.lease_count = self.env["mikrotik.lease"].search_count([
-                ("device_id", "=", rec.id)
-            ])
+            rec.lease_count = counts.get(rec.id, 0)
 
     def _compute_session_count(self):
+        counts = self._count_by_device("mikrotik.session")
         for rec in self:
-            rec.session_count = self.env["mikrotik.session"].search_count([
-                ("device_id", "=", rec.id)
-            ])
+            rec.session_count = counts.get(rec.id, 0)
 
     def _compute_ppp_count(self):
+        counts = self._count_by_device("mikrotik.session", [
+            ("session_type", "=", "pppoe"),
+            ("is_active", "=", True),
+        ])
         for rec in self:
-            rec.ppp_count = self.env["mikrotik.session"].search_count([
-                ("device_id", "=", rec.id),
-                ("session_type", "=", "pppoe"),
-                ("is_active", "=", True),
-            ])
+            rec.ppp_count = counts.get(rec.id, 0)
 
     def _compute_event_count(self):
+        counts = self._count_by_device("mikrotik.event")
         for rec in self:
-            rec.event_count = self.env["mikrotik.event"].search_count([
-                ("device_id", "=", rec.id)
-            ])
+            rec.event_count = counts.get(rec.id, 0)
+
+    def _compute_uptime_seconds(self):
+        ids = [rec.id for rec in self if isinstance(rec.id, int)]
+        uptimes = {}
+        if ids:
+            self.env["mikrotik.metric.latest"].flush_model()
+            self.env.cr.execute(
+                """
+                SELECT DISTINCT ON (device_id) device_id, value_float
+                  FROM mikrotik_metric_latest
+                 WHERE device_id = ANY(%s) AND metric_key = ANY(%s)
+                 ORDER BY device_id, ts_collected DESC
+                """,
+                (ids, list(UPTIME_METRIC_KEYS)),
+            )
+            uptimes = dict(self.env.cr.fetchall())
+        for rec in self:
+            rec.uptime_seconds = int(uptimes.get(rec.id) or 0)
 
+    @api.depends("uptime_seconds")
     def _compute_uptime_display(self):
         for rec in self:
-            uptime_metric = self.env["mikrotik.metric.latest"].search(
-                [("device_id", "=", rec.id), ("metric_key", "=", "system.uptime_sec")],
-                limit=1,
-            )
-            if uptime_metric and uptime_metric.value_float:
-                secs = int(uptime_metric.value_float)
-                days, rem = divmod(secs, 86400)
+            if rec.uptime_seconds:
+                days, rem = divmod(rec.uptime_seconds, 86400)
                 hours, rem = divmod(rem, 3600)
                 mins, secs = divmod(rem, 60)
                 rec.uptime_display = f"{days}d {hours}h {mins}m"
             else:
                 rec.uptime_display = "-"
 
+    # -------------------------------------------------------------------------
+    # COUNTER MAINTENANCE
+    # -------------------------------------------------------------------------
+    @api.model
+    def _update_counters(self, field_name, values, increment=False):
+        """Set or increment a stored counter for many devices in one statement.
+        
+        Args:
+            field_name: one of COUNTER_FIELDS
+            values: dict of {device_id: value}
+            increment: add values to the stored counters instead of replacing them
+        """
+        if field_name not in COUNTER_FIELDS:
+            raise ValueError(f"Not a device counter: {field_name}")
+        values = {device_id: value for device_id, value in values.items() if value or not increment}
+        if not values:
+            return
+        self.flush_model([field_name])
+        expression = f"COALESCE(d.{field_name}, 0) + v.value" if increment else "v.value"
+        execute_values(
+            self._cr,
+            f"""
+            UPDATE mikrotik_device d
+               SET {field_name} = {expression}
+              FROM (VALUES %s) AS v(id, value)
+             WHERE d.id = v.id
+            """,
+            sorted(values.items()),
+            template="(%s::int, %s::int)",
+            page_size=len(values),
+        )
+        self.invalidate_model([field_name])
+
+    @api.model
+    def _cron_recount_counters(self):
+        """Recompute all stored counters with grouped queries to correct drift."""
+        devices = self.search([])
+        for field_name in COUNTER_FIELDS:
+            self.env.add_to_compute(self._fields[field_name], devices)
+        devices.flush_recordset(list(COUNTER_FIELDS))
+        return len(devices)
+
     # -------------------------------------------------------------------------
     # ORM METHODS
     # -------------------------------------------------------------------------
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self._clear_uid_cache()
+        return records
+
     def write(self, vals):
-        """Override write to restart collector when interval settings change."""
-        # Check if any interval field is being changed
-        interval_fields = {
+        """Override write to reload the collector when polling settings change."""
+        # Check if any interval or connection field is being changed
+        collector_fields = {
             'realtime_interval', 'short_interval', 'medium_interval', 
-            'long_interval', 'extended_interval', 'collection_enabled'
+            'long_interval', 'extended_interval', 'collection_enabled',
+            'host', 'api_port', 'use_ssl', 'username', 'password', 'device_uid',
         }
         
-        if interval_fields & set(vals.keys()):
-            # Interval settings changed, need to restart collector
+        if collector_fields & set(vals.keys()):
             from ..collector.async_collector import get_collector
             
             collector = get_collector()
             if collector and collector.running:
-                _logger.info("Interval settings changed, collector will auto-reload")
+                _logger.info("Collector settings changed, collector will auto-reload")
+                self.env.cr.postcommit.add(collector.reload_configuration)
+        
+        res = super(MikrotikDevice, self).write(vals)
+        if {'device_uid', 'collection_enabled'} & set(vals.keys()):
+            self._clear_uid_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self._clear_uid_cache()
+        return res
+
+    def _clear_uid_cache(self):
+        """Invalidate the cached UID map now and once more after commit.
         
-        return super(MikrotikDevice, self).write(vals)
+        Until this transaction commits, other workers still read the old
+        devices and may re-cache them; the post-commit clear drops that.
+        """
+        registry = self.env.registry
+        registry.clear_cache()
+        self.env.cr.postcommit.add(registry.clear_cache)
+
+    # -------------------------------------------------------------------------
+    # UID RESOLUTION
+    # -------------------------------------------------------------------------
+    @api.model
+    @tools.ormcache()
+    def _get_uid_map(self):
+        """Return the process-level {device_uid: (id, collection_enabled)} cache.
+        
+        Cleared through the registry cache whenever a device is created,
+        deleted, or its UID / collection flag changes, so other workers
+        are invalidated by registry signaling.
+        """
+        self.flush_model(["device_uid", "collection_enabled"])
+        self._cr.execute("SELECT device_uid, id, collection_enabled FROM mikrotik_device")
+        return {uid: (device_id, bool(enabled)) for uid, device_id, enabled in self._cr.fetchall()}
+
+    @api.model
+    def resolve_uids(self, device_uids):
+        """Resolve collector device UIDs without querying the database.
+        
+        Args:
+            device_uids: iterable of device UIDs
+        
+        Returns:
+            dict of {device_uid: (device_id, collection_enabled)} for known UIDs
+        """
+        uid_map = self._get_uid_map()
+        return {uid: uid_map[uid] for uid in device_uids if uid in uid_map}
+
+    @api.model
+    def get_by_uid(self, device_uid):
+        """Return the device with the given UID, or an empty recordset."""
+        entry = self._get_uid_map().get(device_uid)
+        return self.browse(entry[0]) if entry else self.browse()
 
     # -------------------------------------------------------------------------
     # ACTIONS
@@ -294,15 +437,16 @@ class MikrotikDevice(models.Model):
         """Test connectivity to the router and refresh capabilities."""
         self.ensure_one()
         try:
-            # Use base.py MikroTikCollector for testing
+            # Pooled session shared with the collector: no new login when alive
             from ..collector.base import MikroTikCollector
             
             collector = MikroTikCollector(
                 host=self.host,
                 username=self.username,
                 password=self.password,
-                port=self.api_port or 8728,
+                port=self.api_port or None,
                 use_ssl=self.use_ssl,
+                device_id=self.id,
             )
             
             if not collector.connect():
@@ -484,7 +628,7 @@ class MikrotikDevice(models.Model):
         if collector and collector.running:
             return {
                 "running": True,
-                "device_count": len(collector._clients),
+                "device_count": len(collector._collectors),
             }
         return {"running": False, "device_count": 0}
     
@@ -492,10 +636,13 @@ class MikrotikDevice(models.Model):
         """Refresh the collector's client for this device (after credential change)."""
         self.ensure_one()
         from ..collector.async_collector import get_collector
+        from ..collector.pool import get_pool, run_sync
+        
+        # Drop the pooled session shared by the collector and the UI actions
+        run_sync(get_pool().invalidate(self.id), 10)
         
         collector = get_collector()
         if collector and collector.running:
-            collector.refresh_client(self.id)
             return {
                 "type": "ir.actions.client",
                 "tag": "display_notification",
@@ -569,49 +716,120 @@ class MikrotikDevice(models.Model):
         
         return result
 
+    @api.model
+    def _record_heartbeats(self, last_seen):
+        """Record collector heartbeats for many devices in one statement.
+        
+        last_seen is bumped with a plain SQL UPDATE (no tracking, recompute
+        or write_date change). The ORM is only used for devices whose state
+        actually transitions to "up", which also logs a device_up event.
+        
+        Args:
+            last_seen: dict of {device_id: ts_collected}
+        
+        Returns:
+            Recordset of devices that came back up
+        """
+        if not last_seen:
+            return self.browse()
+        
+        self.flush_model(["last_seen", "state"])
+        # Sorted ids keep row lock order stable across concurrent requests
+        rows = sorted(last_seen.items())
+        result = execute_values(
+            self._cr,
+            """
+            UPDATE mikrotik_device d
+               SET last_seen = GREATEST(v.ts, d.last_seen)
+              FROM (VALUES %s) AS v(id, ts)
+             WHERE d.id = v.id
+         RETURNING d.id, d.state
+            """,
+            rows,
+            template="(%s::int, %s::timestamp)",
+            page_size=len(rows),
+            fetch=True,
+        )
+        self.invalidate_model(["last_seen"])
+        
+        recovered = self.browse(sorted(device_id for device_id, state in result if state != "up"))
+        if recovered:
+            recovered.write({"state": "up"})
+            self.env["mikrotik.event"].log_events_bulk([
+                {
+                    "device_id": device.id,
+                    "event_type": "device_up",
+                    "subject": device.device_uid,
+                    "message": "Device is reporting metrics again",
+                    "severity": "info",
+                }
+                for device in recovered
+            ])
+        return recovered
+
     @api.model
     def _check_device_health(self):
-        """Cron job to check device health and update states."""
+        """Cron job to check device health and update states.
+        
+        Each transition is one UPDATE ... RETURNING over all affected
+        devices, followed by one bulk event insert.
+        """
         now = fields.Datetime.now()
         stale_threshold = now - timedelta(seconds=30)
         down_threshold = now - timedelta(seconds=120)
         
-        # Find stale devices
-        stale_devices = self.search([
-            ("collection_enabled", "=", True),
-            ("state", "=", "up"),
-            ("last_seen", "<", stale_threshold),
-            ("last_seen", ">=", down_threshold),
-        ])
+        self.flush_model(["state", "last_seen", "collection_enabled"])
+        cr = self._cr
+        events = []
         
-        if stale_devices:
-            stale_devices.write({"state": "degraded"})
-            for device in stale_devices:
-                self.env["mikrotik.event"].log_event(
-                    device_id=device.id,
-                    event_type="device_degraded",
-                    subject=device.device_uid,
-                    message=f"Device not responding for >30s",
-                    severity="warning",
-                )
-        
-        # Find down devices
-        down_devices = self.search([
-            ("collection_enabled", "=", True),
-            ("state", "in", ["up", "degraded"]),
-            ("last_seen", "<", down_threshold),
-        ])
+        # Stale devices
+        cr.execute(
+            """
+            UPDATE mikrotik_device
+               SET state = 'degraded'
+             WHERE collection_enabled
+               AND state = 'up'
+               AND last_seen < %s
+               AND last_seen >= %s
+         RETURNING id, device_uid
+            """,
+            (stale_threshold, down_threshold),
+        )
+        events.extend({
+            "device_id": device_id,
+            "event_type": "device_degraded",
+            "subject": device_uid,
+            "message": "Device not responding for >30s",
+            "severity": "warning",
+        } for device_id, device_uid in cr.fetchall())
+        
+        # Down devices
+        cr.execute(
+            """
+            UPDATE mikrotik_device
+               SET state = 'down'
+             WHERE collection_enabled
+               AND state IN ('up', 'degraded')
+               AND last_seen < %s
+         RETURNING id, device_uid
+            """,
+            (down_threshold,),
+        )
+        events.extend({
+            "device_id": device_id,
+            "event_type": "device_down",
+            "subject": device_uid,
+            "message": "Device not responding for >120s",
+            "severity": "error",
+        } for device_id, device_uid in cr.fetchall())
         
-        if down_devices:
-            down_devices.write({"state": "down"})
-            for device in down_devices:
-                self.env["mikrotik.event"].log_event(
-                    device_id=device.id,
-                    event_type="device_down",
-                    subject=device.device_uid,
-                    message=f"Device not responding for >120s",
-                    severity="error",
-                )
+        Event = self.env["mikrotik.event"]
+        if events:
+            self.invalidate_model(["state"])
+            Event.log_events_bulk(events)
+        # Write repeats suppressed in memory even when no new events come in
+        Event._flush_suppressed(force=True)
+        return len(events)
 
     def action_view_interfaces(self):
         """Open interfaces view for this device."""
@@ -1,6 +1,29 @@
 # -*- coding: utf-8 -*-
 
-from odoo import api, fields, models
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from psycopg2.extras import execute_values
+
+from odoo import api, fields, models, tools
+
+_logger = logging.getLogger(__name__)
+
+# In-memory dedup fast path, per worker process:
+# (dbname, device_id, event_type, subject) -> (event_id, first_ts)
+_dedup_cache = {}
+# (dbname, event_id) -> [suppressed repeats not yet written, last_ts]
+_dedup_pending = {}
+# dbname -> monotonic time of the last pending flush
+_dedup_flushed = {}
+_dedup_lock = threading.Lock()
+
+# Seconds between writes of repeats counted in memory
+DEDUP_FLUSH_INTERVAL = 30
 
 
 class MikrotikEvent(models.Model):
@@ -12,12 +35,20 @@ class MikrotikEvent(models.Model):
     - Login failures
     - DHCP lease events
     - Device connectivity events
+    
+    Stored in monthly partitions; retention drops whole partitions and
+    deletes per-severity leftovers in chunks (see cleanup_old_events).
     """
 
     _name = "mikrotik.event"
+    _inherit = ["mikrotik.partition.mixin"]
     _description = "MikroTik Event"
     _order = "ts DESC"
 
+    _partition_column = "ts"
+    _partition_interval = "month"
+    _partition_premake = 2
+
     device_id = fields.Many2one(
         "mikrotik.device",
         string="Device",
@@ -92,11 +123,49 @@ class MikrotikEvent(models.Model):
         string="Source",
         help="Collector ID, syslog, API, etc.",
     )
+    
+    # Deduplication: repeats of the same (device, event_type, subject)
+    # inside the dedup window are folded into this row
+    repeat_count = fields.Integer(
+        string="Occurrences",
+        default=1,
+    )
+    last_ts = fields.Datetime(
+        string="Last Occurrence",
+    )
+
+    def _auto_init(self):
+        res = super()._auto_init()
+        # Dedup lookups of the open row for a key
+        tools.create_index(
+            self._cr,
+            "mikrotik_event_dedup_key_idx",
+            self._table,
+            ["device_id", "event_type", "subject", "ts"],
+        )
+        return res
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            vals.setdefault("last_ts", vals.get("ts") or fields.Datetime.now())
+        records = super().create(vals_list)
+        self.env["mikrotik.device"]._update_counters(
+            "event_count", Counter(rec.device_id.id for rec in records), increment=True,
+        )
+        return records
+
+    def unlink(self):
+        counts = Counter(rec.device_id.id for rec in self)
+        res = super().unlink()
+        self.env["mikrotik.device"]._update_counters(
+            "event_count", {device_id: -count for device_id, count in counts.items()}, increment=True,
+        )
+        return res
 
     @api.model
     def log_event(self, device_id, event_type, subject=None, message=None, severity="info", data=None):
         """Create an event log entry."""
-        import json
         return self.create({
             "device_id": device_id,
             "event_type": event_type,
@@ -107,13 +176,289 @@ class MikrotikEvent(models.Model):
         })
 
     @api.model
-    def cleanup_old_events(self, retention_days=180):
-        """Delete events older than retention period."""
-        from datetime import datetime, timedelta
-        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    def log_events_bulk(self, events):
+        """Insert many events in one statement.
+        
+        Repeats of an event already logged for the same (device, event_type,
+        subject) within the dedup window are not inserted: they increase
+        repeat_count and last_ts of the existing row instead. Keys known to
+        this worker are counted in memory and written in one UPDATE at most
+        every DEDUP_FLUSH_INTERVAL seconds, so suppressed events cost no
+        query.
+        
+        Args:
+            events: list of dicts with device_id, event_type and optionally
+                subject, message, severity, data, ts and source. Unknown
+                event types are stored as "info", unknown severities as "info".
+        
+        Returns:
+            Number of event rows inserted
+        """
+        if not events:
+            return 0
+        
+        event_types = {value for value, _label in self._fields["event_type"].selection}
+        severities = {value for value, _label in self._fields["severity"].selection}
+        now = fields.Datetime.now()
+        rows = []
+        for event in events:
+            event_type = event.get("event_type")
+            severity = event.get("severity")
+            data = event.get("data")
+            ts = event.get("ts") or now
+            rows.append([
+                event["device_id"],
+                ts,
+                event_type if event_type in event_types else "info",
+                severity if severity in severities else "info",
+                event.get("subject"),
+                event.get("message"),
+                json.dumps(data) if data else None,
+                event.get("source"),
+                1,
+                ts,
+            ])
+        
+        self.flush_model()
+        window = self._dedup_window()
+        if window:
+            rows = self._suppress_duplicates(rows, now - timedelta(seconds=window))
+        
+        inserted = []
+        if rows:
+            uid = int(self.env.uid)
+            inserted = execute_values(
+                self._cr,
+                """
+                INSERT INTO mikrotik_event
+                    (device_id, ts, event_type, severity, subject, message, data_json, source,
+                     repeat_count, last_ts, create_uid, create_date, write_uid, write_date)
+                VALUES %s
+                RETURNING id, device_id, event_type, subject, ts
+                """,
+                rows,
+                template=(
+                    "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, "
+                    f"{uid}, (NOW() AT TIME ZONE 'UTC'), {uid}, (NOW() AT TIME ZONE 'UTC'))"
+                ),
+                page_size=len(rows),
+                fetch=True,
+            )
+            self.env["mikrotik.device"]._update_counters(
+                "event_count", Counter(row[0] for row in rows), increment=True,
+            )
+            if window:
+                self._dedup_register(inserted)
+        
+        self._flush_suppressed()
+        return len(inserted)
+
+    @api.model
+    def _dedup_window(self):
+        """Dedup window in seconds (0 disables deduplication)."""
+        return int(self.env["ir.config_parameter"].sudo().get_param(
+            "mikrotik_monitoring.event_dedup_window", 300
+        ))
+
+    @api.model
+    def _suppress_duplicates(self, rows, cutoff):
+        """Fold rows into open events for their key; return the rows to insert.
         
-        old_events = self.search([("ts", "<", cutoff)])
-        count = len(old_events)
-        old_events.unlink()
+        Args:
+            rows: event rows as built by log_events_bulk
+            cutoff: events first logged before this start a new row
+        """
+        dbname = self._cr.dbname
         
-        return count
+        # Collapse repeats inside the batch: first row wins, count the rest
+        groups = {}
+        for row in rows:
+            key = (row[0], row[2], row[4] or "")
+            group = groups.get(key)
+            if group is None:
+                groups[key] = row
+            else:
+                group[8] += 1
+                group[9] = max(group[9], row[1])
+        
+        # Fast path: keys with an open row known to this worker
+        misses = {}
+        with _dedup_lock:
+            for key, row in groups.items():
+                cached = _dedup_cache.get((dbname,) + key)
+                if cached and cached[1] >= cutoff:
+                    pending = _dedup_pending.setdefault((dbname, cached[0]), [0, row[9]])
+                    pending[0] += row[8]
+                    pending[1] = max(pending[1], row[9])
+                else:
+                    misses[key] = row
+        if not misses:
+            return []
+        
+        # Slow path: one query for the open rows of all other keys
+        found = execute_values(
+            self._cr,
+            """
+            SELECT DISTINCT ON (e.device_id, e.event_type, COALESCE(e.subject, ''))
+                   e.id, e.device_id, e.event_type, COALESCE(e.subject, ''), e.ts
+              FROM mikrotik_event e
+              JOIN (VALUES %s) AS k(device_id, event_type, subject, cutoff)
+                ON e.device_id = k.device_id
+               AND e.event_type = k.event_type
+               AND COALESCE(e.subject, '') = k.subject
+             WHERE e.ts >= k.cutoff
+             ORDER BY e.device_id, e.event_type, COALESCE(e.subject, ''), e.ts DESC
+            """,
+            [key + (cutoff,) for key in misses],
+            template="(%s::int, %s::varchar, %s::varchar, %s::timestamp)",
+            page_size=len(misses),
+            fetch=True,
+        )
+        repeats = []
+        for event_id, device_id, event_type, subject, _ts in found:
+            row = misses.pop((device_id, event_type, subject))
+            repeats.append((event_id, row[8], row[9]))
+        self._apply_repeats(repeats)
+        self._dedup_register(found)
+        return list(misses.values())
+
+    @api.model
+    def _apply_repeats(self, repeats):
+        """Add (event_id, count, last_ts) repeats to existing rows in one UPDATE."""
+        if not repeats:
+            return
+        execute_values(
+            self._cr,
+            """
+            UPDATE mikrotik_event e
+               SET repeat_count = COALESCE(e.repeat_count, 1) + v.count,
+                   last_ts = GREATEST(e.last_ts, v.last_ts)
+              FROM (VALUES %s) AS v(id, count, last_ts)
+             WHERE e.id = v.id
+            """,
+            sorted(repeats),
+            template="(%s::int, %s::int, %s::timestamp)",
+            page_size=len(repeats),
+        )
+        self.invalidate_model(["repeat_count", "last_ts"])
+
+    @api.model
+    def _dedup_register(self, rows):
+        """Publish (id, device_id, event_type, subject, ts) to the fast path after commit."""
+        dbname = self._cr.dbname
+        entries = {
+            (dbname, device_id, event_type, subject or ""): (event_id, ts)
+            for event_id, device_id, event_type, subject, ts in rows
+        }
+        
+        def register():
+            with _dedup_lock:
+                _dedup_cache.update(entries)
+        
+        self._cr.postcommit.add(register)
+
+    @api.model
+    def _flush_suppressed(self, force=False):
+        """Write repeats counted in memory for this database."""
+        dbname = self._cr.dbname
+        with _dedup_lock:
+            if not force and time.monotonic() - _dedup_flushed.get(dbname, 0) < DEDUP_FLUSH_INTERVAL:
+                return 0
+            _dedup_flushed[dbname] = time.monotonic()
+            repeats = [
+                (event_id, count, last_ts)
+                for (db, event_id), (count, last_ts) in list(_dedup_pending.items())
+                if db == dbname
+            ]
+            for event_id, _count, _last_ts in repeats:
+                del _dedup_pending[(dbname, event_id)]
+            # Drop fast-path entries whose window has long passed
+            horizon = fields.Datetime.now() - timedelta(seconds=max(self._dedup_window(), 60) * 2)
+            for key in [k for k, v in _dedup_cache.items() if k[0] == dbname and v[1] < horizon]:
+                del _dedup_cache[key]
+        self._apply_repeats(repeats)
+        return len(repeats)
+
+    @api.model
+    def _retention_days(self):
+        """Return {severity: retention_days} from system parameters.
+        
+        mikrotik_monitoring.event_retention_days.<severity> overrides the
+        general mikrotik_monitoring.event_retention_days (default 180).
+        """
+        IrParam = self.env["ir.config_parameter"].sudo()
+        default = int(IrParam.get_param("mikrotik_monitoring.event_retention_days", 180))
+        return {
+            severity: int(IrParam.get_param(f"mikrotik_monitoring.event_retention_days.{severity}", default))
+            for severity, _label in self._fields["severity"].selection
+        }
+
+    @api.model
+    def cleanup_old_events(self, retention_days=None, chunk_size=10000, commit=False):
+        """Delete events older than their severity's retention period.
+        
+        On the partitioned table monthly partitions older than the longest
+        retention are dropped outright. Rows of severities with a shorter
+        retention (and everything on non-partitioned installs) are removed
+        with chunked SQL deletes, so memory use stays flat.
+        
+        Args:
+            retention_days: optional retention applied to every severity
+            chunk_size: rows deleted per statement
+            commit: commit between chunks (cron only)
+        
+        Returns:
+            Number of rows deleted, excluding dropped partitions
+        """
+        now = datetime.utcnow()
+        if retention_days is None:
+            retention = self._retention_days()
+        else:
+            retention = {severity: retention_days for severity, _label in self._fields["severity"].selection}
+        
+        self.flush_model()
+        dropped = 0
+        if self._partition_is_partitioned():
+            longest = max(retention.values())
+            dropped = self._partition_drop_before(
+                self._partition_floor(now - timedelta(days=longest))
+            )
+        
+        cr = self._cr
+        deleted = 0
+        for severity, days in sorted(retention.items()):
+            cutoff = now - timedelta(days=days)
+            while True:
+                cr.execute(
+                    """
+                    DELETE FROM mikrotik_event
+                     WHERE ts < %s
+                       AND (id, ts) IN (
+                        SELECT id, ts FROM mikrotik_event
+                         WHERE severity = %s AND ts < %s
+                         LIMIT %s
+                     )
+                    """,
+                    (cutoff, severity, cutoff, chunk_size),
+                )
+                deleted += cr.rowcount
+                if commit:
+                    cr.commit()
+                if cr.rowcount < chunk_size:
+                    break
+        
+        self.invalidate_model()
+        if dropped or deleted:
+            # Partition drops and SQL deletes bypass unlink()
+            devices = self.env["mikrotik.device"].search([])
+            self.env.add_to_compute(devices._fields["event_count"], devices)
+            devices.flush_recordset(["event_count"])
+            _logger.info("Event retention: dropped %d partitions, deleted %d rows", dropped, deleted)
+        
+        return deleted
+
+    @api.model
+    def _cron_cleanup_events(self):
+        """Premake monthly partitions and apply event retention."""
+        self._partition_ensure()
+        return self.cleanup_old_events(commit=True)
@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import math
+from datetime import datetime
+
+from psycopg2.extensions import TransactionRollbackError
+
+from odoo import api, fields, models
+
+from .mikrotik_device import UPTIME_METRIC_KEYS
+
+_logger = logging.getLogger(__name__)
+
+
+class MikrotikIngest(models.AbstractModel):
+    """Set-based ingestion engine for collector payloads.
+
+    Resolves every device UID and metric key of a request up front,
+    then writes the whole batch with a handful of statements instead
+    of a search/write per metric:
+    - device UIDs resolved from the cached UID map
+    - one query for all metric keys (missing keys auto-created)
+    - one multi-row INSERT into mikrotik.metric.point
+    - one UPSERT into mikrotik.metric.latest
+    - one UPDATE of device last_seen (ORM only on state transitions)
+
+    Payloads are validated one by one: a bad timestamp, metric key or
+    value rejects only its own device, reported in "errors".
+    """
+
+    _name = "mikrotik.ingest"
+    _description = "MikroTik Ingestion Engine"
+
+    @api.model
+    def ingest_metrics(self, devices_data):
+        """Ingest a full collector request.
+
+        Args:
+            devices_data: list of dicts with keys device_uid, ts, metrics
+
+        Returns:
+            dict with:
+                metrics_processed: number of points stored
+                errors: list of {"device_uid", "error"} for rejected payloads
+                devices: list of (device_id, ts_collected, metrics) for the
+                    payloads that were stored, in request order
+        """
+        errors = []
+        payloads = []
+        for device_data in devices_data:
+            device_uid = device_data.get("device_uid")
+            metrics = device_data.get("metrics") or {}
+            if not device_uid or not metrics:
+                continue
+            try:
+                ts_collected = self._parse_ts(device_data.get("ts"))
+                split = self._split_payload(metrics)
+            except (TypeError, ValueError, AttributeError, OverflowError) as e:
+                errors.append({"device_uid": device_uid, "error": str(e)})
+                _logger.warning("Error processing device %s: %s", device_uid, str(e))
+                continue
+            payloads.append((device_uid, ts_collected, metrics, split))
+
+        if not payloads:
+            return {"metrics_processed": 0, "errors": errors, "devices": []}
+
+        # Resolve all device UIDs in one query
+        device_ids = self._resolve_devices({p[0] for p in payloads})
+
+        resolved = []
+        for device_uid, ts_collected, metrics, split in payloads:
+            device_id = device_ids.get(device_uid)
+            if not device_id:
+                _logger.debug("Unknown device UID: %s", device_uid)
+                continue
+            resolved.append((device_id, ts_collected, metrics, split))
+
+        # Resolve all base keys in one query
+        resolved, metric_ids = self._resolve_metric_ids(resolved, errors)
+        if not resolved:
+            return {"metrics_processed": 0, "errors": errors, "devices": []}
+
+        points = []
+        latest = {}
+        for device_id, ts_collected, metrics, split in resolved:
+            for base_key, interface_name, value_float, value_text in split:
+                points.append({
+                    "device_id": device_id,
+                    "metric_id": metric_ids[base_key],
+                    "interface_name": interface_name,
+                    "ts_collected": ts_collected,
+                    "value_float": value_float,
+                    "value_text": value_text,
+                })
+                # Last payload wins if a device appears twice in one request
+                latest[(device_id, base_key, interface_name or "")] = (
+                    device_id, base_key, interface_name,
+                    ts_collected, value_float, value_text,
+                )
+
+        self._update_device_heartbeat(resolved)
+
+        count = self.env["mikrotik.metric.point"].bulk_create(points)
+        self.env["mikrotik.metric.latest"]._bulk_upsert(list(latest.values()))
+        
+        uptimes = {
+            row[0]: int(row[4])
+            for row in latest.values()
+            if row[1] in UPTIME_METRIC_KEYS and row[4] is not None
+        }
+        self.env["mikrotik.device"]._update_counters("uptime_seconds", uptimes)
+        
+        Interface = self.env["mikrotik.interface"]
+        if Interface._rate_mirror_enabled():
+            Interface._refresh_rate_mirror(self._interface_rates(latest.values()))
+
+        return {
+            "metrics_processed": count,
+            "errors": errors,
+            "devices": [(r[0], r[1], r[2]) for r in resolved],
+        }
+
+    @staticmethod
+    def _interface_rates(latest_rows):
+        """Collect (device_id, interface, rx_bps, tx_bps, ts) from latest rows."""
+        rates = {}
+        for device_id, base_key, interface_name, ts_collected, value_float, _text in latest_rows:
+            if not interface_name or base_key not in ("iface.rx_bps", "iface.tx_bps"):
+                continue
+            entry = rates.setdefault((device_id, interface_name), [device_id, interface_name, None, None, ts_collected])
+            entry[2 if base_key == "iface.rx_bps" else 3] = value_float
+            entry[4] = max(entry[4], ts_collected)
+        return [tuple(entry) for entry in rates.values()]
+
+    @api.model
+    def _expand_compact(self, devices_data):
+        """Translate compact payloads (catalog IDs) into regular ones.
+        
+        Args:
+            devices_data: list of dicts with keys device_uid, ts and
+                metrics as [[metric_id, interface_name or None, value], ...]
+        
+        Returns:
+            (devices_data, errors) where devices_data uses metric keys as
+            accepted by ingest_metrics
+        """
+        id_to_key = {
+            metric_id: key
+            for key, metric_id in self.env["mikrotik.metric.catalog"]._get_key_id_map().items()
+        }
+        errors = []
+        result = []
+        for device_data in devices_data:
+            device_uid = device_data.get("device_uid")
+            metrics = {}
+            unknown = set()
+            for entry in device_data.get("metrics") or []:
+                try:
+                    metric_id, interface_name, value = entry
+                    base_key = id_to_key.get(metric_id)
+                except (TypeError, ValueError):
+                    base_key = None
+                if base_key is None:
+                    unknown.add(str(entry[0] if isinstance(entry, (list, tuple)) and entry else entry))
+                    continue
+                metrics[self._join_metric_key(base_key, interface_name)] = value
+            if unknown:
+                errors.append({
+                    "device_uid": device_uid,
+                    "error": f"Unknown metric ids: {', '.join(sorted(unknown))}",
+                })
+            result.append({
+                "device_uid": device_uid,
+                "ts": device_data.get("ts"),
+                "metrics": metrics,
+            })
+        return result, errors
+
+    @api.model
+    def _resolve_devices(self, device_uids):
+        """Return {device_uid: device_id} for the given UIDs from the device cache."""
+        resolved = self.env["mikrotik.device"].resolve_uids(device_uids)
+        return {uid: entry[0] for uid, entry in resolved.items()}
+
+    @api.model
+    def _update_device_heartbeat(self, resolved):
+        """Mark devices as seen at the latest timestamp of their payloads."""
+        last_seen = {}
+        for device_id, ts_collected, _metrics, _split in resolved:
+            if device_id not in last_seen or ts_collected > last_seen[device_id]:
+                last_seen[device_id] = ts_collected
+        return self.env["mikrotik.device"]._record_heartbeats(last_seen)
+
+    @staticmethod
+    def _parse_ts(ts_str):
+        """Parse an ISO timestamp or epoch seconds into a naive UTC datetime (Odoo convention).
+
+        Raises:
+            ValueError: malformed string or out-of-range epoch value
+        """
+        if not ts_str:
+            return fields.Datetime.now()
+        if isinstance(ts_str, (int, float)):
+            try:
+                return datetime.utcfromtimestamp(ts_str)
+            except (OverflowError, OSError, ValueError) as e:
+                raise ValueError(f"timestamp out of range: {ts_str}") from e
+        ts_collected = datetime.fromisoformat(ts_str.replace("Z", "+00:00"))
+        if ts_collected.tzinfo is not None:
+            ts_collected = ts_collected.replace(tzinfo=None)
+        return ts_collected
+
+    @api.model
+    def _split_payload(self, metrics):
+        """Validate the metrics of one payload and split them for storage.
+
+        Raises:
+            TypeError, ValueError: metrics is not a dict, or holds an
+                invalid key or value
+
+        Returns:
+            list of tuples (base_key, interface_name, value_float, value_text)
+        """
+        if not isinstance(metrics, dict):
+            raise TypeError("metrics must be an object")
+        split = []
+        for metric_key, value in metrics.items():
+            if not isinstance(metric_key, str) or not metric_key.strip():
+                raise ValueError(f"invalid metric key: {metric_key!r}")
+            if isinstance(value, (dict, list)) or (
+                isinstance(value, float) and not math.isfinite(value)
+            ):
+                raise ValueError(f"invalid value for {metric_key}: {value!r}")
+            split.append(self._split_metric_key(metric_key) + self._split_value(value))
+        return split
+
+    @api.model
+    def _resolve_metric_ids(self, resolved, errors):
+        """Resolve the catalog ids of all payloads, isolating rejected keys.
+
+        All keys go in one call; if the catalog rejects it, each device is
+        resolved in its own savepoint and failing devices are dropped into
+        errors.
+
+        Returns:
+            (resolved payloads that can be stored, {base_key: metric_id})
+        """
+        Catalog = self.env["mikrotik.metric.catalog"]
+        base_keys = {s[0] for payload in resolved for s in payload[3]}
+        try:
+            with self.env.cr.savepoint():
+                return resolved, Catalog.get_metric_ids(base_keys)
+        except TransactionRollbackError:
+            raise
+        except Exception:
+            _logger.warning("Metric catalog rejected a batch, resolving per device", exc_info=True)
+
+        kept = []
+        metric_ids = {}
+        for payload in resolved:
+            try:
+                with self.env.cr.savepoint():
+                    metric_ids.update(Catalog.get_metric_ids({s[0] for s in payload[3]}))
+            except TransactionRollbackError:
+                raise
+            except Exception as e:
+                device_uid = self.env["mikrotik.device"].browse(payload[0]).device_uid
+                errors.append({"device_uid": device_uid, "error": str(e)})
+                _logger.warning("Error processing device %s: %s", device_uid, e)
+                continue
+            kept.append(payload)
+        return kept, metric_ids
+
+    @staticmethod
+    def _split_metric_key(metric_key):
+        """Split "iface.ether1.rx_bps" into ("iface.rx_bps", "ether1").
+
+        Non-interface keys are returned unchanged with no interface.
+        """
+        if metric_key.startswith("iface.") and metric_key.count(".") >= 2:
+            parts = metric_key.split(".", 2)
+            return f"iface.{parts[2]}", parts[1]
+        return metric_key, None
+
+    @staticmethod
+    def _join_metric_key(base_key, interface_name):
+        """Inverse of _split_metric_key: ("iface.rx_bps", "ether1") -> "iface.ether1.rx_bps"."""
+        if interface_name and base_key.startswith("iface."):
+            return f"iface.{interface_name}.{base_key[6:]}"
+        return base_key
+
+    @staticmethod
+    def _split_value(value):
+        """Return (value_float, value_text) for a raw metric value."""
+        if value is None:
+            return None, None
+        if isinstance(value, (int, float)):
+            return float(value), None
+        return None, str(value)
@@ -1,7 +1,16 @@
 # -*- coding: utf-8 -*-
 
+import logging
+
+from psycopg2.extras import execute_values
+
 from odoo import api, fields, models
 
+_logger = logging.getLogger(__name__)
+
+# Columns compared to detect changed interfaces, in payload tuple order
+INTERFACE_SYNC_FIELDS = ["interface_type", "is_enabled", "is_running", "mac_address", "mtu"]
+
 
 class MikrotikInterface(models.Model):
     """Router interface inventory and current state."""
@@ -111,6 +120,26 @@ class MikrotikInterface(models.Model):
         string="Last Seen",
         help="Last time data was collected from this interface",
     )
+    
+    # Stored mirror of the current rates, refreshed in bulk by ingestion
+    # when mikrotik_monitoring.interface_rate_mirror is enabled
+    current_rx_bps = fields.Float(
+        string="Current RX (bps)",
+        readonly=True,
+    )
+    current_tx_bps = fields.Float(
+        string="Current TX (bps)",
+        readonly=True,
+    )
+    current_total_bps = fields.Float(
+        string="Current Load (bps)",
+        readonly=True,
+        index=True,
+    )
+    rates_updated_at = fields.Datetime(
+        string="Rates Updated",
+        readonly=True,
+    )
 
     _sql_constraints = [
         (
@@ -122,39 +151,97 @@ class MikrotikInterface(models.Model):
 
     def _compute_traffic(self):
         MetricLatest = self.env["mikrotik.metric.latest"]
+        rates = {}
+        ifaces = self.filtered("device_id")
+        if ifaces:
+            # One query for the whole recordset
+            MetricLatest.flush_model()
+            self.env.cr.execute(
+                """
+                SELECT device_id, interface_name, metric_key, value_float
+                  FROM mikrotik_metric_latest
+                 WHERE device_id = ANY(%s)
+                   AND interface_name = ANY(%s)
+                   AND metric_key IN ('iface.rx_bps', 'iface.tx_bps')
+                """,
+                (list(set(ifaces.device_id.ids)), list(set(ifaces.mapped("name")))),
+            )
+            for device_id, interface_name, metric_key, value in self.env.cr.fetchall():
+                rates[(device_id, interface_name, metric_key)] = value or 0
+        
         for iface in self:
-            rx_metric = MetricLatest.search([
-                ("device_id", "=", iface.device_id.id),
-                ("metric_key", "=", "iface.rx_bps"),
-                ("interface_name", "=", iface.name),
-            ], limit=1)
-            tx_metric = MetricLatest.search([
-                ("device_id", "=", iface.device_id.id),
-                ("metric_key", "=", "iface.tx_bps"),
-                ("interface_name", "=", iface.name),
-            ], limit=1)
-            
-            iface.rx_bps = rx_metric.value_float if rx_metric else 0
-            iface.tx_bps = tx_metric.value_float if tx_metric else 0
+            key = (iface.device_id.id, iface.name)
+            iface.rx_bps = rates.get(key + ("iface.rx_bps",), 0)
+            iface.tx_bps = rates.get(key + ("iface.tx_bps",), 0)
             iface.rx_bps_display = MetricLatest._format_bps(iface.rx_bps)
             iface.tx_bps_display = MetricLatest._format_bps(iface.tx_bps)
 
+    @api.model
+    def _rate_mirror_enabled(self):
+        value = self.env["ir.config_parameter"].sudo().get_param(
+            "mikrotik_monitoring.interface_rate_mirror", "False"
+        )
+        return value.lower() in ("1", "true", "yes")
+
+    @api.model
+    def _refresh_rate_mirror(self, rows):
+        """Update the stored current rates of many interfaces in one statement.
+        
+        Args:
+            rows: list of tuples (device_id, interface_name, rx_bps, tx_bps, ts);
+                a None rate keeps the stored value
+        
+        Returns:
+            Number of interfaces updated
+        """
+        if not rows:
+            return 0
+        self.flush_model(["current_rx_bps", "current_tx_bps", "current_total_bps", "rates_updated_at"])
+        result = execute_values(
+            self._cr,
+            """
+            UPDATE mikrotik_interface i
+               SET current_rx_bps = COALESCE(v.rx, i.current_rx_bps),
+                   current_tx_bps = COALESCE(v.tx, i.current_tx_bps),
+                   current_total_bps = COALESCE(v.rx, i.current_rx_bps, 0)
+                                     + COALESCE(v.tx, i.current_tx_bps, 0),
+                   rates_updated_at = v.ts
+              FROM (VALUES %s) AS v(device_id, name, rx, tx, ts)
+             WHERE i.device_id = v.device_id AND i.name = v.name
+         RETURNING i.id
+            """,
+            sorted(rows, key=lambda r: (r[0], r[1])),
+            template="(%s::int, %s::varchar, %s::float8, %s::float8, %s::timestamp)",
+            page_size=len(rows),
+            fetch=True,
+        )
+        self.invalidate_model(["current_rx_bps", "current_tx_bps", "current_total_bps", "rates_updated_at"])
+        return len(result)
+
     @api.model
     def sync_from_router(self, device_id, interfaces_data):
         """Sync interface inventory from router data.
         
+        Diff-based: existing interfaces are read in one query, new ones
+        inserted in one statement and only changed rows updated in one
+        statement, which also stamps last_link_up/last_link_down on
+        running-state transitions. Interfaces that disappeared are disabled
+        in one statement (not deleted, to preserve history). Running-state
+        transitions of interfaces that already existed are logged as
+        interface_up/interface_down events.
+        
         Args:
             device_id: ID of the device
             interfaces_data: list of dicts with interface info from RouterOS
-        """
-        existing = {i.name: i for i in self.search([("device_id", "=", device_id)])}
         
-        seen_names = set()
+        Returns:
+            dict with created, updated, disabled and unchanged counts
+        """
+        incoming = {}
         for iface_data in interfaces_data:
             name = iface_data.get("name")
             if not name:
                 continue
-            seen_names.add(name)
             
             # Handle both collector format and raw RouterOS format
             is_enabled = iface_data.get("is_enabled")
@@ -174,26 +261,128 @@ class MikrotikInterface(models.Model):
             except (ValueError, TypeError):
                 mtu = 1500
             
-            vals = {
-                "device_id": device_id,
-                "name": name,
-                "interface_type": self._detect_type(iface_data.get("type", "")),
-                "is_enabled": bool(is_enabled),
-                "is_running": bool(is_running),
-                "mac_address": mac_address,
-                "mtu": mtu,
-            }
-            
-            if name in existing:
-                existing[name].write(vals)
-            else:
-                self.create(vals)
-        
-        # Mark interfaces not seen as disabled (don't delete to preserve history)
-        for name, iface in existing.items():
-            if name not in seen_names:
-                iface.is_enabled = False
-                iface.is_running = False
+            incoming[name] = (
+                self._detect_type(iface_data.get("type", "")),
+                bool(is_enabled),
+                bool(is_running),
+                mac_address or None,
+                mtu,
+            )
+        
+        self.flush_model()
+        cr = self._cr
+        columns = ", ".join(INTERFACE_SYNC_FIELDS)
+        cr.execute(
+            f"SELECT name, {columns} FROM mikrotik_interface WHERE device_id = %s",
+            (device_id,),
+        )
+        existing = {row[0]: tuple(row[1:]) for row in cr.fetchall()}
+        
+        new_rows = []
+        changed_rows = []
+        # (name, is_running) for running-state transitions
+        transitions = []
+        for name, values in incoming.items():
+            old = existing.get(name)
+            if old is None:
+                # Creation is not a link-state change: no event logged
+                new_rows.append((device_id, name) + values)
+                continue
+            if old != values:
+                changed_rows.append((device_id, name) + values)
+                if bool(old[2]) != values[2]:
+                    transitions.append((name, values[2]))
+        
+        # Interfaces gone from the router: disabled and, if running, down
+        gone = [
+            name for name, old in existing.items()
+            if name not in incoming and (old[1] or old[2])
+        ]
+        transitions.extend((name, False) for name in gone if existing[name][2])
+        
+        uid = int(self.env.uid)
+        now_sql = "(NOW() AT TIME ZONE 'UTC')"
+        
+        if new_rows:
+            execute_values(
+                cr,
+                f"""
+                INSERT INTO mikrotik_interface
+                    (device_id, name, {columns}, last_link_up,
+                     collection_tier, t0_enabled,
+                     create_uid, create_date, write_uid, write_date)
+                VALUES %s
+                ON CONFLICT (device_id, name) DO NOTHING
+                """,
+                [row + (row[4],) for row in new_rows],
+                template=(
+                    "(%s, %s, %s, %s, %s, %s, %s, "
+                    f"CASE WHEN %s THEN {now_sql} END, 'auto', false, "
+                    f"{uid}, {now_sql}, {uid}, {now_sql})"
+                ),
+                page_size=len(new_rows),
+            )
+        
+        if changed_rows:
+            assignments = ", ".join(f"{name} = v.{name}" for name in INTERFACE_SYNC_FIELDS)
+            execute_values(
+                cr,
+                f"""
+                UPDATE mikrotik_interface i
+                   SET {assignments},
+                       last_link_up = CASE WHEN v.is_running AND NOT COALESCE(i.is_running, false)
+                                           THEN {now_sql} ELSE i.last_link_up END,
+                       last_link_down = CASE WHEN NOT v.is_running AND COALESCE(i.is_running, false)
+                                             THEN {now_sql} ELSE i.last_link_down END,
+                       write_uid = {uid},
+                       write_date = {now_sql}
+                  FROM (VALUES %s) AS v(device_id, name, {columns})
+                 WHERE i.device_id = v.device_id AND i.name = v.name
+                """,
+                changed_rows,
+                template="(%s::int, %s::varchar, %s::varchar, %s::boolean, %s::boolean, %s::varchar, %s::int)",
+                page_size=len(changed_rows),
+            )
+        
+        if gone:
+            cr.execute(
+                f"""
+                UPDATE mikrotik_interface
+                   SET is_enabled = false,
+                       is_running = false,
+                       last_link_down = CASE WHEN is_running THEN {now_sql} ELSE last_link_down END,
+                       write_uid = %s,
+                       write_date = {now_sql}
+                 WHERE device_id = %s AND name = ANY(%s)
+                """,
+                (uid, device_id, gone),
+            )
+        
+        self.invalidate_model()
+        if new_rows:
+            # Stored interface_count depends on interface_ids
+            self.env["mikrotik.device"].browse(device_id).modified(["interface_ids"])
+        
+        if transitions:
+            self.env["mikrotik.event"].log_events_bulk([
+                {
+                    "device_id": device_id,
+                    "event_type": "interface_up" if running else "interface_down",
+                    "severity": "info" if running else "warning",
+                    "subject": name,
+                    "message": f"Interface {name} is {'up' if running else 'down'}",
+                }
+                for name, running in transitions
+            ])
+        
+        summary = {
+            "created": len(new_rows),
+            "updated": len(changed_rows),
+            "disabled": len(gone),
+            "unchanged": len(incoming) - len(new_rows) - len(changed_rows),
+        }
+        _logger.debug("Interface sync for device %s: %s", device_id, summary)
+        return summary
 
     def _detect_type(self, ros_type):
         """Map RouterOS type to our selection."""
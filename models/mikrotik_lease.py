@@ -1,7 +1,18 @@
 # -*- coding: utf-8 -*-
 
+import hashlib
+import logging
+from datetime import timedelta
+
+from psycopg2.extras import execute_values
+
 from odoo import api, fields, models
 
+_logger = logging.getLogger(__name__)
+
+# Columns compared through sync_hash, in hashing order
+LEASE_SYNC_FIELDS = ["mac_address", "client_id", "hostname", "server", "status", "is_static"]
+
 
 class MikrotikLease(models.Model):
     """DHCP Lease current state table.
@@ -66,6 +77,13 @@ class MikrotikLease(models.Model):
         string="Static Binding",
         default=False,
     )
+    
+    # Hash of LEASE_SYNC_FIELDS, used to skip unchanged leases on sync
+    sync_hash = fields.Char(
+        string="Sync Hash",
+        readonly=True,
+        copy=False,
+    )
 
     _sql_constraints = [
         (
@@ -75,45 +93,171 @@ class MikrotikLease(models.Model):
         ),
     ]
 
+    # Unchanged leases only get last_seen refreshed once per this interval
+    _LAST_SEEN_REFRESH = timedelta(minutes=5)
+
     @api.model
     def sync_leases(self, device_id, leases_data):
         """Sync lease table from router data.
         
+        Set-based: existing rows are read in one query, new leases are
+        inserted in one statement, changed leases (by sync_hash) updated
+        in one statement and vanished leases expired in one statement.
+        Unchanged leases are not written except for a periodic last_seen
+        refresh. Assignments, expiries and MAC changes found by the diff
+        are appended to mikrotik.lease.history.
+        
         Args:
             device_id: ID of the device
             leases_data: list of dicts with lease info from RouterOS
+        
+        Returns:
+            dict with created, updated, expired and unchanged counts
         """
-        # Get existing leases
-        existing = {l.address: l for l in self.search([("device_id", "=", device_id)])}
+        now = fields.Datetime.now()
         
-        seen_addresses = set()
+        # Normalise payload, last entry wins per address
+        incoming = {}
         for lease in leases_data:
             addr = lease.get("address")
             if not addr:
                 continue
-            seen_addresses.add(addr)
-            
-            vals = {
-                "device_id": device_id,
-                "address": addr,
-                "mac_address": lease.get("mac-address"),
-                "client_id": lease.get("client-id"),
-                "hostname": lease.get("host-name"),
-                "server": lease.get("server"),
-                "status": self._map_status(lease.get("status", "bound")),
-                "last_seen": fields.Datetime.now(),
-                "is_static": lease.get("dynamic") == "false",
-            }
-            
-            if addr in existing:
-                existing[addr].write(vals)
-            else:
-                self.create(vals)
+            values = (
+                lease.get("mac-address"),
+                lease.get("client-id"),
+                lease.get("host-name"),
+                lease.get("server"),
+                self._map_status(lease.get("status", "bound")),
+                lease.get("dynamic") == "false",
+            )
+            incoming[addr] = values + (self._lease_hash(values),)
+        
+        self.flush_model()
+        cr = self._cr
+        cr.execute(
+            "SELECT address, sync_hash, mac_address, status FROM mikrotik_lease WHERE device_id = %s",
+            (device_id,),
+        )
+        existing = {row[0]: row[1:] for row in cr.fetchall()}
+        
+        new_rows = []
+        changed_rows = []
+        # (device_id, ts, change_type, address, mac_address, prev_mac_address, hostname)
+        history = []
+        for addr, values in incoming.items():
+            mac, hostname = values[0], values[2]
+            if addr not in existing:
+                new_rows.append((device_id, addr) + values)
+                history.append((device_id, now, "assigned", addr, mac, None, hostname))
+                continue
+            old_hash, old_mac, old_status = existing[addr]
+            if old_hash == values[-1]:
+                continue
+            changed_rows.append((device_id, addr) + values)
+            if old_status == "expired":
+                history.append((device_id, now, "assigned", addr, mac, None, hostname))
+            elif old_mac != mac:
+                history.append((device_id, now, "mac_changed", addr, mac, old_mac, hostname))
+        
+        uid = int(self.env.uid)
+        columns = ", ".join(LEASE_SYNC_FIELDS)
+        placeholders = "%s, %s, %s, %s, %s, %s, %s, %s, %s"
+        
+        if new_rows:
+            execute_values(
+                cr,
+                f"""
+                INSERT INTO mikrotik_lease
+                    (device_id, address, {columns}, sync_hash, last_seen,
+                     create_uid, create_date, write_uid, write_date)
+                VALUES %s
+                ON CONFLICT (device_id, address) DO NOTHING
+                """,
+                new_rows,
+                template=(
+                    f"({placeholders}, (NOW() AT TIME ZONE 'UTC'), "
+                    f"{uid}, (NOW() AT TIME ZONE 'UTC'), {uid}, (NOW() AT TIME ZONE 'UTC'))"
+                ),
+                page_size=len(new_rows),
+            )
+            self.env["mikrotik.device"]._update_counters(
+                "lease_count", {device_id: cr.rowcount}, increment=True,
+            )
+        
+        if changed_rows:
+            assignments = ", ".join(f"{name} = v.{name}" for name in LEASE_SYNC_FIELDS)
+            execute_values(
+                cr,
+                f"""
+                UPDATE mikrotik_lease l
+                   SET {assignments},
+                       sync_hash = v.sync_hash,
+                       last_seen = (NOW() AT TIME ZONE 'UTC'),
+                       write_uid = {uid},
+                       write_date = (NOW() AT TIME ZONE 'UTC')
+                  FROM (VALUES %s) AS v(device_id, address, {columns}, sync_hash)
+                 WHERE l.device_id = v.device_id AND l.address = v.address
+                """,
+                changed_rows,
+                template=(
+                    "(%s::int, %s::varchar, %s::varchar, %s::varchar, %s::varchar, "
+                    "%s::varchar, %s::varchar, %s::boolean, %s::varchar)"
+                ),
+                page_size=len(changed_rows),
+            )
+        
+        # Expire everything the router no longer reports; the hash is
+        # cleared so a returning lease is picked up as changed
+        cr.execute(
+            """
+            UPDATE mikrotik_lease
+               SET status = 'expired', sync_hash = NULL, write_uid = %s, write_date = %s
+             WHERE device_id = %s
+               AND status != 'expired'
+               AND NOT (address = ANY(%s))
+         RETURNING address, mac_address, hostname
+            """,
+            (uid, now, device_id, list(incoming)),
+        )
+        expired_rows = cr.fetchall()
+        expired = len(expired_rows)
+        history.extend(
+            (device_id, now, "expired", addr, mac, None, hostname)
+            for addr, mac, hostname in expired_rows
+        )
         
-        # Mark expired leases
-        for addr, lease in existing.items():
-            if addr not in seen_addresses:
-                lease.status = "expired"
+        # Keep last_seen meaningful for unchanged leases without
+        # rewriting them on every poll
+        cr.execute(
+            """
+            UPDATE mikrotik_lease
+               SET last_seen = %s
+             WHERE device_id = %s
+               AND address = ANY(%s)
+               AND last_seen < %s
+            """,
+            (now, device_id, list(incoming), now - self._LAST_SEEN_REFRESH),
+        )
+        
+        self.invalidate_model()
+        
+        # Churn log, same transaction as the lease changes
+        self.env["mikrotik.lease.history"].log_changes(history)
+        
+        summary = {
+            "created": len(new_rows),
+            "updated": len(changed_rows),
+            "expired": expired,
+            "unchanged": len(incoming) - len(new_rows) - len(changed_rows),
+        }
+        _logger.debug("Lease sync for device %s: %s", device_id, summary)
+        return summary
+
+    @staticmethod
+    def _lease_hash(values):
+        """Return a stable hash of the significant lease fields."""
+        raw = "\x1f".join("" if v is None else str(v) for v in values)
+        return hashlib.md5(raw.encode()).hexdigest()
 
     def _map_status(self, ros_status):
         """Map RouterOS status to our selection."""
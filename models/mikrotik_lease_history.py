@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+import logging
+from datetime import datetime, timedelta
+
+from psycopg2.extras import execute_values
+
+from odoo import api, fields, models, tools
+
+_logger = logging.getLogger(__name__)
+
+
+class MikrotikLeaseHistory(models.Model):
+    """Append-only DHCP lease churn log.
+
+    One row per lease assignment, expiry or MAC change, written in bulk
+    by mikrotik.lease.sync_leases from its sync diff. Monthly partitions
+    keep retention a partition drop.
+    """
+
+    _name = "mikrotik.lease.history"
+    _inherit = ["mikrotik.partition.mixin"]
+    _description = "MikroTik DHCP Lease History"
+    _order = "ts desc, id desc"
+    _rec_name = "address"
+    _log_access = False
+
+    _partition_column = "ts"
+    _partition_interval = "month"
+    _partition_premake = 2
+
+    device_id = fields.Many2one(
+        "mikrotik.device",
+        string="Device",
+        required=True,
+        ondelete="cascade",
+    )
+    ts = fields.Datetime(
+        string="Timestamp",
+        required=True,
+        default=fields.Datetime.now,
+    )
+    change_type = fields.Selection(
+        [
+            ("assigned", "Assigned"),
+            ("expired", "Expired"),
+            ("mac_changed", "MAC Changed"),
+        ],
+        string="Change",
+        required=True,
+    )
+    address = fields.Char(
+        string="IP Address",
+        required=True,
+    )
+    mac_address = fields.Char(
+        string="MAC Address",
+        index=True,
+    )
+    prev_mac_address = fields.Char(
+        string="Previous MAC",
+    )
+    hostname = fields.Char(
+        string="Hostname",
+    )
+
+    def _auto_init(self):
+        res = super()._auto_init()
+        # "Who held this IP at time T" lookups
+        tools.create_index(
+            self._cr,
+            "mikrotik_lease_history_device_address_ts_idx",
+            self._table,
+            ["device_id", "address", "ts DESC"],
+        )
+        return res
+
+    @api.model
+    def log_changes(self, rows):
+        """Append lease changes in one multi-row INSERT.
+
+        Args:
+            rows: list of tuples
+                (device_id, ts, change_type, address, mac_address, prev_mac_address, hostname)
+
+        Returns:
+            Number of rows written
+        """
+        if not rows:
+            return 0
+        execute_values(
+            self._cr,
+            """
+            INSERT INTO mikrotik_lease_history
+                (device_id, ts, change_type, address, mac_address, prev_mac_address, hostname)
+            VALUES %s
+            """,
+            rows,
+            page_size=len(rows),
+        )
+        return len(rows)
+
+    @api.model
+    def get_holder(self, device_id, address, at):
+        """Return the lease holder of address at a point in time.
+
+        Args:
+            device_id: ID of the device
+            address: leased IP address
+            at: naive UTC datetime
+
+        Returns:
+            dict with mac_address, hostname and since, or None if the
+            address was not leased at that time
+        """
+        self.flush_model()
+        self._cr.execute(
+            """
+            SELECT change_type, mac_address, hostname, ts
+              FROM mikrotik_lease_history
+             WHERE device_id = %s AND address = %s AND ts <= %s
+             ORDER BY ts DESC, id DESC
+             LIMIT 1
+            """,
+            (device_id, address, at),
+        )
+        row = self._cr.fetchone()
+        if not row or row[0] == "expired":
+            return None
+        return {"mac_address": row[1], "hostname": row[2], "since": row[3]}
+
+    @api.model
+    def _cron_lease_history_retention(self):
+        """Premake monthly partitions and drop the expired ones."""
+        retention_days = int(self.env["ir.config_parameter"].sudo().get_param(
+            "mikrotik_monitoring.lease_history_retention_days", 365
+        ))
+        cutoff = self._partition_floor(datetime.utcnow() - timedelta(days=retention_days))
+        self._partition_ensure()
+        if self._partition_is_partitioned():
+            return self._partition_drop_before(cutoff)
+
+        self._cr.execute("DELETE FROM mikrotik_lease_history WHERE ts < %s", (cutoff,))
+        return self._cr.rowcount
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+from psycopg2.extensions import TransactionRollbackError
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+
+class MikrotikLivePublish(models.Model):
+    """Last live bus push per device, shared by all workers.
+
+    mikrotik.live.subscription.publish_updates claims the publish window
+    of a device here, so the push rate holds across workers and the
+    collector instead of per process, and the next push only carries
+    what was written since this one.
+    """
+
+    _name = "mikrotik.live.publish"
+    _description = "MikroTik Live Publish State"
+    _log_access = False
+
+    device_id = fields.Many2one(
+        "mikrotik.device",
+        string="Device",
+        required=True,
+        ondelete="cascade",
+    )
+    published_at = fields.Datetime(
+        string="Published At",
+        help="Transaction time of the last push; empty until the first one",
+    )
+
+    _sql_constraints = [
+        (
+            "device_uniq",
+            "UNIQUE(device_id)",
+            "Publish state must be unique per device.",
+        ),
+    ]
+
+    @api.model
+    def _claim(self, device_ids, min_gap, now):
+        """Open the publish window of devices last pushed min_gap seconds ago or more.
+
+        Runs on its own short cursor, so claims never conflict with the
+        calling ingest transaction. Rows another worker is claiming are
+        skipped (SKIP LOCKED); a claim losing a serialization race pushes
+        nothing and the next ingest tries again.
+
+        Args:
+            device_ids: iterable of device ids with updates to push
+            min_gap: seconds between two pushes of a device
+            now: transaction time of the caller, stored as the new push time
+
+        Returns:
+            dict {device_id: previous published_at or None} of the devices
+            the caller may push now
+        """
+        device_ids = sorted(device_ids)
+        try:
+            with self.pool.cursor() as cr:
+                cr.execute(
+                    """
+                    INSERT INTO mikrotik_live_publish (device_id)
+                    SELECT device_id FROM unnest(%s::int[]) AS device_id
+                    ON CONFLICT (device_id) DO NOTHING
+                    """,
+                    (device_ids,),
+                )
+                cr.commit()
+                cr.execute(
+                    """
+                    SELECT device_id, published_at
+                      FROM mikrotik_live_publish
+                     WHERE device_id = ANY(%s)
+                       AND (published_at IS NULL
+                            OR published_at <= %s - make_interval(secs => %s))
+                       FOR UPDATE SKIP LOCKED
+                    """,
+                    (device_ids, now, min_gap),
+                )
+                claimed = dict(cr.fetchall())
+                if claimed:
+                    cr.execute(
+                        "UPDATE mikrotik_live_publish SET published_at = %s WHERE device_id = ANY(%s)",
+                        (now, list(claimed)),
+                    )
+        except TransactionRollbackError as e:
+            _logger.debug("Live publish claim lost a race: %s", e)
+            return {}
+        return claimed
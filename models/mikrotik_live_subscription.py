@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+# Watched device ids, per worker process: dbname -> (monotonic time, frozenset)
+_watched_cache = {}
+_watched_lock = threading.Lock()
+
+# Seconds a worker reuses its watched set before re-reading the table
+WATCHED_CACHE_TTL = 5
+
+# Seconds before the previous push also re-sent: values of ingests still
+# running when that push read its snapshot carry an older write_date
+PUBLISH_OVERLAP = 2
+
+
+class MikrotikLiveSubscription(models.Model):
+    """Live dashboard viewers per device.
+
+    mikrotik_live.js registers one row per open dashboard (browser tab)
+    and renews it with a heartbeat; unmounting removes it. Rows whose
+    heartbeat stopped expire on their own. Ingest publishes bus updates
+    only for devices returned by get_watched_device_ids, so nothing is
+    written to bus_bus while nobody is watching; publish_updates also
+    throttles what is sent for watched ones (mikrotik.live.publish).
+    """
+
+    _name = "mikrotik.live.subscription"
+    _description = "MikroTik Live Dashboard Subscription"
+    _log_access = False
+
+    device_id = fields.Many2one(
+        "mikrotik.device",
+        string="Device",
+        required=True,
+        ondelete="cascade",
+        index=True,
+    )
+    user_id = fields.Many2one(
+        "res.users",
+        string="User",
+        required=True,
+        ondelete="cascade",
+    )
+    client_key = fields.Char(
+        string="Client Key",
+        required=True,
+        help="Random key identifying one open dashboard",
+    )
+    expires_at = fields.Datetime(
+        string="Expires At",
+        required=True,
+        index=True,
+    )
+
+    _sql_constraints = [
+        (
+            "subscription_uniq",
+            "UNIQUE(device_id, user_id, client_key)",
+            "Subscription must be unique per dashboard.",
+        ),
+    ]
+
+    @api.model
+    def _subscription_ttl(self):
+        """Seconds a subscription lives without a heartbeat."""
+        return int(self.env["ir.config_parameter"].sudo().get_param(
+            "mikrotik_monitoring.live_subscription_ttl", 90
+        ))
+
+    @api.model
+    def subscribe(self, device_id, client_key):
+        """Register or renew a live viewer of a device.
+
+        Called by the dashboard on mount and then as its heartbeat.
+
+        Args:
+            device_id: ID of the watched device
+            client_key: key of the calling dashboard
+
+        Returns:
+            dict with the ttl in seconds, so the client can pace its heartbeat
+        """
+        self.check_access_rights("read")
+        self.env["mikrotik.device"].browse(device_id).check_access_rule("read")
+        ttl = self._subscription_ttl()
+        expires_at = fields.Datetime.now() + timedelta(seconds=ttl)
+
+        self.env.cr.execute(
+            """
+            INSERT INTO mikrotik_live_subscription AS s
+                (device_id, user_id, client_key, expires_at)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (device_id, user_id, client_key) DO UPDATE SET
+                expires_at = EXCLUDED.expires_at
+            RETURNING (xmax = 0)
+            """,
+            (device_id, self.env.uid, client_key, expires_at),
+        )
+        if self.env.cr.fetchone()[0]:
+            # New viewer: make this worker see it on the next ingest
+            dbname = self.env.cr.dbname
+            self.env.cr.postcommit.add(lambda: _watched_cache.pop(dbname, None))
+        return {"ttl": ttl}
+
+    @api.model
+    def unsubscribe(self, device_id, client_key):
+        """Remove a live viewer of a device."""
+        self.env.cr.execute(
+            """
+            DELETE FROM mikrotik_live_subscription
+             WHERE device_id = %s AND user_id = %s AND client_key = %s
+            """,
+            (device_id, self.env.uid, client_key),
+        )
+        return True
+
+    @api.model
+    def get_watched_device_ids(self):
+        """Return the ids of devices with at least one live viewer.
+
+        Cached per worker for WATCHED_CACHE_TTL seconds: a new viewer may
+        miss the first few seconds of updates, which the dashboard covers
+        with its initial snapshot.
+
+        Returns:
+            frozenset of device ids
+        """
+        dbname = self.env.cr.dbname
+        now = time.monotonic()
+        with _watched_lock:
+            cached = _watched_cache.get(dbname)
+            if cached and now - cached[0] < WATCHED_CACHE_TTL:
+                return cached[1]
+
+        self.env.cr.execute(
+            """
+            SELECT DISTINCT device_id
+              FROM mikrotik_live_subscription
+             WHERE expires_at > (NOW() AT TIME ZONE 'UTC')
+            """
+        )
+        watched = frozenset(row[0] for row in self.env.cr.fetchall())
+        with _watched_lock:
+            _watched_cache[dbname] = (now, watched)
+        return watched
+
+    @api.model
+    def _cron_expire_subscriptions(self):
+        """Delete subscriptions whose heartbeat stopped."""
+        self.env.cr.execute(
+            """
+            DELETE FROM mikrotik_live_subscription
+             WHERE expires_at <= (NOW() AT TIME ZONE 'UTC')
+            """
+        )
+        return self.env.cr.rowcount
+
+    @api.model
+    def _publish_rate(self):
+        """Maximum bus updates per second and device."""
+        return float(self.env["ir.config_parameter"].sudo().get_param(
+            "mikrotik_monitoring.live_publish_rate", 1
+        )) or 1.0
+
+    @api.model
+    def publish_updates(self, updates):
+        """Push the metrics of watched devices written since their last push.
+
+        A device is pushed at most _publish_rate times per second across
+        all workers: its publish window is claimed in mikrotik.live.publish.
+        A push carries the mikrotik.metric.latest rows written since the
+        previous push (all of them for the first one), so changes ingested
+        while the window was closed, by any worker, reach the viewers with
+        the next push. All pushes of one call go out in a single _sendmany.
+
+        Args:
+            updates: list of tuples (device_id, ts_collected, metrics dict)
+                just written to mikrotik.metric.latest
+
+        Returns:
+            Number of bus notifications sent
+        """
+        watched = self.get_watched_device_ids()
+        device_ids = {update[0] for update in updates if update[0] in watched}
+        if not device_ids:
+            return 0
+        opened = self.env["mikrotik.live.publish"]._claim(
+            device_ids, 1.0 / self._publish_rate(), self.env.cr.now()
+        )
+        if not opened:
+            return 0
+
+        overlap = timedelta(seconds=PUBLISH_OVERLAP)
+        changed = self.env["mikrotik.metric.latest"]._changed_metrics({
+            device_id: published_at - overlap if published_at else None
+            for device_id, published_at in opened.items()
+        })
+        outgoing = [
+            (device_id, ts_collected, metrics)
+            for device_id, (ts_collected, metrics) in changed.items()
+            if metrics
+        ]
+        if not outgoing:
+            return 0
+
+        devices = self.env["mikrotik.device"].browse([row[0] for row in outgoing])
+        uids = {device.id: device.device_uid for device in devices}
+        self.env["bus.bus"]._sendmany([
+            (
+                f"mikrotik_monitoring.device.{device_id}",
+                "mikrotik_update",
+                {
+                    "device_id": device_id,
+                    "device_uid": uids[device_id],
+                    "ts": ts_collected.isoformat(),
+                    "metrics": metrics,
+                },
+            )
+            for device_id, ts_collected, metrics in outgoing
+        ])
+        return len(outgoing)
@@ -1,6 +1,12 @@
 # -*- coding: utf-8 -*-
 
-from odoo import api, fields, models
+import logging
+
+from psycopg2.extras import execute_values
+
+from odoo import api, fields, models, tools
+
+_logger = logging.getLogger(__name__)
 
 
 class MikrotikMetricCatalog(models.Model):
@@ -85,17 +91,128 @@ class MikrotikMetricCatalog(models.Model):
         ("key_uniq", "UNIQUE(key)", "Metric key must be unique."),
     ]
 
+    # Columns filled from field defaults when keys are auto-created in SQL
+    _AUTO_CREATE_DEFAULTS = [
+        "unit", "metric_type", "collection_tier",
+        "expected_min", "expected_max", "category", "active",
+    ]
+
+    def write(self, vals):
+        res = super().write(vals)
+        if "key" in vals:
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    @api.model
+    @tools.ormcache()
+    def _get_key_id_map(self):
+        """Return the process-level {key: id} cache for this database.
+        
+        The dict is shared by every request of the worker and only grows
+        (ids of committed keys never change). Renaming or deleting keys
+        clears the registry cache, which is propagated to other workers
+        through registry signaling.
+        """
+        self.flush_model(["key"])
+        self._cr.execute("SELECT key, id FROM mikrotik_metric_catalog")
+        return dict(self._cr.fetchall())
+
     @api.model
     def get_metric_id(self, key):
         """Get or create metric catalog entry, return ID."""
-        metric = self.search([("key", "=", key)], limit=1)
-        if metric:
-            return metric.id
-        # Auto-create with defaults
-        return self.create({
-            "key": key,
-            "name": key.replace(".", " ").replace("_", " ").title(),
-        }).id
+        return self.get_metric_ids([key])[key]
+
+    @api.model
+    def get_metric_ids(self, keys):
+        """Bulk variant of get_metric_id.
+        
+        Known keys are served from the in-process cache. Missing keys are
+        created in one INSERT ... ON CONFLICT DO NOTHING, so workers racing
+        to auto-create the same key no longer violate key_uniq: the loser
+        reads the winner's row instead.
+        
+        Args:
+            keys: iterable of metric keys
+        
+        Returns:
+            dict of {key: metric_id}
+        """
+        keys = set(keys)
+        if not keys:
+            return {}
+        
+        cache = self._get_key_id_map()
+        result = {key: cache[key] for key in keys if key in cache}
+        missing = sorted(keys - set(result))
+        if not missing:
+            return result
+        
+        result.update(self._create_missing_keys(missing))
+        
+        # Only publish ids to the shared cache once they are committed
+        created = {key: result[key] for key in missing}
+        self._cr.postcommit.add(lambda: cache.update(created))
+        return result
+
+    @api.model
+    def _create_missing_keys(self, keys):
+        """Insert catalog entries for keys, ignoring those that already exist.
+        
+        Args:
+            keys: sorted list of metric keys (sorted to keep lock order stable)
+        
+        Returns:
+            dict of {key: metric_id} for all given keys
+        """
+        defaults = self.default_get(self._AUTO_CREATE_DEFAULTS)
+        columns = ["key", "name"] + self._AUTO_CREATE_DEFAULTS
+        rows = [
+            [key, key.replace(".", " ").replace("_", " ").title()]
+            + [defaults.get(name) for name in self._AUTO_CREATE_DEFAULTS]
+            for key in keys
+        ]
+        uid = int(self.env.uid)
+        template = (
+            "(" + ", ".join(["%s"] * len(columns))
+            + f", {uid}, (NOW() AT TIME ZONE 'UTC'), {uid}, (NOW() AT TIME ZONE 'UTC'))"
+        )
+        
+        self.flush_model()
+        inserted = execute_values(
+            self._cr,
+            f"""
+            INSERT INTO mikrotik_metric_catalog
+                ({", ".join(columns)}, create_uid, create_date, write_uid, write_date)
+            VALUES %s
+            ON CONFLICT (key) DO NOTHING
+            RETURNING key, id
+            """,
+            rows,
+            template=template,
+            page_size=len(rows),
+            fetch=True,
+        )
+        result = dict(inserted)
+        
+        # Keys that exist but were not cached yet. A key committed by a
+        # concurrent worker after our snapshot raises a serialization
+        # failure instead: the ingest routes re-raise it so Odoo retries
+        # the request, the collector writer retries its batch.
+        others = [key for key in keys if key not in result]
+        if others:
+            self._cr.execute(
+                "SELECT key, id FROM mikrotik_metric_catalog WHERE key = ANY(%s)",
+                (others,),
+            )
+            result.update(self._cr.fetchall())
+        
+        _logger.info("Auto-created %d metric catalog entries", len(inserted))
+        return result
 
     @api.model
     def init_default_metrics(self):
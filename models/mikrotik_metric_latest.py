@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 
 import logging
+
+from psycopg2.extras import execute_values
+
 from odoo import api, fields, models
 
 _logger = logging.getLogger(__name__)
@@ -34,6 +37,7 @@ class MikrotikMetricLatest(models.Model):
     interface_name = fields.Char(
         string="Interface",
         index=True,
+        help="Empty for device-level metrics (never NULL, see _bulk_upsert)",
     )
     
     ts_collected = fields.Datetime(
@@ -73,6 +77,36 @@ class MikrotikMetricLatest(models.Model):
         ),
     ]
 
+    def _auto_init(self):
+        """Fold legacy NULL interface rows into '' so ON CONFLICT matches them."""
+        res = super()._auto_init()
+        cr = self._cr
+        cr.execute("SELECT 1 FROM mikrotik_metric_latest WHERE interface_name IS NULL LIMIT 1")
+        if cr.fetchone():
+            # Keep only the newest row per (device, metric, interface)
+            cr.execute("""
+                DELETE FROM mikrotik_metric_latest l
+                 USING mikrotik_metric_latest k
+                 WHERE l.device_id = k.device_id
+                   AND l.metric_key = k.metric_key
+                   AND COALESCE(l.interface_name, '') = COALESCE(k.interface_name, '')
+                   AND (l.ts_collected, l.id) < (k.ts_collected, k.id)
+            """)
+            cr.execute("UPDATE mikrotik_metric_latest SET interface_name = '' WHERE interface_name IS NULL")
+            _logger.info("Normalised NULL interface names in mikrotik_metric_latest")
+        return res
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            vals["interface_name"] = vals.get("interface_name") or ""
+        return super().create(vals_list)
+
+    def write(self, vals):
+        if "interface_name" in vals:
+            vals = dict(vals, interface_name=vals["interface_name"] or "")
+        return super().write(vals)
+
     def _compute_display_value(self):
         for rec in self:
             if rec.value_text:
@@ -110,67 +144,87 @@ class MikrotikMetricLatest(models.Model):
 
     @api.model
     def upsert_metrics(self, device_id, metrics, ts_collected):
-        """Upsert multiple metrics for a device.
+        """Upsert a whole device snapshot in one statement.
         
         Args:
             device_id: ID of the device
             metrics: dict of {metric_key: value} or {metric_key: {interface: value}}
             ts_collected: datetime of collection
+        
+        Returns:
+            Number of rows written
         """
+        split_value = self.env["mikrotik.ingest"]._split_value
+        rows = []
         for metric_key, value in metrics.items():
             if isinstance(value, dict):
                 # Interface-level metrics
                 for iface_name, iface_value in value.items():
-                    self._upsert_single(device_id, metric_key, iface_name, iface_value, ts_collected)
+                    rows.append((device_id, metric_key, iface_name, ts_collected) + split_value(iface_value))
             else:
                 # Device-level metrics
-                self._upsert_single(device_id, metric_key, None, value, ts_collected)
+                rows.append((device_id, metric_key, None, ts_collected) + split_value(value))
+        return self._bulk_upsert(rows)
 
     def _upsert_single(self, device_id, metric_key, interface_name, value, ts_collected):
-        """Upsert a single metric value."""
-        # Determine value type
-        if isinstance(value, str):
-            value_float = None
-            value_text = value
-        else:
-            value_float = float(value) if value is not None else None
-            value_text = None
-        
-        # Handle null interface_name for SQL
-        iface_sql = interface_name if interface_name else ""
-        
-        # Try to find existing record
-        domain = [
-            ("device_id", "=", device_id),
-            ("metric_key", "=", metric_key),
-        ]
-        if interface_name:
-            domain.append(("interface_name", "=", interface_name))
-        else:
-            domain.append("|")
-            domain.append(("interface_name", "=", False))
-            domain.append(("interface_name", "=", ""))
-        
-        existing = self.search(domain, limit=1)
-        
-        if existing:
-            # Store previous for rate calculation
-            existing.write({
-                "prev_value": existing.value_float,
-                "prev_ts": existing.ts_collected,
-                "value_float": value_float,
-                "value_text": value_text,
-                "ts_collected": ts_collected,
-            })
-        else:
-            self.create({
-                "device_id": device_id,
-                "metric_key": metric_key,
-                "interface_name": interface_name or False,
-                "value_float": value_float,
-                "value_text": value_text,
-                "ts_collected": ts_collected,
-            })
+        """Upsert a single metric value (kept for callers outside the module)."""
+        return self.upsert_metrics(
+            device_id,
+            {metric_key: {interface_name: value}} if interface_name else {metric_key: value},
+            ts_collected,
+        )
+
+    @api.model
+    def _bulk_upsert(self, rows):
+        """Upsert many latest values in one INSERT ... ON CONFLICT statement.
+        
+        Existing rows are updated in place, moving the current value into
+        prev_value/prev_ts. Interface names are normalised to '' for
+        device-level metrics so the unique key also matches them.
+        
+        Args:
+            rows: list of tuples
+                (device_id, metric_key, interface_name, ts_collected, value_float, value_text)
+                from one or many devices
+        
+        Returns:
+            Number of rows written
+        """
+        if not rows:
+            return 0
+        
+        # ON CONFLICT cannot touch the same row twice: last value wins
+        unique = {}
+        for row in rows:
+            row = (row[0], row[1], row[2] or "") + tuple(row[3:])
+            unique[row[:3]] = row
+        rows = list(unique.values())
+        
+        uid = int(self.env.uid)
+        query = """
+            INSERT INTO mikrotik_metric_latest AS l
+                (device_id, metric_key, interface_name, ts_collected, value_float, value_text,
+                 create_uid, create_date, write_uid, write_date)
+            VALUES %s
+            ON CONFLICT (device_id, metric_key, interface_name) DO UPDATE SET
+                prev_value = l.value_float,
+                prev_ts = l.ts_collected,
+                value_float = EXCLUDED.value_float,
+                value_text = EXCLUDED.value_text,
+                ts_collected = EXCLUDED.ts_collected,
+                write_uid = EXCLUDED.write_uid,
+                write_date = EXCLUDED.write_date
+        """
+        template = (
+            "(%s, %s, %s, %s, %s, %s, "
+            f"{uid}, (NOW() AT TIME ZONE 'UTC'), {uid}, (NOW() AT TIME ZONE 'UTC'))"
+        )
+        
+        self.flush_model()
+        execute_values(self._cr, query, rows, template=template, page_size=len(rows))
+        self.invalidate_model()
+        
+        return len(rows)
 
     @api.model
     def get_device_snapshot(self, device_id):
@@ -187,3 +241,111 @@ class MikrotikMetricLatest(models.Model):
                 "ts": m.ts_collected.isoformat() if m.ts_collected else None,
             }
         return result
+
+    @api.model
+    def get_device_snapshot_compact(self, device_id, categories=None, version=None):
+        """Return the latest values of a device as columnar arrays.
+        
+        Built from one SQL query without loading records (no display
+        compute); clients format values themselves.
+        
+        Args:
+            device_id: ID of the device
+            categories: optional list of catalog categories to include
+            version: version returned by a previous call; if the snapshot
+                has not changed since, only {"version", "unchanged": True}
+                is returned
+        
+        Returns:
+            dict with version, keys, interfaces, values and timestamps
+            (UTC epoch seconds), all arrays aligned by index
+        """
+        self.check_access_rights("read")
+        self.env["mikrotik.device"].browse(device_id).check_access_rule("read")
+        self.flush_model()
+        
+        where = "l.device_id = %s"
+        params = [device_id]
+        join = ""
+        if categories:
+            join = "JOIN mikrotik_metric_catalog c ON c.key = l.metric_key"
+            where += " AND c.category = ANY(%s)"
+            params.append(list(categories))
+        
+        # Cheap version check first: every upsert bumps write_date
+        self._cr.execute(
+            f"""
+            SELECT COUNT(*), MAX(l.write_date)
+              FROM mikrotik_metric_latest l {join}
+             WHERE {where}
+            """,
+            params,
+        )
+        count, last_write = self._cr.fetchone()
+        current = f"{count}-{last_write.timestamp() if last_write else 0:.6f}"
+        if version and version == current:
+            return {"version": current, "unchanged": True}
+        
+        self._cr.execute(
+            f"""
+            SELECT l.metric_key, l.interface_name,
+                   COALESCE(l.value_float::text, l.value_text), l.value_float IS NOT NULL,
+                   EXTRACT(EPOCH FROM l.ts_collected)
+              FROM mikrotik_metric_latest l {join}
+             WHERE {where}
+             ORDER BY l.metric_key, l.interface_name
+            """,
+            params,
+        )
+        keys, interfaces, values, timestamps = [], [], [], []
+        for key, interface_name, value, numeric, ts in self._cr.fetchall():
+            keys.append(key)
+            interfaces.append(interface_name or None)
+            values.append(float(value) if numeric else value)
+            timestamps.append(float(ts) if ts is not None else None)
+        
+        return {
+            "version": current,
+            "keys": keys,
+            "interfaces": interfaces,
+            "values": values,
+            "timestamps": timestamps,
+        }
+
+    @api.model
+    def _changed_metrics(self, since):
+        """Return latest values written after a time, keyed like ingest payloads.
+        
+        Used for live bus pushes: interface metrics are joined back into
+        "iface.<name>.<metric>" keys.
+        
+        Args:
+            since: dict {device_id: naive UTC datetime or None}; None
+                returns every value of the device
+        
+        Returns:
+            dict device_id -> (newest ts_collected, {metric key: value})
+        """
+        join_key = self.env["mikrotik.ingest"]._join_metric_key
+        self.flush_model()
+        self._cr.execute(
+            """
+            SELECT l.device_id, l.metric_key, l.interface_name, l.value_float, l.value_text,
+                   l.ts_collected
+              FROM mikrotik_metric_latest l
+              JOIN unnest(%s::int[], %s::timestamp[]) AS s(device_id, since)
+                ON s.device_id = l.device_id
+             WHERE s.since IS NULL OR l.write_date > s.since
+            """,
+            (list(since), list(since.values())),
+        )
+        result = {}
+        for device_id, key, interface_name, value_float, value_text, ts in self._cr.fetchall():
+            ts_max, metrics = result.setdefault(device_id, (ts, {}))
+            if ts > ts_max:
+                result[device_id] = (ts, metrics)
+            # value_float is numeric: Decimal, not JSON serialisable
+            metrics[join_key(key, interface_name)] = (
+                float(value_float) if value_float is not None else value_text
+            )
+        return result
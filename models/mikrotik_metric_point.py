@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
 
 import logging
+from datetime import datetime, timedelta
+
+from psycopg2.extras import execute_values
+
 from odoo import api, fields, models, tools
 
 _logger = logging.getLogger(__name__)
@@ -15,13 +19,21 @@ class MikrotikMetricPoint(models.Model):
     - Partition by ts_collected (daily)
     - Minimal indexes on raw table
     - Use BRIN index for time-range scans
+    
+    The table is a native range-partitioned parent with one child per
+    day (see mikrotik.partition.mixin); retention drops whole partitions.
     """
 
     _name = "mikrotik.metric.point"
+    _inherit = ["mikrotik.partition.mixin"]
     _description = "MikroTik Metric Point"
     _order = "ts_collected DESC"
     _log_access = False  # Disable tracking for high-volume writes
 
+    _partition_column = "ts_collected"
+    _partition_interval = "day"
+    _partition_premake = 7
+
     device_id = fields.Many2one(
         "mikrotik.device",
         string="Device",
@@ -45,7 +57,6 @@ class MikrotikMetricPoint(models.Model):
     ts_collected = fields.Datetime(
         string="Timestamp (Collected)",
         required=True,
-        index=True,
         help="Timestamp when the metric was collected from the router",
     )
     ts_received = fields.Datetime(
@@ -65,7 +76,11 @@ class MikrotikMetricPoint(models.Model):
 
     @api.model
     def _auto_init(self):
-        """Create optimized indexes after table creation."""
+        """Create optimized indexes after table creation.
+        
+        Indexes on the partitioned parent are propagated to every
+        partition, including the ones created later on.
+        """
         res = super()._auto_init()
         tools.create_index(
             self._cr,
@@ -73,6 +88,13 @@ class MikrotikMetricPoint(models.Model):
             self._table,
             ["device_id", "ts_collected DESC"],
         )
+        tools.create_index(
+            self._cr,
+            "mikrotik_metric_point_ts_brin_idx",
+            self._table,
+            ["ts_collected"],
+            method="brin",
+        )
         return res
 
     @api.model
@@ -89,40 +111,53 @@ class MikrotikMetricPoint(models.Model):
         if not points:
             return 0
         
-        # Build values for INSERT
-        values = []
-        for p in points:
-            values.append((
+        ts_received = fields.Datetime.now()
+        values = [
+            (
                 p.get("device_id"),
                 p.get("metric_id"),
                 p.get("interface_name"),
                 p.get("ts_collected"),
-                fields.Datetime.now(),
+                ts_received,
                 p.get("value_float"),
                 p.get("value_text"),
-            ))
+            )
+            for p in points
+        ]
         
-        # Use executemany for efficiency
+        # Single multi-row INSERT for the whole batch
         query = """
             INSERT INTO mikrotik_metric_point 
             (device_id, metric_id, interface_name, ts_collected, ts_received, value_float, value_text)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            VALUES %s
         """
-        self._cr.executemany(query, values)
+        execute_values(self._cr, query, values, page_size=len(values))
+        
+        # Keep the finest rollup current; coarser ones are rebuilt by cron
+        self.env["mikrotik.metric.rollup.10s"]._rollup_add_points(points)
         
         return len(values)
 
     @api.model
-    def cleanup_old_partitions(self, retention_days=90):
-        """Delete metrics older than retention period.
+    def cleanup_old_partitions(self, retention_days=None):
+        """Remove metrics older than retention period.
         
-        For ISP-grade: this should be done via partition DROP, not DELETE.
-        This method is a fallback for non-partitioned setups.
+        On the partitioned table whole daily partitions are detached and
+        dropped, which is constant-time and leaves nothing to vacuum.
+        The row-level DELETE is kept as fallback for non-partitioned setups.
+        
+        Returns:
+            Number of partitions dropped (or rows deleted on fallback)
         """
-        from datetime import datetime, timedelta
-        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        if retention_days is None:
+            retention_days = int(self.env["ir.config_parameter"].sudo().get_param(
+                "mikrotik_monitoring.metric_retention_days", 90
+            ))
+        cutoff = self._partition_floor(datetime.utcnow() - timedelta(days=retention_days))
+        
+        if self._partition_is_partitioned():
+            return self._partition_drop_before(cutoff)
         
-        # Use raw SQL for efficiency
         query = """
             DELETE FROM mikrotik_metric_point 
             WHERE ts_collected < %s
@@ -134,3 +169,9 @@ class MikrotikMetricPoint(models.Model):
             _logger.info("Deleted %d old metric points (retention=%d days)", deleted, retention_days)
         
         return deleted
+
+    @api.model
+    def _cron_maintain_partitions(self):
+        """Daily cron: create upcoming partitions and drop expired ones."""
+        self._partition_ensure()
+        return self.cleanup_old_partitions()
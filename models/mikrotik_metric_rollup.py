@@ -0,0 +1,443 @@
+# -*- coding: utf-8 -*-
+
+import logging
+from datetime import datetime, timedelta
+
+from psycopg2.extras import execute_values
+
+from odoo import _, api, fields, models, tools
+from odoo.exceptions import UserError
+
+_logger = logging.getLogger(__name__)
+
+# Rollup models from finest to coarsest
+ROLLUP_MODELS = [
+    "mikrotik.metric.rollup.10s",
+    "mikrotik.metric.rollup.1m",
+    "mikrotik.metric.rollup.5m",
+    "mikrotik.metric.rollup.1h",
+]
+
+
+class MikrotikMetricRollupMixin(models.AbstractModel):
+    """Aggregated telemetry bucket - one row per (device, metric, interface, bucket).
+
+    Field names mirror mikrotik.metric.point (ts_collected is the bucket
+    start, value_float the bucket average) so graphs and the traffic chart
+    can read any resolution the same way as raw points.
+
+    The 10s rollup is fed incrementally by MetricPoint.bulk_create; the
+    coarser ones are rebuilt from the next finer rollup by cron.
+    System metrics are stored with an empty interface name so the
+    bucket key stays unique.
+    """
+
+    _name = "mikrotik.metric.rollup.mixin"
+    _inherit = ["mikrotik.partition.mixin"]
+    _description = "MikroTik Metric Rollup"
+    _order = "ts_collected DESC"
+    _log_access = False
+
+    _partition_column = "ts_collected"
+    _partition_interval = "month"
+    _partition_premake = 2
+
+    # Bucket width in seconds
+    _rollup_seconds = None
+    # Finer model this rollup is rebuilt from (None: fed from raw points)
+    _rollup_source = None
+    # Default retention, overridable per resolution via system parameter
+    # mikrotik_monitoring.rollup_retention_days.<resolution>; finer
+    # resolutions expire first, the 10s one before raw points (90 days)
+    _rollup_retention_days = 30
+
+    device_id = fields.Many2one(
+        "mikrotik.device",
+        string="Device",
+        required=True,
+        index=True,
+        ondelete="cascade",
+    )
+    metric_id = fields.Many2one(
+        "mikrotik.metric.catalog",
+        string="Metric",
+        required=True,
+        index=True,
+        ondelete="cascade",
+    )
+    interface_name = fields.Char(
+        string="Interface",
+        help="Interface name for interface-level metrics (empty for system metrics)",
+    )
+    ts_collected = fields.Datetime(
+        string="Bucket Start",
+        required=True,
+    )
+    value_float = fields.Float(
+        string="Average",
+        digits=(20, 4),
+        group_operator="avg",
+    )
+    value_min = fields.Float(
+        string="Min",
+        digits=(20, 4),
+        group_operator="min",
+    )
+    value_max = fields.Float(
+        string="Max",
+        digits=(20, 4),
+        group_operator="max",
+    )
+    value_last = fields.Float(
+        string="Last",
+        digits=(20, 4),
+    )
+    value_sum = fields.Float(
+        string="Sum",
+        digits=(20, 4),
+    )
+    value_count = fields.Integer(
+        string="Samples",
+    )
+    ts_last = fields.Datetime(
+        string="Last Sample",
+    )
+
+    _sql_constraints = [
+        (
+            "bucket_uniq",
+            "UNIQUE(device_id, metric_id, interface_name, ts_collected)",
+            "Rollup bucket must be unique per device/metric/interface.",
+        ),
+    ]
+
+    def _auto_init(self):
+        res = super()._auto_init()
+        if not self._abstract:
+            tools.create_index(
+                self._cr,
+                f"{self._table}_device_ts_idx",
+                self._table,
+                ["device_id", "ts_collected DESC"],
+            )
+        return res
+
+    @api.model
+    def _rollup_bucket(self, ts):
+        """Return the start of the bucket containing ts."""
+        step = self._rollup_seconds
+        epoch = int((ts - datetime(1970, 1, 1)).total_seconds())
+        return datetime(1970, 1, 1) + timedelta(seconds=epoch - epoch % step)
+
+    @api.model
+    def _rollup_add_points(self, points):
+        """Accumulate raw points into their buckets in one statement.
+
+        Args:
+            points: list of dicts as accepted by MetricPoint.bulk_create
+
+        Returns:
+            Number of buckets touched
+        """
+        buckets = {}
+        for p in points:
+            value = p.get("value_float")
+            if value is None:
+                continue
+            ts = p["ts_collected"]
+            key = (p["device_id"], p["metric_id"], p.get("interface_name") or "", self._rollup_bucket(ts))
+            agg = buckets.get(key)
+            if agg is None:
+                buckets[key] = [value, value, value, 1, value, ts]
+            else:
+                agg[0] = min(agg[0], value)
+                agg[1] = max(agg[1], value)
+                agg[2] += value
+                agg[3] += 1
+                if ts >= agg[5]:
+                    agg[4] = value
+                    agg[5] = ts
+        if not buckets:
+            return 0
+
+        rows = [
+            key + (mn, mx, total, count, total / count, last, ts_last)
+            for key, (mn, mx, total, count, last, ts_last) in buckets.items()
+        ]
+        query = f"""
+            INSERT INTO {self._table} AS r
+                (device_id, metric_id, interface_name, ts_collected,
+                 value_min, value_max, value_sum, value_count, value_float, value_last, ts_last)
+            VALUES %s
+            ON CONFLICT (device_id, metric_id, interface_name, ts_collected) DO UPDATE SET
+                value_min = LEAST(r.value_min, EXCLUDED.value_min),
+                value_max = GREATEST(r.value_max, EXCLUDED.value_max),
+                value_sum = r.value_sum + EXCLUDED.value_sum,
+                value_count = r.value_count + EXCLUDED.value_count,
+                value_float = (r.value_sum + EXCLUDED.value_sum) / (r.value_count + EXCLUDED.value_count),
+                value_last = CASE WHEN EXCLUDED.ts_last >= r.ts_last THEN EXCLUDED.value_last ELSE r.value_last END,
+                ts_last = GREATEST(r.ts_last, EXCLUDED.ts_last)
+        """
+        execute_values(self._cr, query, rows, page_size=len(rows))
+        return len(rows)
+
+    @api.model
+    def _rollup_from_source(self, lo, hi):
+        """Rebuild buckets in [lo, hi) from the finer source rollup.
+
+        Buckets are overwritten, so re-running over the same range is safe
+        and picks up late data.
+
+        Returns:
+            Number of buckets written
+        """
+        source = self.env[self._rollup_source]
+        step = self._rollup_seconds
+        self._cr.execute(
+            f"""
+            INSERT INTO {self._table}
+                (device_id, metric_id, interface_name, ts_collected,
+                 value_min, value_max, value_sum, value_count, value_float, value_last, ts_last)
+            SELECT device_id, metric_id, interface_name,
+                   to_timestamp(floor(extract(epoch FROM ts_collected) / %(step)s) * %(step)s) AT TIME ZONE 'UTC',
+                   MIN(value_min), MAX(value_max), SUM(value_sum), SUM(value_count),
+                   SUM(value_sum) / NULLIF(SUM(value_count), 0),
+                   (array_agg(value_last ORDER BY ts_last DESC))[1], MAX(ts_last)
+              FROM {source._table}
+             WHERE ts_collected >= %(lo)s AND ts_collected < %(hi)s
+             GROUP BY 1, 2, 3, 4
+            ON CONFLICT (device_id, metric_id, interface_name, ts_collected) DO UPDATE SET
+                value_min = EXCLUDED.value_min,
+                value_max = EXCLUDED.value_max,
+                value_sum = EXCLUDED.value_sum,
+                value_count = EXCLUDED.value_count,
+                value_float = EXCLUDED.value_float,
+                value_last = EXCLUDED.value_last,
+                ts_last = EXCLUDED.ts_last
+            """,
+            {"step": step, "lo": lo, "hi": hi},
+        )
+        return self._cr.rowcount
+
+    @api.model
+    def _rollup_retention(self):
+        resolution = self._name.rsplit(".", 1)[-1]
+        return int(self.env["ir.config_parameter"].sudo().get_param(
+            f"mikrotik_monitoring.rollup_retention_days.{resolution}",
+            self._rollup_retention_days,
+        ))
+
+
+class MikrotikMetricRollup10s(models.Model):
+    _name = "mikrotik.metric.rollup.10s"
+    _inherit = ["mikrotik.metric.rollup.mixin"]
+    _description = "MikroTik Metric Rollup (10s)"
+
+    _rollup_seconds = 10
+    _rollup_source = None
+    _rollup_retention_days = 30
+
+
+class MikrotikMetricRollup1m(models.Model):
+    _name = "mikrotik.metric.rollup.1m"
+    _inherit = ["mikrotik.metric.rollup.mixin"]
+    _description = "MikroTik Metric Rollup (1m)"
+
+    _rollup_seconds = 60
+    _rollup_source = "mikrotik.metric.rollup.10s"
+    _rollup_retention_days = 730
+
+
+class MikrotikMetricRollup5m(models.Model):
+    _name = "mikrotik.metric.rollup.5m"
+    _inherit = ["mikrotik.metric.rollup.mixin"]
+    _description = "MikroTik Metric Rollup (5m)"
+
+    _rollup_seconds = 300
+    _rollup_source = "mikrotik.metric.rollup.1m"
+    _rollup_retention_days = 1825
+
+
+class MikrotikMetricRollup1h(models.Model):
+    _name = "mikrotik.metric.rollup.1h"
+    _inherit = ["mikrotik.metric.rollup.mixin"]
+    _description = "MikroTik Metric Rollup (1h)"
+
+    _rollup_seconds = 3600
+    _rollup_source = "mikrotik.metric.rollup.5m"
+    _rollup_retention_days = 1825
+
+
+class MikrotikMetricRollup(models.AbstractModel):
+    """Entry point for rollup maintenance and chart series."""
+
+    _name = "mikrotik.metric.rollup"
+    _description = "MikroTik Metric Rollups"
+
+    # Raw points are assumed to arrive at the default realtime interval
+    _RAW_STEP_SECONDS = 5
+
+    @api.model
+    def _select_source(self, bucket_seconds, start=None):
+        """Return the coarsest model whose resolution fits in one bucket.
+
+        With start (naive UTC datetime), levels whose retention no longer
+        covers it are skipped for the next coarser one, so old windows do
+        not read from dropped partitions.
+        """
+        levels = ["mikrotik.metric.point"] + ROLLUP_MODELS
+        index = 0
+        for i, model_name in enumerate(ROLLUP_MODELS, start=1):
+            if self.env[model_name]._rollup_seconds <= bucket_seconds:
+                index = i
+        if start is None:
+            return levels[index]
+        now = datetime.utcnow()
+        for model_name in levels[index:]:
+            if start >= now - timedelta(days=self._source_retention_days(model_name)):
+                return model_name
+        return levels[-1]
+
+    @api.model
+    def _source_retention_days(self, model_name):
+        if model_name == "mikrotik.metric.point":
+            return int(self.env["ir.config_parameter"].sudo().get_param(
+                "mikrotik_monitoring.metric_retention_days", 90
+            ))
+        return self.env[model_name]._rollup_retention()
+
+    @api.model
+    def get_series(self, device_id, metric_keys, start, end, width=None, interfaces=None, step=None):
+        """Return min/avg/max per bucket for charting, one bucket per pixel.
+
+        The time range is split into ``width`` buckets and aggregated in SQL
+        from the coarsest table that still resolves one bucket, so the
+        response size depends on the chart width, not on the window.
+
+        Buckets are aligned to multiples of the step since the epoch, so a
+        client that passes back the step of its first response and the start
+        of the last bucket it holds receives only that bucket (refreshed)
+        and the newer ones.
+
+        Args:
+            device_id: device ID (required: series are never merged across devices)
+            metric_keys: list of metric catalog keys
+            start, end: range as UTC epoch seconds
+            width: target number of buckets (chart width in pixels)
+            interfaces: optional list of interface names to keep
+            step: bucket width in seconds, overrides width
+
+        Returns:
+            dict with start, end, step (seconds), model and series, a list of
+            {"metric", "interface", "t", "min", "avg", "max"} where t holds
+            bucket start epochs and the value arrays are aligned to it
+        """
+        if not device_id:
+            raise UserError(_("A device is required to load a chart series."))
+        start = int(start)
+        end = int(end)
+        if end <= start or not metric_keys:
+            return {"start": start, "end": end, "step": 0, "model": None, "series": []}
+
+        window_start = datetime.utcfromtimestamp(start)
+        if step:
+            step = max(1, int(step))
+            model_name = self._select_source(step, window_start)
+        else:
+            width = max(1, min(int(width or 1), 4000))
+            model_name = self._select_source((end - start) / width, window_start)
+        Source = self.env[model_name]
+        Source.check_access_rights("read")
+        self.env["mikrotik.device"].browse(device_id).check_access_rule("read")
+
+        if model_name == "mikrotik.metric.point":
+            step_floor = self._RAW_STEP_SECONDS
+            aggregates = "MIN(p.value_float), AVG(p.value_float), MAX(p.value_float)"
+        else:
+            step_floor = Source._rollup_seconds
+            aggregates = (
+                "MIN(p.value_min), SUM(p.value_sum) / NULLIF(SUM(p.value_count), 0), MAX(p.value_max)"
+            )
+        if not step:
+            step = max(step_floor, -(-(end - start) // width))
+
+        where = [
+            "p.device_id = %(device_id)s",
+            "c.key = ANY(%(keys)s)",
+            "p.ts_collected >= %(start)s",
+            "p.ts_collected < %(end)s",
+            "p.value_float IS NOT NULL",
+        ]
+        if interfaces:
+            where.append("p.interface_name = ANY(%(interfaces)s)")
+
+        Source.flush_model()
+        self._cr.execute(
+            f"""
+            SELECT c.key, NULLIF(p.interface_name, ''),
+                   floor(extract(epoch FROM p.ts_collected) / %(step)s)::bigint AS b,
+                   {aggregates}
+              FROM {Source._table} p
+              JOIN mikrotik_metric_catalog c ON c.id = p.metric_id
+             WHERE {" AND ".join(where)}
+             GROUP BY 1, 2, 3
+             ORDER BY 1, 2, 3
+            """,
+            {
+                "keys": list(metric_keys),
+                "start": datetime.utcfromtimestamp(start),
+                "end": datetime.utcfromtimestamp(end),
+                "step": step,
+                "device_id": device_id,
+                "interfaces": list(interfaces or []),
+            },
+        )
+
+        series = []
+        current = None
+        for key, interface_name, bucket, vmin, vavg, vmax in self._cr.fetchall():
+            if current is None or current["metric"] != key or current["interface"] != interface_name:
+                current = {"metric": key, "interface": interface_name, "t": [], "min": [], "avg": [], "max": []}
+                series.append(current)
+            current["t"].append(bucket * step)
+            current["min"].append(round(float(vmin), 3))
+            current["avg"].append(round(float(vavg or 0), 3))
+            current["max"].append(round(float(vmax), 3))
+
+        return {"start": start, "end": end, "step": step, "model": model_name, "series": series}
+
+    @api.model
+    def _cron_rollup(self):
+        """Rebuild coarse rollups from finer ones since the last run.
+
+        Runs fine to coarse so each level sees the buckets just rebuilt
+        below it. The open bucket is included and refreshed on every run.
+        """
+        IrParam = self.env["ir.config_parameter"].sudo()
+        now = datetime.utcnow()
+        total = 0
+        for model_name in ROLLUP_MODELS:
+            Rollup = self.env[model_name]
+            if not Rollup._rollup_source:
+                continue
+            param = f"mikrotik_monitoring.rollup_watermark.{model_name.rsplit('.', 1)[-1]}"
+            step = timedelta(seconds=Rollup._rollup_seconds)
+            lo = now - 2 * step
+            watermark = IrParam.get_param(param)
+            if watermark:
+                lo = min(lo, fields.Datetime.to_datetime(watermark))
+            total += Rollup._rollup_from_source(Rollup._rollup_bucket(lo), now)
+            IrParam.set_param(param, fields.Datetime.to_string(now))
+        return total
+
+    @api.model
+    def _cron_rollup_retention(self):
+        """Daily: premake partitions and drop expired ones for every resolution."""
+        now = datetime.utcnow()
+        dropped = 0
+        for model_name in ROLLUP_MODELS:
+            Rollup = self.env[model_name]
+            Rollup._partition_ensure()
+            cutoff = now - timedelta(days=Rollup._rollup_retention())
+            dropped += Rollup._partition_drop_before(cutoff)
+        return dropped
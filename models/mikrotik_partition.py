@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import re
+from datetime import datetime, timedelta
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+_BOUND_RE = re.compile(r"TO \('([^']+)'\)")
+
+
+class MikrotikPartitionMixin(models.AbstractModel):
+    """Native PostgreSQL range partitioning for high-volume tables.
+
+    Inheriting models declare the partition key and period; on install
+    or upgrade the Odoo-created table is converted into a range-partitioned
+    parent:
+    - rows already present are kept in one ``<table>_legacy`` partition
+      covering everything up to the last stored period
+    - one child partition per period (``<table>_pYYYYMMDD`` / ``_pYYYYMM``)
+      is created ahead of time
+    - a ``<table>_default`` partition catches out-of-range timestamps
+
+    Retention then drops whole partitions instead of running DELETEs. The
+    legacy partition spans all converted rows, so until its newest rows
+    expire its expired rows are deleted in chunks instead.
+    """
+
+    _name = "mikrotik.partition.mixin"
+    _description = "MikroTik Partitioned Table Mixin"
+
+    # Column used as range partition key (must be required)
+    _partition_column = None
+    # Period covered by each child partition: "day" or "month"
+    _partition_interval = "day"
+    # Number of future periods kept ready ahead of time
+    _partition_premake = 7
+    # Rows deleted per statement from a legacy partition not yet droppable
+    _partition_legacy_chunk = 10000
+
+    def _auto_init(self):
+        res = super()._auto_init()
+        if not self._abstract and self._partition_column:
+            self._partition_convert()
+            self._partition_ensure()
+        return res
+
+    # -------------------------------------------------------------------------
+    # PERIOD HELPERS
+    # -------------------------------------------------------------------------
+    @api.model
+    def _partition_floor(self, ts):
+        """Return the start of the period containing ts."""
+        if self._partition_interval == "month":
+            return datetime(ts.year, ts.month, 1)
+        return datetime(ts.year, ts.month, ts.day)
+
+    @api.model
+    def _partition_step(self, ts):
+        """Return the start of the period following the one starting at ts."""
+        if self._partition_interval == "month":
+            return ts + relativedelta(months=1)
+        return ts + timedelta(days=1)
+
+    @api.model
+    def _partition_name(self, lo):
+        fmt = "%Y%m" if self._partition_interval == "month" else "%Y%m%d"
+        return f"{self._table}_p{lo.strftime(fmt)}"
+
+    # -------------------------------------------------------------------------
+    # CATALOG
+    # -------------------------------------------------------------------------
+    @api.model
+    def _partition_is_partitioned(self):
+        self._cr.execute(
+            "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)",
+            (self._table,),
+        )
+        row = self._cr.fetchone()
+        return bool(row) and row[0] == "p"
+
+    @api.model
+    def _partition_list(self):
+        """Return [(name, upper_bound)] for all child partitions.
+
+        upper_bound is None for the default partition.
+        """
+        self._cr.execute(
+            """
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+              FROM pg_inherits i
+              JOIN pg_class c ON c.oid = i.inhrelid
+             WHERE i.inhparent = to_regclass(%s)
+             ORDER BY c.relname
+            """,
+            (self._table,),
+        )
+        result = []
+        for name, bound in self._cr.fetchall():
+            match = _BOUND_RE.search(bound or "")
+            upper = fields.Datetime.to_datetime(match.group(1)[:19]) if match else None
+            result.append((name, upper))
+        return result
+
+    # -------------------------------------------------------------------------
+    # CONVERSION
+    # -------------------------------------------------------------------------
+    @api.model
+    def _partition_convert(self):
+        """Convert the plain Odoo table into a range-partitioned parent.
+
+        Idempotent: does nothing once the table is partitioned.
+        """
+        if self._partition_is_partitioned():
+            return False
+
+        cr = self._cr
+        table = self._table
+        column = self._partition_column
+        legacy = f"{table}_legacy"
+        _logger.info("Converting %s to range partitions on %s", table, column)
+
+        # Foreign keys and unique constraints (which must include the
+        # partition key) are recreated on the parent
+        cr.execute(
+            """
+            SELECT conname, pg_get_constraintdef(oid)
+              FROM pg_constraint
+             WHERE conrelid = to_regclass(%s) AND contype IN ('f', 'u')
+            """,
+            (table,),
+        )
+        constraints = cr.fetchall()
+
+        cr.execute(f'ALTER TABLE "{table}" RENAME TO "{legacy}"')
+
+        # Free index names for the new parent; matching indexes are
+        # re-attached automatically when the parent indexes are created
+        cr.execute(
+            "SELECT indexname FROM pg_indexes WHERE tablename = %s AND schemaname = current_schema()",
+            (legacy,),
+        )
+        for (indexname,) in cr.fetchall():
+            cr.execute(f'ALTER INDEX "{indexname}" RENAME TO "{indexname[:55]}_legacy"')
+
+        cr.execute(
+            f"""
+            CREATE TABLE "{table}" (LIKE "{legacy}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+            PARTITION BY RANGE ("{column}")
+            """
+        )
+        cr.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_pkey" PRIMARY KEY (id, "{column}")')
+
+        # Keep the id sequence alive when the legacy partition is dropped
+        cr.execute("SELECT pg_get_serial_sequence(%s, 'id')", (legacy,))
+        sequence = cr.fetchone()[0]
+        if sequence:
+            cr.execute(f'ALTER SEQUENCE {sequence} OWNED BY "{table}".id')
+
+        for conname, definition in constraints:
+            cr.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{conname}" {definition}')
+
+        cr.execute(f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT')
+
+        cr.execute(f'SELECT MAX("{column}") FROM "{legacy}"')
+        last_ts = cr.fetchone()[0]
+        if last_ts is None:
+            cr.execute(f'DROP TABLE "{legacy}"')
+        else:
+            upper = self._partition_step(self._partition_floor(last_ts))
+            cr.execute(
+                f'ALTER TABLE "{table}" ATTACH PARTITION "{legacy}" FOR VALUES FROM (MINVALUE) TO (%s)',
+                (upper,),
+            )
+        return True
+
+    # -------------------------------------------------------------------------
+    # MAINTENANCE
+    # -------------------------------------------------------------------------
+    @api.model
+    def _partition_ensure(self, premake=None):
+        """Create child partitions from the current period up to premake periods ahead.
+
+        Rows that already landed in the default partition for a new period
+        are moved into it before the partition is attached.
+
+        Returns:
+            Number of partitions created
+        """
+        if not self._partition_is_partitioned():
+            return 0
+
+        cr = self._cr
+        table = self._table
+        column = self._partition_column
+        premake = self._partition_premake if premake is None else premake
+
+        existing = self._partition_list()
+        names = {name for name, _upper in existing}
+        # Periods already covered by the converted legacy rows are skipped
+        legacy_upper = max(
+            (upper for name, upper in existing if upper and name.endswith("_legacy")),
+            default=None,
+        )
+
+        created = 0
+        lo = self._partition_floor(datetime.utcnow())
+        for _i in range(premake + 1):
+            hi = self._partition_step(lo)
+            name = self._partition_name(lo)
+            if name not in names and not (legacy_upper and lo < legacy_upper):
+                cr.execute(
+                    f'CREATE TABLE "{name}" (LIKE "{table}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+                )
+                cr.execute(
+                    f"""
+                    WITH moved AS (
+                        DELETE FROM "{table}_default"
+                         WHERE "{column}" >= %s AND "{column}" < %s
+                     RETURNING *
+                    )
+                    INSERT INTO "{name}" SELECT * FROM moved
+                    """,
+                    (lo, hi),
+                )
+                cr.execute(
+                    f'ALTER TABLE "{table}" ATTACH PARTITION "{name}" FOR VALUES FROM (%s) TO (%s)',
+                    (lo, hi),
+                )
+                created += 1
+            lo = hi
+
+        if created:
+            _logger.info("Created %d partitions for %s", created, table)
+        return created
+
+    @api.model
+    def _partition_drop_before(self, cutoff):
+        """Drop every partition whose range ends at or before cutoff.
+
+        Rows older than cutoff in the default partition are deleted, and
+        so are those of a legacy partition still holding newer rows
+        (in chunks of _partition_legacy_chunk rows).
+
+        Returns:
+            Number of partitions dropped
+        """
+        cr = self._cr
+        table = self._table
+        column = self._partition_column
+        dropped = 0
+        legacy_deleted = 0
+        for name, upper in self._partition_list():
+            if upper is None:
+                continue
+            if upper <= cutoff:
+                cr.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"')
+                cr.execute(f'DROP TABLE "{name}"')
+                dropped += 1
+            elif name == f"{table}_legacy":
+                legacy_deleted += self._partition_delete_chunked(name, cutoff)
+
+        cr.execute(
+            f'DELETE FROM "{table}_default" WHERE "{column}" < %s',
+            (cutoff,),
+        )
+
+        if dropped:
+            _logger.info("Dropped %d partitions of %s older than %s", dropped, table, cutoff)
+        if legacy_deleted:
+            _logger.info("Deleted %d rows of %s_legacy older than %s", legacy_deleted, table, cutoff)
+        return dropped
+
+    @api.model
+    def _partition_delete_chunked(self, partition, cutoff):
+        """Delete the rows of partition older than cutoff, a chunk per statement.
+
+        Returns:
+            Number of rows deleted
+        """
+        cr = self._cr
+        column = self._partition_column
+        chunk_size = self._partition_legacy_chunk
+        deleted = 0
+        while True:
+            cr.execute(
+                f"""
+                DELETE FROM "{partition}"
+                 WHERE ctid = ANY(ARRAY(
+                    SELECT ctid FROM "{partition}"
+                     WHERE "{column}" < %s
+                     LIMIT %s
+                 ))
+                """,
+                (cutoff, chunk_size),
+            )
+            deleted += cr.rowcount
+            if cr.rowcount < chunk_size:
+                return deleted
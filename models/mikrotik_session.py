@@ -1,7 +1,27 @@
 # -*- coding: utf-8 -*-
 
+import logging
+import re
+from datetime import timedelta
+
+from psycopg2.extras import execute_values
+
 from odoo import api, fields, models
 
+_logger = logging.getLogger(__name__)
+
+# RouterOS durations: "1w2d3h4m5s", optionally "1d02:03:04" (v6) or with "ms"
+_DURATION_RE = re.compile(r"(\d+)(ms|[wdhms])|(\d+):(\d+):(\d+)")
+_DURATION_UNITS = {"w": 604800, "d": 86400, "h": 3600, "m": 60, "s": 1, "ms": 0}
+
+# Columns compared to detect changed sessions, in payload tuple order. Byte
+# counters move on every poll and are written by the accounting update only.
+SESSION_SYNC_FIELDS = ["address", "caller_id", "service", "interface", "started_at"]
+
+# Seconds a start time derived from poll time minus uptime may lie past the
+# previous poll and still be the same session (uptime has whole seconds)
+SESSION_START_TOLERANCE = 2
+
 
 class MikrotikSession(models.Model):
     """PPPoE/Hotspot/VPN session current state table.
@@ -62,6 +82,7 @@ class MikrotikSession(models.Model):
     )
     uptime = fields.Integer(
         string="Uptime (seconds)",
+        compute="_compute_uptime",
     )
     uptime_display = fields.Char(
         string="Uptime",
@@ -84,6 +105,20 @@ class MikrotikSession(models.Model):
         help="Last time this session was seen active",
     )
 
+    # Unchanged sessions only get last_seen refreshed once per this interval
+    _LAST_SEEN_REFRESH = timedelta(minutes=5)
+
+    @api.depends("started_at", "last_seen", "is_active")
+    def _compute_uptime(self):
+        now = fields.Datetime.now()
+        for rec in self:
+            end = now if rec.is_active else rec.last_seen
+            if rec.started_at and end:
+                rec.uptime = max(int((end - rec.started_at).total_seconds()), 0)
+            else:
+                rec.uptime = 0
+
+    @api.depends("uptime")
     def _compute_uptime_display(self):
         for rec in self:
             if rec.uptime:
@@ -100,80 +135,246 @@ class MikrotikSession(models.Model):
                 rec.uptime_display = "-"
 
     @api.model
-    def sync_sessions(self, device_id, session_type, sessions_data):
+    def sync_sessions(self, device_id, session_type, sessions_data, ts=None):
         """Sync session table from router data.
         
+        Active sessions are read in one query and compared with the
+        payload; new sessions are inserted in one statement, changed ones
+        updated in one statement and vanished ones deactivated in one
+        statement. The start time is the poll time minus the router
+        uptime, so a running session does not change between polls; byte
+        counters that moved are written with one accounting UPDATE and
+        their deltas go to mikrotik.session.usage. Start and last_seen use
+        the poll time, so ingest delays do not shift them.
+        
         Args:
             device_id: ID of the device
             session_type: type of session (pppoe, hotspot, etc.)
             sessions_data: list of dicts with session info from RouterOS
+            ts: naive UTC datetime of the poll (defaults to now)
+        
+        Returns:
+            dict with created, updated, counters, deactivated and unchanged counts
         """
-        # Mark all existing sessions of this type as inactive first
-        existing = self.search([
-            ("device_id", "=", device_id),
-            ("session_type", "=", session_type),
-            ("is_active", "=", True),
-        ])
-        existing_by_name = {s.name: s for s in existing}
-        
-        seen_names = set()
+        # Normalise payload, last entry wins per username:
+        # name -> (SESSION_SYNC_FIELDS values, bytes_in, bytes_out)
+        now = (ts or fields.Datetime.now()).replace(microsecond=0)
+        incoming = {}
         for sess in sessions_data:
             name = sess.get("name") or sess.get("user")
             if not name:
                 continue
-            seen_names.add(name)
-            
-            # Parse uptime string to seconds
-            uptime = self._parse_uptime(sess.get("uptime", ""))
-            
-            vals = {
-                "device_id": device_id,
-                "session_type": session_type,
-                "name": name,
-                "address": sess.get("address"),
-                "caller_id": sess.get("caller-id"),
-                "service": sess.get("service") or sess.get("profile"),
-                "interface": sess.get("interface"),
-                "uptime": uptime,
-                "bytes_in": float(sess.get("bytes-in", 0) or 0),
-                "bytes_out": float(sess.get("bytes-out", 0) or 0),
-                "is_active": True,
-            }
-            
-            if name in existing_by_name:
-                existing_by_name[name].write(vals)
+            uptime = sess.get("uptime")
+            started_at = now - timedelta(seconds=self._parse_uptime(uptime)) if uptime else None
+            incoming[name] = (
+                (
+                    sess.get("address"),
+                    sess.get("caller-id"),
+                    sess.get("service") or sess.get("profile"),
+                    sess.get("interface"),
+                    started_at,
+                ),
+                float(sess.get("bytes-in", 0) or 0),
+                float(sess.get("bytes-out", 0) or 0),
+            )
+        
+        self.flush_model()
+        cr = self._cr
+        columns = ", ".join(SESSION_SYNC_FIELDS)
+        cr.execute(
+            f"""
+            SELECT id, name, {columns}, last_seen, bytes_in, bytes_out
+              FROM mikrotik_session
+             WHERE device_id = %s AND session_type = %s AND is_active
+             ORDER BY id
+            """,
+            (device_id, session_type),
+        )
+        existing = {}
+        for row in cr.fetchall():
+            existing[row[1]] = (row[0], row[2:-3], row[-3], float(row[-2] or 0), float(row[-1] or 0))
+        
+        new_rows = []
+        changed_rows = []
+        counter_rows = []
+        usage_rows = []
+        keep_ids = set()
+        for name, (values, bytes_in, bytes_out) in incoming.items():
+            if name not in existing:
+                new_rows.append((device_id, session_type, name) + values[:4] + (
+                    values[4] or now, bytes_in, bytes_out, now,
+                ))
+                usage_rows.append((device_id, session_type, name, bytes_in, bytes_out))
+                continue
+            session_id, old_values, last_seen, old_in, old_out = existing[name]
+            keep_ids.add(session_id)
+            # Reconnected between polls: started after the last poll or counters went down
+            restarted = (
+                self._session_restarted(last_seen, values[4])
+                or bytes_in < old_in
+                or bytes_out < old_out
+            )
+            if not restarted:
+                # Same session: keep the stored start instead of the jittering one
+                values = values[:4] + (old_values[4],)
+            elif values[4] is None:
+                values = values[:4] + (now,)
+            if self._session_changed(old_values, values):
+                changed_rows.append((session_id,) + values + (bytes_in, bytes_out, now))
+            elif bytes_in != old_in or bytes_out != old_out:
+                counter_rows.append((session_id, bytes_in, bytes_out, now))
             else:
-                self.create(vals)
+                continue
+            usage_rows.append((
+                device_id, session_type, name,
+                self._counter_delta(old_in, bytes_in, restarted),
+                self._counter_delta(old_out, bytes_out, restarted),
+            ))
+        
+        uid = int(self.env.uid)
+        now_sql = "(NOW() AT TIME ZONE 'UTC')"
         
-        # Mark sessions not seen as inactive
-        for name, sess in existing_by_name.items():
-            if name not in seen_names:
-                sess.is_active = False
+        if new_rows:
+            execute_values(
+                cr,
+                f"""
+                INSERT INTO mikrotik_session
+                    (device_id, session_type, name, {columns}, bytes_in, bytes_out,
+                     is_active, last_seen,
+                     create_uid, create_date, write_uid, write_date)
+                VALUES %s
+                """,
+                new_rows,
+                template=(
+                    "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, "
+                    f"true, %s, {uid}, {now_sql}, {uid}, {now_sql})"
+                ),
+                page_size=len(new_rows),
+            )
+        
+        if changed_rows:
+            assignments = ", ".join(f"{name} = v.{name}" for name in SESSION_SYNC_FIELDS)
+            execute_values(
+                cr,
+                f"""
+                UPDATE mikrotik_session s
+                   SET {assignments},
+                       bytes_in = v.bytes_in,
+                       bytes_out = v.bytes_out,
+                       last_seen = v.last_seen,
+                       write_uid = {uid},
+                       write_date = {now_sql}
+                  FROM (VALUES %s) AS v(id, {columns}, bytes_in, bytes_out, last_seen)
+                 WHERE s.id = v.id
+                """,
+                changed_rows,
+                template=(
+                    "(%s::int, %s::varchar, %s::varchar, %s::varchar, %s::varchar, "
+                    "%s::timestamp, %s::numeric, %s::numeric, %s::timestamp)"
+                ),
+                page_size=len(changed_rows),
+            )
+        
+        if counter_rows:
+            # Accounting only: counters feed the next usage delta
+            execute_values(
+                cr,
+                f"""
+                UPDATE mikrotik_session s
+                   SET bytes_in = v.bytes_in,
+                       bytes_out = v.bytes_out,
+                       last_seen = v.last_seen
+                  FROM (VALUES %s) AS v(id, bytes_in, bytes_out, last_seen)
+                 WHERE s.id = v.id
+                """,
+                counter_rows,
+                template="(%s::int, %s::numeric, %s::numeric, %s::timestamp)",
+                page_size=len(counter_rows),
+            )
+        
+        if keep_ids:
+            # Idle sessions: refresh last_seen once per _LAST_SEEN_REFRESH
+            cr.execute(
+                """
+                UPDATE mikrotik_session
+                   SET last_seen = %s
+                 WHERE id = ANY(%s) AND last_seen < %s
+                """,
+                (now, list(keep_ids), now - self._LAST_SEEN_REFRESH),
+            )
+        
+        # Deactivate sessions that disappeared (and stale duplicates)
+        cr.execute(
+            f"""
+            UPDATE mikrotik_session
+               SET is_active = false, write_uid = {uid}, write_date = {now_sql}
+             WHERE device_id = %s AND session_type = %s AND is_active
+               AND NOT (id = ANY(%s))
+            """,
+            (device_id, session_type, list(keep_ids)),
+        )
+        deactivated = cr.rowcount
+        
+        self.invalidate_model()
+        
+        self.env["mikrotik.session.usage"].add_usage(usage_rows, now)
+        
+        Device = self.env["mikrotik.device"]
+        Device._update_counters("session_count", {device_id: len(new_rows)}, increment=True)
+        if session_type == "pppoe":
+            Device._update_counters("ppp_count", {device_id: len(keep_ids) + len(new_rows)})
+        
+        summary = {
+            "created": len(new_rows),
+            "updated": len(changed_rows),
+            "counters": len(counter_rows),
+            "deactivated": deactivated,
+            "unchanged": len(keep_ids) - len(changed_rows) - len(counter_rows),
+        }
+        _logger.debug("Session sync for device %s (%s): %s", device_id, session_type, summary)
+        return summary
+
+    @staticmethod
+    def _session_changed(old_values, new_values):
+        """Compare stored and incoming SESSION_SYNC_FIELDS values."""
+        return any((old or None) != (new or None) for old, new in zip(old_values, new_values))
 
-    def _parse_uptime(self, uptime_str):
+    @staticmethod
+    def _session_restarted(last_seen, new_started_at):
+        """Whether the session started after the poll that last saw it.
+        
+        Only a forward move past last_seen counts: a start time that drifts
+        backwards or by a few seconds is the same session. Unknown start
+        times (no uptime reported) never count as a restart.
+        """
+        if not last_seen or not new_started_at:
+            return False
+        return (new_started_at - last_seen).total_seconds() > SESSION_START_TOLERANCE
+
+    @staticmethod
+    def _counter_delta(old, new, restarted=False):
+        """Bytes transferred since the previous sync.
+        
+        A session that reconnected between polls restarted its counter
+        from zero, so the full counter is new traffic. That shows as a
+        start after the previous poll (restarted) or as a counter lower
+        than the stored one.
+        """
+        old = float(old or 0)
+        if restarted or new < old:
+            return new
+        return new - old
+
+    @staticmethod
+    def _parse_uptime(uptime_str):
         """Parse RouterOS uptime string to seconds."""
         if not uptime_str:
             return 0
         
         total = 0
-        import re
-        
-        # Pattern: 1w2d3h4m5s
-        weeks = re.search(r"(\d+)w", uptime_str)
-        days = re.search(r"(\d+)d", uptime_str)
-        hours = re.search(r"(\d+)h", uptime_str)
-        mins = re.search(r"(\d+)m", uptime_str)
-        secs = re.search(r"(\d+)s", uptime_str)
-        
-        if weeks:
-            total += int(weeks.group(1)) * 604800
-        if days:
-            total += int(days.group(1)) * 86400
-        if hours:
-            total += int(hours.group(1)) * 3600
-        if mins:
-            total += int(mins.group(1)) * 60
-        if secs:
-            total += int(secs.group(1))
-        
+        for value, unit, hours, mins, secs in _DURATION_RE.findall(uptime_str):
+            if unit:
+                total += int(value) * _DURATION_UNITS[unit]
+            else:
+                total += int(hours) * 3600 + int(mins) * 60 + int(secs)
         return total
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+
+import logging
+from datetime import datetime, timedelta
+
+from psycopg2.extras import execute_values
+
+from odoo import api, fields, models, tools
+
+_logger = logging.getLogger(__name__)
+
+
+class MikrotikSessionUsage(models.Model):
+    """Per-subscriber traffic accounting buckets.
+
+    mikrotik.session.sync_sessions turns byte counter changes between two
+    syncs into deltas (after a reconnect, seen as a moved start time or a
+    counter lower than the stored one, the full counter counts) and
+    accumulates them here into
+    hourly and daily buckets per username. Monthly partitions keep
+    retention a partition drop.
+    """
+
+    _name = "mikrotik.session.usage"
+    _inherit = ["mikrotik.partition.mixin"]
+    _description = "MikroTik Subscriber Usage"
+    _order = "bucket desc, bytes_total desc"
+    _rec_name = "name"
+    _log_access = False
+
+    _partition_column = "bucket"
+    _partition_interval = "month"
+    _partition_premake = 2
+
+    device_id = fields.Many2one(
+        "mikrotik.device",
+        string="Device",
+        required=True,
+        ondelete="cascade",
+    )
+    session_type = fields.Selection(
+        selection=lambda self: self.env["mikrotik.session"]._fields["session_type"].selection,
+        string="Type",
+        required=True,
+    )
+    name = fields.Char(
+        string="Username",
+        required=True,
+        index=True,
+    )
+    period = fields.Selection(
+        [
+            ("hour", "Hourly"),
+            ("day", "Daily"),
+        ],
+        string="Period",
+        required=True,
+    )
+    bucket = fields.Datetime(
+        string="Period Start",
+        required=True,
+    )
+    bytes_in = fields.Float(string="Bytes In")
+    bytes_out = fields.Float(string="Bytes Out")
+    bytes_total = fields.Float(string="Total Bytes")
+
+    _sql_constraints = [
+        (
+            "usage_bucket_uniq",
+            "UNIQUE(device_id, session_type, name, period, bucket)",
+            "Usage bucket must be unique per subscriber and period.",
+        ),
+    ]
+
+    def _auto_init(self):
+        res = super()._auto_init()
+        # Top-N scans over a period range
+        tools.create_index(
+            self._cr,
+            "mikrotik_session_usage_period_bucket_idx",
+            self._table,
+            ["period", "bucket"],
+        )
+        return res
+
+    @api.model
+    def add_usage(self, rows, ts=None):
+        """Accumulate byte deltas into the hourly and daily buckets of ts.
+
+        Args:
+            rows: list of tuples (device_id, session_type, name, delta_in, delta_out)
+            ts: datetime of the sync (defaults to now)
+
+        Returns:
+            Number of subscribers accounted
+        """
+        rows = [row for row in rows if row[3] or row[4]]
+        if not rows:
+            return 0
+        ts = ts or fields.Datetime.now()
+        hour = ts.replace(minute=0, second=0, microsecond=0)
+        day = hour.replace(hour=0)
+
+        values = []
+        for device_id, session_type, name, delta_in, delta_out in rows:
+            for period, bucket in (("hour", hour), ("day", day)):
+                values.append((
+                    device_id, session_type, name, period, bucket,
+                    delta_in, delta_out, delta_in + delta_out,
+                ))
+
+        self.flush_model()
+        execute_values(
+            self._cr,
+            """
+            INSERT INTO mikrotik_session_usage AS u
+                (device_id, session_type, name, period, bucket, bytes_in, bytes_out, bytes_total)
+            VALUES %s
+            ON CONFLICT (device_id, session_type, name, period, bucket) DO UPDATE SET
+                bytes_in = u.bytes_in + EXCLUDED.bytes_in,
+                bytes_out = u.bytes_out + EXCLUDED.bytes_out,
+                bytes_total = u.bytes_total + EXCLUDED.bytes_total
+            """,
+            values,
+            page_size=len(values),
+        )
+        self.invalidate_model()
+        return len(rows)
+
+    @api.model
+    def get_top_users(self, start, end, limit=10, period="hour", device_id=None, session_type=None):
+        """Return the subscribers with the most traffic in [start, end).
+
+        Args:
+            start: naive UTC datetime
+            end: naive UTC datetime
+            limit: number of subscribers to return
+            period: bucket granularity to read ("hour" or "day")
+            device_id: optional device filter
+            session_type: optional session type filter
+
+        Returns:
+            list of dicts with name, bytes_in, bytes_out, bytes_total
+        """
+        self.flush_model()
+        where = ["period = %s", "bucket >= %s", "bucket < %s"]
+        params = [period, start, end]
+        if device_id:
+            where.append("device_id = %s")
+            params.append(device_id)
+        if session_type:
+            where.append("session_type = %s")
+            params.append(session_type)
+        params.append(limit)
+
+        self._cr.execute(
+            f"""
+            SELECT name, SUM(bytes_in), SUM(bytes_out), SUM(bytes_total) AS total
+              FROM mikrotik_session_usage
+             WHERE {" AND ".join(where)}
+             GROUP BY name
+             ORDER BY total DESC
+             LIMIT %s
+            """,
+            params,
+        )
+        return [
+            {"name": name, "bytes_in": b_in, "bytes_out": b_out, "bytes_total": total}
+            for name, b_in, b_out, total in self._cr.fetchall()
+        ]
+
+    @api.model
+    def _cron_usage_retention(self):
+        """Premake monthly partitions and drop the expired ones."""
+        retention_days = int(self.env["ir.config_parameter"].sudo().get_param(
+            "mikrotik_monitoring.session_usage_retention_days", 400
+        ))
+        cutoff = self._partition_floor(datetime.utcnow() - timedelta(days=retention_days))
+        self._partition_ensure()
+        if self._partition_is_partitioned():
+            return self._partition_drop_before(cutoff)
+
+        self._cr.execute("DELETE FROM mikrotik_session_usage WHERE bucket < %s", (cutoff,))
+        return self._cr.rowcount
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """Start collector for qwer database"""
 import sys
+import time
 sys.path.insert(0, '/usr/lib/python3/dist-packages')
 
 import odoo
@@ -33,12 +34,12 @@ with registry.cursor() as cr:
     
     # Force reload to register devices
     print(f"\n🔄 Forcing reload to register devices...")
-    collector._reload_collectors(env)
+    collector.reload_configuration()
+    time.sleep(2)
     
-    with collector._lock:
-        print(f"   Collectors registered: {len(collector._collectors)}")
-        for device_id in collector._collectors.keys():
-            print(f"   - Device ID: {device_id}")
+    print(f"   Collectors registered: {len(collector._collectors)}")
+    for device_id in list(collector._collectors):
+        print(f"   - Device ID: {device_id}")
     
     cr.commit()
 
@@ -25,6 +25,7 @@ import { useService } from "@web/core/utils/hooks";
 class TrafficChart extends Component {
   setup() {
     this.orm = useService("orm");
+    this.rpc = useService("rpc");
     this.chartCanvas = useRef("chartCanvas");
 
     this.state = useState({
@@ -44,7 +45,9 @@ class TrafficChart extends Component {
     this.chart = null;
     this.refreshInterval = null;
     this.chartJsLoaded = false;
-    this.rawData = null; // Store raw data for filtering
+    this.rawData = null; // Store server series for filtering/export
+    this.seriesStep = null; // Bucket width (s) of rawData, reused for incremental refresh
+    this.metricKeys = ["iface.rx_bps", "iface.tx_bps", "ping.avg_latency_ms"];
 
     // Get device_id from props context
     this.deviceId = this.props.action?.context?.device_id || null;
@@ -135,85 +138,38 @@ class TrafficChart extends Component {
 
     try {
       console.log("Loading traffic data...");
-      // Calculate time window
-      const now = new Date();
-      const startTime = new Date(now.getTime() - this.state.timeRange * 1000);
-
-      // Format for Odoo datetime comparison
-      const startTimeStr = startTime
-        .toISOString()
-        .replace("T", " ")
-        .slice(0, 19);
-
-      // Fetch traffic metrics (RX, TX, and Ping Latency)
-      const domain = [
-        ["ts_collected", ">=", startTimeStr],
-        [
-          "metric_id.key",
-          "in",
-          ["iface.rx_bps", "iface.tx_bps", "ping.avg_latency_ms"],
-        ],
-      ];
-
-      // Filter by device if device_id is provided
-      if (this.deviceId) {
-        domain.push(["device_id", "=", this.deviceId]);
-      }
-
-      const fields = [
-        "ts_collected",
-        "value_float",
-        "metric_id",
-        "interface_name",
-      ];
-
-      const points = await this.orm.searchRead(
-        "mikrotik.metric.point",
-        domain,
-        fields,
-        {
-          order: "ts_collected ASC",
-          limit: 50000, // Safety limit
-        }
-      );
-
-      // Get metric details
-      const metricIds = [...new Set(points.map((p) => p.metric_id[0]))];
-
-      const metrics = await this.orm.searchRead(
-        "mikrotik.metric.catalog",
-        [["id", "in", metricIds]],
-        ["id", "key"]
-      );
-
-      // Create lookup map
-      const metricMap = Object.fromEntries(metrics.map((m) => [m.id, m.key]));
+      // Calculate time window (UTC epoch seconds)
+      const end = Math.floor(Date.now() / 1000);
+      const start = end - this.state.timeRange;
+
+      // Server buckets the window to one point per pixel (min/avg/max),
+      // reading from the coarsest rollup that still resolves a bucket
+      const response = await this.rpc("/mikrotik/chart/series", {
+        device_id: this.deviceId,
+        metric_keys: this.metricKeys,
+        start,
+        end,
+        width: this.chartCanvas.el?.clientWidth || 1200,
+      });
 
-      // Store raw data with metric keys for filtering/export
-      this.rawData = points.map((p) => ({
-        ...p,
-        metricKey: metricMap[p.metric_id[0]],
-      }));
+      // Store series for filtering/export
+      this.rawData = response.series;
+      this.seriesStep = response.step;
 
       // Extract unique interfaces for filter dropdown
       const interfaces = [
-        ...new Set(points.map((p) => p.interface_name).filter(Boolean)),
+        ...new Set(this.rawData.map((s) => s.interface).filter(Boolean)),
       ].sort();
       this.state.interfaces = interfaces;
 
       // Apply filters to data before processing
-      let filteredPoints = this.applyDataFilters(points, metricMap);
+      const filteredSeries = this.applyDataFilters(this.rawData);
 
       // Calculate statistics
-      this.calculateStats(
-        filteredPoints.map((p) => ({
-          ...p,
-          metricKey: metricMap[p.metric_id[0]],
-        }))
-      );
+      this.calculateStats(filteredSeries);
 
       // Process data for Chart.js
-      const processedData = this.processData(filteredPoints, metricMap);
+      const processedData = this.processData(filteredSeries);
 
       // Render or update chart
       if (this.chart) {
@@ -231,55 +187,155 @@ class TrafficChart extends Component {
   }
 
   /**
-   * Process raw metric points into Chart.js datasets
+   * Fetch only buckets newer than the last one held and append them to
+   * the existing datasets, trimming what slid out of the window. Costs the
+   * same whatever the window length.
    */
-  processData(points, metricMap) {
-    // Group by interface and metric type
-    const grouped = {};
+  async loadIncremental() {
+    if (!this.chart || !this.rawData || !this.seriesStep) {
+      return this.loadData();
+    }
 
-    for (const point of points) {
-      const metricKey = metricMap[point.metric_id[0]];
+    try {
+      const end = Math.floor(Date.now() / 1000);
+      // The last bucket held may be partial: refetch it along with newer ones
+      const since = Math.max(
+        0,
+        ...this.rawData.map((s) => (s.t.length ? s.t[s.t.length - 1] : 0))
+      );
 
-      // Handle ping latency separately
-      if (metricKey === "ping.avg_latency_ms") {
-        const key = "Ping Latency";
-        if (!grouped[key]) {
-          grouped[key] = {
-            interfaceName: "Ping",
-            metricType: "Latency",
-            points: [],
-            isPing: true,
-          };
+      const response = await this.rpc("/mikrotik/chart/series", {
+        device_id: this.deviceId,
+        metric_keys: this.metricKeys,
+        since: since || end - this.state.timeRange,
+        step: this.seriesStep,
+        end,
+      });
+
+      const windowStart = end - this.state.timeRange;
+      let newSeries = false;
+
+      for (const fresh of response.series) {
+        const held = this.rawData.find(
+          (s) => s.metric === fresh.metric && s.interface === fresh.interface
+        );
+        if (held) {
+          this.mergeSeries(held, fresh);
+        } else {
+          this.rawData.push(fresh);
+          newSeries = true;
         }
-        const timestamp = new Date(point.ts_collected.replace(" ", "T") + "Z");
-        grouped[key].points.push({
-          x: timestamp,
-          y: point.value_float || 0,
-        });
-        continue;
       }
+      for (const held of this.rawData) {
+        this.trimSeries(held, windowStart);
+      }
+
+      const filteredSeries = this.applyDataFilters(this.rawData);
+      this.calculateStats(filteredSeries);
+
+      if (newSeries) {
+        // A new interface appeared: rebuild datasets once
+        this.state.interfaces = [
+          ...new Set(this.rawData.map((s) => s.interface).filter(Boolean)),
+        ].sort();
+        this.updateChart(this.processData(filteredSeries));
+      } else {
+        const freshByKey = Object.fromEntries(
+          response.series.map((s) => [this.seriesKey(s), s])
+        );
+        for (const dataset of this.chart.data.datasets) {
+          const fresh = freshByKey[dataset.seriesKey];
+          const points = fresh ? this.toPoints(fresh) : [];
+          const data = dataset.data;
+          if (points.length) {
+            while (data.length && data[data.length - 1].x >= points[0].x) {
+              data.pop();
+            }
+            data.push(...points);
+          }
+          while (data.length && data[0].x < windowStart * 1000) {
+            data.shift();
+          }
+        }
+        this.chart.update("none");
+      }
+
+      this.state.lastUpdate = new Date();
+    } catch (error) {
+      console.error("Error refreshing traffic data:", error);
+    }
+  }
+
+  /**
+   * Replace the overlapping tail of a held series with fresh buckets
+   */
+  mergeSeries(held, fresh) {
+    if (!fresh.t.length) return;
+    let keep = held.t.length;
+    while (keep && held.t[keep - 1] >= fresh.t[0]) {
+      keep--;
+    }
+    for (const field of ["t", "min", "avg", "max"]) {
+      held[field].splice(keep, held[field].length - keep, ...fresh[field]);
+    }
+  }
+
+  /**
+   * Drop buckets that slid out of the window
+   */
+  trimSeries(series, windowStart) {
+    let drop = 0;
+    while (drop < series.t.length && series.t[drop] < windowStart) {
+      drop++;
+    }
+    if (drop) {
+      for (const field of ["t", "min", "avg", "max"]) {
+        series[field].splice(0, drop);
+      }
+    }
+  }
 
-      const interfaceName = point.interface_name || "Unknown";
-      const metricType = metricKey.endsWith("rx_bps") ? "RX" : "TX";
+  seriesKey(series) {
+    return `${series.metric}|${series.interface || ""}`;
+  }
 
-      const key = `${interfaceName}|${metricType}`;
+  /**
+   * Chart.js points for a series (traffic in Mbps, latency in ms)
+   */
+  toPoints(series) {
+    const scale = series.metric === "ping.avg_latency_ms" ? 1 : 1000000;
+    return series.t.map((t, i) => ({ x: t * 1000, y: series.avg[i] / scale }));
+  }
 
-      if (!grouped[key]) {
-        grouped[key] = {
-          interfaceName,
-          metricType,
-          points: [],
+  /**
+   * Process server series into Chart.js datasets
+   */
+  processData(series) {
+    // Group by interface and metric type
+    const grouped = {};
+
+    for (const s of series) {
+      // Handle ping latency separately
+      if (s.metric === "ping.avg_latency_ms") {
+        grouped["Ping Latency"] = {
+          interfaceName: "Ping",
+          metricType: "Latency",
+          seriesKey: this.seriesKey(s),
+          points: this.toPoints(s),
+          isPing: true,
         };
+        continue;
       }
 
-      // Convert to Mbps and parse timestamp
-      const timestamp = new Date(point.ts_collected.replace(" ", "T") + "Z");
-      const valueMbps = (point.value_float || 0) / 1000000;
+      const interfaceName = s.interface || "Unknown";
+      const metricType = s.metric.endsWith("rx_bps") ? "RX" : "TX";
 
-      grouped[key].points.push({
-        x: timestamp,
-        y: valueMbps,
-      });
+      grouped[`${interfaceName}|${metricType}`] = {
+        interfaceName,
+        metricType,
+        seriesKey: this.seriesKey(s),
+        points: this.toPoints(s),
+      };
     }
 
     // Convert to Chart.js datasets
@@ -294,6 +350,7 @@ class TrafficChart extends Component {
 
       datasets.push({
         label: `${data.interfaceName} - ${data.metricType}`,
+        seriesKey: data.seriesKey,
         data: data.points,
         borderColor: color,
         backgroundColor: data.isPing
@@ -588,7 +645,7 @@ class TrafficChart extends Component {
 
     this.refreshInterval = setInterval(() => {
       if (this.state.autoRefresh) {
-        this.loadData();
+        this.loadIncremental();
       }
     }, 5000); // 5 second refresh
   }
@@ -612,18 +669,9 @@ class TrafficChart extends Component {
     this.state.smoothness = newSmoothness;
     
     if (this.chart && this.rawData) {
-      const metricMap = {};
-      this.rawData.forEach((p) => {
-        metricMap[p.metric_id[0]] = p.metricKey;
-      });
-      let filteredData = this.applyDataFilters(
-        this.rawData.map((p) => ({
-          ...p,
-          metric_id: [p.metric_id[0]],
-        })),
-        metricMap
+      const processedData = this.processData(
+        this.applyDataFilters(this.rawData)
       );
-      const processedData = this.processData(filteredData, metricMap);
       
       // Destroy old chart and render new one to apply tension changes
       this.chart.destroy();
@@ -716,12 +764,13 @@ class TrafficChart extends Component {
 
     let csv = "Timestamp,Interface,Metric,Value (Mbps)\n";
 
-    this.rawData.forEach((point) => {
-      const timestamp = point.ts_collected;
-      const iface = point.interface_name || "Unknown";
-      const metric = point.metricKey;
-      const value = (point.value_float / 1000000).toFixed(3);
-      csv += `${timestamp},${iface},${metric},${value}\n`;
+    this.rawData.forEach((s) => {
+      const iface = s.interface || "Unknown";
+      s.t.forEach((t, i) => {
+        const timestamp = new Date(t * 1000).toISOString();
+        const value = (s.avg[i] / 1000000).toFixed(3);
+        csv += `${timestamp},${iface},${s.metric},${value}\n`;
+      });
     });
 
     const blob = new Blob([csv], { type: "text/csv" });
@@ -736,26 +785,23 @@ class TrafficChart extends Component {
   }
 
   /**
-   * Apply filters to raw data points (used during initial load and manual filter changes)
+   * Apply filters to series (used during load and manual filter changes)
    */
-  applyDataFilters(points, metricMap) {
-    return points.filter((point) => {
-      const interfaceName = point.interface_name;
-      const metricKey = metricMap[point.metric_id[0]];
-
+  applyDataFilters(series) {
+    return series.filter((s) => {
       // Interface filter
       if (
         this.state.selectedInterface &&
-        interfaceName !== this.state.selectedInterface
+        s.interface !== this.state.selectedInterface
       ) {
         return false;
       }
 
       // Metric filter
-      if (this.state.metricFilter === "rx" && !metricKey.includes("rx")) {
+      if (this.state.metricFilter === "rx" && !s.metric.includes("rx")) {
         return false;
       }
-      if (this.state.metricFilter === "tx" && !metricKey.includes("tx")) {
+      if (this.state.metricFilter === "tx" && !s.metric.includes("tx")) {
         return false;
       }
 
@@ -769,71 +815,50 @@ class TrafficChart extends Component {
   applyFilters() {
     if (!this.rawData) return;
 
-    // Build metricMap from rawData
-    const metricMap = {};
-    this.rawData.forEach((p) => {
-      metricMap[p.metric_id[0]] = p.metricKey;
-    });
-
-    // Apply filters
-    let filteredData = this.applyDataFilters(
-      this.rawData.map((p) => ({
-        ...p,
-        metric_id: [p.metric_id[0]],
-      })),
-      metricMap
-    );
-
-    const processedData = this.processData(filteredData, metricMap);
-    this.updateChart(processedData);
-    this.calculateStats(
-      filteredData.map((p) => ({
-        ...p,
-        metricKey: metricMap[p.metric_id[0]],
-      }))
-    );
+    const filteredSeries = this.applyDataFilters(this.rawData);
+    this.updateChart(this.processData(filteredSeries));
+    this.calculateStats(filteredSeries);
   }
 
   /**
-   * Calculate statistics from data - show recent averages (last 30 seconds)
+   * Calculate statistics from series - current traffic is the last bucket of
+   * each series, whatever the bucket width of the window
    */
-  calculateStats(points) {
+  calculateStats(series) {
     const interfaces = new Set();
 
-    // Get recent points (last 30 seconds) for current traffic stats
-    const now = new Date();
-    const thirtySecondsAgo = new Date(now.getTime() - 30000);
-
-    const recentPoints = points.filter((point) => {
-      const pointTime = new Date(point.ts_collected.replace(" ", "T") + "Z");
-      return pointTime >= thirtySecondsAgo;
-    });
-
     let totalRx = 0;
     let totalTx = 0;
     let rxCount = 0;
     let txCount = 0;
+    let pointCount = 0;
 
-    points.forEach((point) => {
-      interfaces.add(point.interface_name);
-    });
+    for (const s of series) {
+      pointCount += s.t.length;
+      if (s.metric === "ping.avg_latency_ms") continue;
+      interfaces.add(s.interface);
 
-    // Use recent points for current traffic calculation
-    recentPoints.forEach((point) => {
-      if (point.metricKey.includes("rx")) {
-        totalRx += point.value_float || 0;
+      // Latest bucket with data (the newest one may still be empty)
+      let last = s.avg.length - 1;
+      while (last >= 0 && (s.avg[last] === null || s.avg[last] === undefined)) {
+        last--;
+      }
+      if (last < 0) continue;
+
+      if (s.metric.includes("rx")) {
+        totalRx += s.avg[last];
         rxCount++;
       } else {
-        totalTx += point.value_float || 0;
+        totalTx += s.avg[last];
         txCount++;
       }
-    });
+    }
 
     this.state.stats = {
       interfaceCount: interfaces.size,
       totalRx: rxCount > 0 ? totalRx / rxCount : 0,
       totalTx: txCount > 0 ? totalTx / txCount : 0,
-      pointCount: points.length,
+      pointCount,
     };
   }
 
@@ -72,14 +72,18 @@ export class MikrotikLiveDashboard extends Component {
     }
 
     try {
-      // Load latest metrics snapshot
+      // Load latest metrics snapshot (columnar, skipped when unchanged)
       const snapshot = await this.orm.call(
         "mikrotik.metric.latest",
-        "get_device_snapshot",
-        [this.deviceId]
+        "get_device_snapshot_compact",
+        [this.deviceId],
+        { version: this.snapshotVersion || null }
       );
 
-      this.state.metrics = this.processSnapshot(snapshot);
+      this.snapshotVersion = snapshot.version;
+      if (!snapshot.unchanged) {
+        this.state.metrics = this.processSnapshot(snapshot);
+      }
 
       // Load interfaces
       const interfaces = await this.orm.searchRead(
@@ -109,18 +113,22 @@ export class MikrotikLiveDashboard extends Component {
 
   processSnapshot(snapshot) {
     const metrics = {};
+    const { keys, interfaces, values, timestamps } = snapshot;
 
-    for (const item of snapshot) {
-      const key = item.interface_name
-        ? `${item.metric_key}:${item.interface_name}`
-        : item.metric_key;
+    for (let i = 0; i < keys.length; i++) {
+      const metricKey = keys[i];
+      const interfaceName = interfaces[i];
+      const key = interfaceName ? `${metricKey}:${interfaceName}` : metricKey;
 
       metrics[key] = {
-        key: item.metric_key,
-        interface: item.interface_name,
-        value: item.value_display,
-        rawValue: item.value_float || item.value_text,
-        timestamp: item.ts_last_update,
+        key: metricKey,
+        interface: interfaceName,
+        value:
+          values[i] === null || values[i] === undefined
+            ? "-"
+            : this.formatValue(metricKey, values[i]),
+        rawValue: values[i],
+        timestamp: timestamps[i] ? new Date(timestamps[i] * 1000) : null,
       };
     }
 
@@ -130,22 +138,56 @@ export class MikrotikLiveDashboard extends Component {
   subscribeToUpdates() {
     if (!this.deviceId) return;
 
-    const channel = `mikrotik_monitoring.device.${this.deviceId}`;
+    this.channel = `mikrotik_monitoring.device.${this.deviceId}`;
+    this.clientKey = Math.random().toString(36).slice(2);
+    this.onNotificationBound = this.onNotification.bind(this);
 
-    this.busService.addChannel(channel);
-    this.busService.addEventListener(
-      "notification",
-      this.onNotification.bind(this)
-    );
+    this.busService.addChannel(this.channel);
+    this.busService.addEventListener("notification", this.onNotificationBound);
 
-    console.log(`Subscribed to MikroTik updates: ${channel}`);
+    // Server only publishes devices with a live viewer: register and keep
+    // the registration alive with a heartbeat
+    this.sendHeartbeat();
+
+    console.log(`Subscribed to MikroTik updates: ${this.channel}`);
+  }
+
+  async sendHeartbeat() {
+    let delay;
+    try {
+      const { ttl } = await this.orm.call(
+        "mikrotik.live.subscription",
+        "subscribe",
+        [this.deviceId, this.clientKey]
+      );
+      this.heartbeatFailures = 0;
+      // Renew well before expiry so a slow request does not drop updates
+      delay = Math.max(ttl / 3, 5);
+    } catch (error) {
+      console.error("Failed to register live subscription:", error);
+      // Keep retrying (5s doubling up to 60s) so updates resume after an outage
+      this.heartbeatFailures = (this.heartbeatFailures || 0) + 1;
+      delay = Math.min(5 * 2 ** (this.heartbeatFailures - 1), 60);
+    }
+    if (this.unsubscribed) return;
+    this.heartbeatTimer = setTimeout(() => this.sendHeartbeat(), delay * 1000);
   }
 
   unsubscribeFromUpdates() {
-    this.busService.removeEventListener(
-      "notification",
-      this.onNotification.bind(this)
-    );
+    this.unsubscribed = true;
+    clearTimeout(this.heartbeatTimer);
+    if (!this.channel) return;
+
+    this.busService.removeEventListener("notification", this.onNotificationBound);
+    this.busService.deleteChannel(this.channel);
+    this.orm
+      .call("mikrotik.live.subscription", "unsubscribe", [
+        this.deviceId,
+        this.clientKey,
+      ])
+      .catch(() => {
+        // Expires with the heartbeat anyway
+      });
   }
 
   onNotification({ detail: notifications }) {
@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+
+from . import test_async_collector
+from . import test_ingest
+from . import test_ingest_controller
+from . import test_interface
+from . import test_metric_rollup
+from . import test_pool
+from . import test_session
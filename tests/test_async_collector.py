@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+from unittest.mock import patch
+
+from psycopg2.extensions import TransactionRollbackError
+
+from odoo.tests import BaseCase, tagged
+
+from ..collector import async_collector as collector_module
+from ..collector.api import RouterOSError
+from ..collector.async_collector import TIERS, AsyncCollectorService, DeviceCollector
+
+CONFIG = {
+    "device_uid": "test-collector",
+    "host": "192.0.2.1",
+    "api_port": 0,
+    "username": "admin",
+    "password": "secret",
+    "use_ssl": False,
+    "realtime_interval": 5,
+    "short_interval": 60,
+    "medium_interval": 300,
+}
+
+
+class FakeClient:
+    """Replies per command: a list, an exception to raise or a delay in seconds."""
+
+    def __init__(self, replies):
+        self.replies = replies
+        self.connected = True
+        self.calls = []
+
+    async def call(self, command, attrs=None, queries=None):
+        self.calls.append(command)
+        reply = self.replies.get(command, [])
+        if isinstance(reply, BaseException):
+            raise reply
+        if isinstance(reply, (int, float)):
+            await asyncio.sleep(reply)
+            return []
+        return reply
+
+
+class FakePool:
+
+    def __init__(self, client):
+        self.client = client
+        self.discarded = []
+
+    async def acquire(self, key, *args, **kwargs):
+        return self.client
+
+    async def discard(self, key, error=None):
+        self.client.connected = False
+        self.discarded.append((key, error))
+
+
+def _replies(**overrides):
+    replies = {
+        "/system/resource/print": [{"cpu-load": "12", "uptime": "1h"}],
+        "/interface/print": [
+            {"name": "ether1", "type": "ether", "running": "true", "rx-byte": "1000", "tx-byte": "2000"},
+        ],
+        "/ip/dhcp-server/lease/print": [{"status": "bound"}],
+        "/ppp/active/print": [],
+        "/ip/hotspot/active/print": RouterOSError("no such command prefix"),
+    }
+    replies.update(overrides)
+    return replies
+
+
+@tagged("post_install", "-at_install")
+class TestDeviceSchedule(BaseCase):
+
+    def setUp(self):
+        super().setUp()
+        self.collector = DeviceCollector(1, dict(CONFIG))
+        self.collector._next = dict.fromkeys(TIERS, 100.0)
+
+    def test_due_tiers(self):
+        self.collector._next["medium"] = 200.0
+        self.assertEqual(self.collector.due_tiers(100.0), ["realtime", "short"])
+        self.assertEqual(self.collector.next_run(), 100.0)
+
+    def test_reschedule_keeps_cadence(self):
+        # Polled a little late: the next poll stays on the grid
+        self.collector.reschedule(["realtime"], 101.5)
+        self.assertEqual(self.collector._next["realtime"], 105.0)
+
+    def test_reschedule_after_falling_behind(self):
+        self.collector.reschedule(["realtime"], 130.0)
+        self.assertEqual(self.collector._next["realtime"], 135.0)
+
+    def test_reschedule_failed_retries_at_realtime_pace(self):
+        self.collector.reschedule(["short", "medium"], 100.0, failed=True)
+        self.assertEqual(self.collector._next["short"], 105.0)
+        self.assertEqual(self.collector._next["medium"], 105.0)
+
+
+@tagged("post_install", "-at_install")
+class TestDeviceCollect(BaseCase):
+
+    def _collect(self, replies, tiers=TIERS, timeout=1):
+        client = FakeClient(replies)
+        pool = FakePool(client)
+        collector = DeviceCollector(1, dict(CONFIG), timeout=timeout)
+        with patch.object(collector_module, "get_pool", return_value=pool):
+            result, failed = asyncio.run(collector.collect(list(tiers), 100.0))
+        return collector, pool, result, failed
+
+    def test_all_tiers(self):
+        collector, pool, result, failed = self._collect(_replies())
+        self.assertEqual(failed, [])
+        self.assertEqual(result["metrics"]["system.cpu.load_pct"], 12.0)
+        self.assertEqual(result["metrics"]["dhcp.active_leases"], 1)
+        self.assertNotIn("hotspot", result["sessions"])
+        self.assertEqual(result["interfaces"][0]["name"], "ether1")
+        # Interface list read once for the realtime and medium tiers
+        self.assertEqual(pool.client.calls.count("/interface/print"), 1)
+        self.assertIsNone(collector.last_error)
+
+    def test_trap_fails_only_its_tier(self):
+        collector, pool, result, failed = self._collect(_replies(**{
+            "/ip/dhcp-server/lease/print": RouterOSError("no such command prefix"),
+        }))
+        self.assertEqual(failed, ["short"])
+        self.assertIn("system.cpu.load_pct", result["metrics"])
+        self.assertIn("interfaces", result)
+        self.assertFalse(pool.discarded)
+        self.assertTrue(collector.last_error.startswith("short:"))
+
+    def test_transport_error_drops_session(self):
+        error = EOFError()
+        collector, pool, result, failed = self._collect(_replies(**{
+            "/ip/dhcp-server/lease/print": error,
+        }))
+        # Tiers after the broken one are not attempted
+        self.assertEqual(failed, ["short", "medium"])
+        self.assertIn("system.cpu.load_pct", result["metrics"])
+        self.assertEqual(pool.discarded, [(1, error)])
+        self.assertIsNone(collector.client)
+
+    def test_tier_timeout(self):
+        collector, pool, result, failed = self._collect(
+            _replies(**{"/ip/dhcp-server/lease/print": 1}),
+            tiers=("realtime", "short"),
+            timeout=0.05,
+        )
+        self.assertEqual(failed, ["short"])
+        self.assertIn("system.cpu.load_pct", result["metrics"])
+        self.assertEqual(len(pool.discarded), 1)
+
+    def test_all_tiers_failed(self):
+        collector, pool, result, failed = self._collect(_replies(**{
+            "/system/resource/print": OSError("reset by peer"),
+        }), tiers=("realtime",))
+        self.assertIsNone(result)
+        self.assertEqual(failed, ["realtime"])
+
+    def test_interface_rates(self):
+        collector = DeviceCollector(1, dict(CONFIG))
+        collector.client = FakeClient(_replies())
+
+        def sample(now, rx, tx):
+            interfaces = [{"name": "ether1", "rx-byte": str(rx), "tx-byte": str(tx)}]
+            return asyncio.run(collector.collect_realtime(now, interfaces))
+
+        self.assertNotIn("iface.ether1.rx_bps", sample(100.0, 1000, 2000))
+        metrics = sample(105.0, 6000, 2500)
+        self.assertEqual(metrics["iface.ether1.rx_bps"], 8000.0)
+        self.assertEqual(metrics["iface.ether1.tx_bps"], 800.0)
+        # Counter reset: no rate until the next sample
+        metrics = sample(110.0, 100, 3000)
+        self.assertNotIn("iface.ether1.rx_bps", metrics)
+        self.assertEqual(metrics["iface.ether1.tx_bps"], 800.0)
+
+
+@tagged("post_install", "-at_install")
+class TestCollectorWriter(BaseCase):
+
+    def test_writer_batches_results(self):
+        service = AsyncCollectorService("test")
+        stored = []
+        service._store = stored.append
+
+        async def scenario():
+            service._loop = asyncio.get_running_loop()
+            service._queue = asyncio.Queue()
+            for device_id in (1, 2):
+                service._queue.put_nowait({"device_id": device_id})
+            service._queue.put_nowait(None)
+            await service._writer()
+
+        with patch.object(collector_module, "FLUSH_INTERVAL", 0):
+            asyncio.run(scenario())
+        self.assertEqual(stored, [[{"device_id": 1}, {"device_id": 2}]])
+
+    def test_store_retries_serialization_failures(self):
+        service = AsyncCollectorService("test")
+        attempts = []
+
+        def store_batch(results):
+            attempts.append(results)
+            if len(attempts) < collector_module.STORE_ATTEMPTS:
+                raise TransactionRollbackError("could not serialize access")
+            return True
+
+        service._store_batch = store_batch
+        with patch.object(collector_module.time, "sleep"):
+            self.assertTrue(service._store(["result"]))
+        self.assertEqual(len(attempts), collector_module.STORE_ATTEMPTS)
+
+    def test_store_gives_up(self):
+        service = AsyncCollectorService("test")
+
+        def store_batch(results):
+            raise TransactionRollbackError("could not serialize access")
+
+        service._store_batch = store_batch
+        with patch.object(collector_module.time, "sleep"):
+            with self.assertRaises(TransactionRollbackError):
+                service._store(["result"])
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+from datetime import datetime
+
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged("post_install", "-at_install")
+class TestIngest(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Ingest = cls.env["mikrotik.ingest"]
+
+    def test_parse_ts_iso(self):
+        self.assertEqual(
+            self.Ingest._parse_ts("2024-05-01T10:20:30Z"),
+            datetime(2024, 5, 1, 10, 20, 30),
+        )
+        # Offset is dropped, value is kept as naive UTC
+        self.assertIsNone(self.Ingest._parse_ts("2024-05-01T10:20:30+00:00").tzinfo)
+
+    def test_parse_ts_epoch(self):
+        self.assertEqual(self.Ingest._parse_ts(1714558830), datetime(2024, 5, 1, 10, 20, 30))
+        self.assertEqual(
+            self.Ingest._parse_ts(1714558830.5), datetime(2024, 5, 1, 10, 20, 30, 500000)
+        )
+
+    def test_parse_ts_invalid(self):
+        with self.assertRaises(ValueError):
+            self.Ingest._parse_ts(1e20)
+        with self.assertRaises(ValueError):
+            self.Ingest._parse_ts("yesterday")
+
+    def test_parse_ts_empty_is_now(self):
+        self.assertIsInstance(self.Ingest._parse_ts(None), datetime)
+
+    def test_expand_compact(self):
+        ids = self.env["mikrotik.metric.catalog"].get_metric_ids(
+            ["system.cpu.load_pct", "iface.rx_bps"]
+        )
+        unknown_id = max(ids.values()) + 1000
+        devices_data, errors = self.Ingest._expand_compact([{
+            "device_uid": "dev-1",
+            "ts": 1714558830,
+            "metrics": [
+                [ids["system.cpu.load_pct"], None, 12.5],
+                [ids["iface.rx_bps"], "ether1", 2000],
+                [unknown_id, None, 1],
+                "garbage",
+            ],
+        }])
+        self.assertEqual(devices_data, [{
+            "device_uid": "dev-1",
+            "ts": 1714558830,
+            "metrics": {
+                "system.cpu.load_pct": 12.5,
+                "iface.ether1.rx_bps": 2000,
+            },
+        }])
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0]["device_uid"], "dev-1")
+        self.assertIn(str(unknown_id), errors[0]["error"])
+        self.assertIn("garbage", errors[0]["error"])
+
+    def test_metric_key_round_trip(self):
+        for key in ("iface.ether1.rx_bps", "iface.vlan.10.tx_bps", "system.cpu.load_pct"):
+            self.assertEqual(self.Ingest._join_metric_key(*self.Ingest._split_metric_key(key)), key)
+
+    def test_bad_payload_rejects_only_its_device(self):
+        good, bad, worse = self.env["mikrotik.device"].create([
+            {"name": name, "device_uid": f"test-isolation-{name}", "host": "192.0.2.20"}
+            for name in ("good", "bad", "worse")
+        ])
+        result = self.Ingest.ingest_metrics([
+            {"device_uid": good.device_uid, "ts": 1714558830, "metrics": {"system.cpu.load_pct": 10}},
+            {"device_uid": bad.device_uid, "ts": 1714558830, "metrics": {"system.cpu.load_pct": float("nan")}},
+            {"device_uid": worse.device_uid, "ts": 1714558830, "metrics": ["system.cpu.load_pct", 1]},
+        ])
+        self.assertEqual(result["metrics_processed"], 1)
+        self.assertEqual([row[0] for row in result["devices"]], [good.id])
+        self.assertEqual(
+            sorted(error["device_uid"] for error in result["errors"]),
+            sorted([bad.device_uid, worse.device_uid]),
+        )
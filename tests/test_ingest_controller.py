@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+import gzip
+import hashlib
+import hmac
+import json
+import unittest
+
+from odoo.tests import HttpCase, tagged
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+COMPACT_URL = "/mikrotik/ingest/metrics/compact"
+SECRET = "test-secret"
+
+
+@tagged("post_install", "-at_install")
+class TestCompactIngestRoute(HttpCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env["ir.config_parameter"].set_param("mikrotik_monitoring.collector_secret", SECRET)
+        cls.device = cls.env["mikrotik.device"].create({
+            "name": "Compact Router",
+            "device_uid": "test-compact-ingest",
+            "host": "192.0.2.10",
+        })
+        cls.metric_ids = cls.env["mikrotik.metric.catalog"].get_metric_ids(
+            ["system.cpu.load_pct", "iface.rx_bps"]
+        )
+
+    def _payload(self):
+        return {
+            "devices": [{
+                "device_uid": self.device.device_uid,
+                "ts": 1767607201,
+                "metrics": [
+                    [self.metric_ids["system.cpu.load_pct"], None, 23.5],
+                    [self.metric_ids["iface.rx_bps"], "ether1", 4312332],
+                ],
+            }],
+        }
+
+    def _post(self, body, content_type="application/json", gzipped=False, secret=SECRET):
+        if gzipped:
+            body = gzip.compress(body)
+        timestamp = "2026-01-05T10:00:01Z"
+        signature = hmac.new(
+            secret.encode(), f"collector-01:{timestamp}:".encode() + body, hashlib.sha256,
+        ).hexdigest()
+        headers = {
+            "Content-Type": content_type,
+            "X-Collector-Id": "collector-01",
+            "X-Timestamp": timestamp,
+            "X-Signature": signature,
+        }
+        if gzipped:
+            headers["Content-Encoding"] = "gzip"
+        return self.url_open(COMPACT_URL, data=body, headers=headers)
+
+    def _latest(self, key, interface_name=""):
+        self.env.invalidate_all()
+        return self.env["mikrotik.metric.latest"].search([
+            ("device_id", "=", self.device.id),
+            ("metric_key", "=", key),
+            ("interface_name", "=", interface_name),
+        ])
+
+    def test_gzip_json(self):
+        response = self._post(json.dumps(self._payload()).encode(), gzipped=True)
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertTrue(result["success"], result)
+        self.assertEqual(result["metrics_processed"], 2)
+        self.assertEqual(self._latest("system.cpu.load_pct").value_float, 23.5)
+        self.assertEqual(self._latest("iface.rx_bps", "ether1").value_float, 4312332)
+
+    @unittest.skipIf(msgpack is None, "msgpack is not installed")
+    def test_msgpack(self):
+        body = msgpack.packb(self._payload(), use_bin_type=True)
+        response = self._post(body, content_type="application/msgpack", gzipped=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["metrics_processed"], 2)
+
+    def test_bad_signature(self):
+        response = self._post(json.dumps(self._payload()).encode(), secret="wrong")
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(self._latest("system.cpu.load_pct"))
+
+    def test_invalid_body(self):
+        response = self._post(b"not json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_unknown_metric_id(self):
+        payload = self._payload()
+        payload["devices"][0]["metrics"].append([max(self.metric_ids.values()) + 1000, None, 1])
+        response = self._post(json.dumps(payload).encode())
+        result = response.json()
+        self.assertEqual(result["metrics_processed"], 2)
+        self.assertIn("Unknown metric ids", result["errors"][0]["error"])
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged("post_install", "-at_install")
+class TestInterfaceSync(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.device = cls.env["mikrotik.device"].create({
+            "name": "Test Router",
+            "device_uid": "test-interface-sync",
+            "host": "192.0.2.1",
+        })
+        cls.Interface = cls.env["mikrotik.interface"]
+        cls.Event = cls.env["mikrotik.event"]
+
+    def _link_events(self):
+        return self.Event.search([
+            ("device_id", "=", self.device.id),
+            ("event_type", "in", ("interface_up", "interface_down")),
+        ])
+
+    def test_created_interfaces_log_no_transition(self):
+        summary = self.Interface.sync_from_router(self.device.id, [
+            {"name": "ether1", "type": "ether", "running": True},
+            {"name": "ether2", "type": "ether", "running": False},
+        ])
+        self.assertEqual(summary["created"], 2)
+        self.assertFalse(self._link_events())
+
+    def test_existing_interface_transitions_logged(self):
+        self.Interface.sync_from_router(self.device.id, [
+            {"name": "ether1", "type": "ether", "running": True},
+        ])
+        self.Interface.sync_from_router(self.device.id, [
+            {"name": "ether1", "type": "ether", "running": False},
+            {"name": "ether2", "type": "ether", "running": True},
+        ])
+        events = self._link_events()
+        self.assertEqual(events.mapped("event_type"), ["interface_down"])
+        self.assertEqual(events.subject, "ether1")
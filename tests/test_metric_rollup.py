@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+from datetime import datetime, timedelta
+
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged("post_install", "-at_install")
+class TestMetricRollup(TransactionCase):
+
+    def test_rollup_bucket(self):
+        ts = datetime(2024, 5, 1, 10, 24, 37, 900000)
+        expected = {
+            "mikrotik.metric.rollup.10s": datetime(2024, 5, 1, 10, 24, 30),
+            "mikrotik.metric.rollup.1m": datetime(2024, 5, 1, 10, 24),
+            "mikrotik.metric.rollup.5m": datetime(2024, 5, 1, 10, 20),
+            "mikrotik.metric.rollup.1h": datetime(2024, 5, 1, 10, 0),
+        }
+        for model_name, bucket in expected.items():
+            with self.subTest(model=model_name):
+                self.assertEqual(self.env[model_name]._rollup_bucket(ts), bucket)
+
+    def test_rollup_bucket_boundary(self):
+        Rollup = self.env["mikrotik.metric.rollup.5m"]
+        start = datetime(2024, 5, 1, 10, 25)
+        self.assertEqual(Rollup._rollup_bucket(start), start)
+        self.assertEqual(
+            Rollup._rollup_bucket(datetime(2024, 5, 1, 10, 24, 59)), datetime(2024, 5, 1, 10, 20)
+        )
+
+    def test_select_source_by_bucket_width(self):
+        Rollup = self.env["mikrotik.metric.rollup"]
+        self.assertEqual(Rollup._select_source(5), "mikrotik.metric.point")
+        self.assertEqual(Rollup._select_source(30), "mikrotik.metric.rollup.10s")
+        self.assertEqual(Rollup._select_source(600), "mikrotik.metric.rollup.5m")
+        self.assertEqual(Rollup._select_source(86400), "mikrotik.metric.rollup.1h")
+
+    def test_select_source_skips_expired_levels(self):
+        Rollup = self.env["mikrotik.metric.rollup"]
+        now = datetime.utcnow()
+        # Recent window keeps the finest fitting level
+        self.assertEqual(
+            Rollup._select_source(30, now - timedelta(days=1)), "mikrotik.metric.rollup.10s"
+        )
+        # 10s buckets are gone after 30 days: next coarser level
+        self.assertEqual(
+            Rollup._select_source(30, now - timedelta(days=45)), "mikrotik.metric.rollup.1m"
+        )
+        # Raw points are gone after 90 days
+        self.assertEqual(
+            Rollup._select_source(5, now - timedelta(days=100)), "mikrotik.metric.rollup.1m"
+        )
+        # Retention follows the system parameter
+        self.env["ir.config_parameter"].set_param(
+            "mikrotik_monitoring.rollup_retention_days.1m", 30
+        )
+        self.assertEqual(
+            Rollup._select_source(30, now - timedelta(days=45)), "mikrotik.metric.rollup.5m"
+        )
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+from unittest.mock import patch
+
+from odoo.tests import BaseCase, tagged
+
+from ..collector import base as base_module
+from ..collector import pool as pool_module
+from ..collector.api import (
+    DEFAULT_PORT, DEFAULT_SSL_PORT, RouterOSClient, RouterOSConnectionError, RouterOSError,
+    resolve_port,
+)
+from ..collector.base import MikroTikCollector
+from ..collector.pool import ConnectionPool, PoolBackoff
+
+
+class FakeClient:
+    """Stand-in for RouterOSClient: no network, records its lifecycle."""
+
+    fail = None
+    call_error = None
+    instances = []
+
+    def __init__(self, host, username, password, port=None, use_ssl=False, timeout=10):
+        self.host = host
+        self.password = password
+        self.port = resolve_port(port, use_ssl)
+        self.timeout = timeout
+        self.connected = False
+        self.closed = False
+        FakeClient.instances.append(self)
+
+    async def connect(self):
+        if FakeClient.fail is not None:
+            raise FakeClient.fail
+        self.connected = True
+        return True
+
+    async def call(self, command, attrs=None, queries=None):
+        if FakeClient.call_error is not None:
+            raise FakeClient.call_error
+        return [{"command": command}]
+
+    async def close(self):
+        self.connected = False
+        self.closed = True
+
+
+@tagged("post_install", "-at_install")
+class TestConnectionPool(BaseCase):
+
+    def setUp(self):
+        super().setUp()
+        FakeClient.fail = None
+        FakeClient.call_error = None
+        FakeClient.instances = []
+        patcher = patch.object(pool_module, "RouterOSClient", FakeClient)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _run(self, scenario):
+        """Run scenario(pool) on a fresh loop, then close the pool."""
+        async def main():
+            pool = ConnectionPool()
+            try:
+                return await scenario(pool)
+            finally:
+                await pool.close_all()
+                if pool._keepalive_task is not None:
+                    pool._keepalive_task.cancel()
+        return asyncio.run(main())
+
+    def test_reuse_connected_session(self):
+        async def scenario(pool):
+            first = await pool.acquire(1, "192.0.2.1", "admin", "secret")
+            second = await pool.acquire(1, "192.0.2.1", "admin", "secret", timeout=5)
+            return first, second
+        first, second = self._run(scenario)
+        self.assertIs(first, second)
+        self.assertEqual(second.timeout, 5)
+        self.assertEqual(len(FakeClient.instances), 1)
+
+    def test_default_port_shares_session(self):
+        async def scenario(pool):
+            first = await pool.acquire(1, "192.0.2.1", "admin", "secret")
+            second = await pool.acquire(1, "192.0.2.1", "admin", "secret", port=DEFAULT_PORT)
+            return first, second
+        first, second = self._run(scenario)
+        self.assertIs(first, second)
+
+    def test_changed_settings_replace_session(self):
+        async def scenario(pool):
+            old = await pool.acquire(1, "192.0.2.1", "admin", "secret")
+            new = await pool.acquire(1, "192.0.2.1", "admin", "changed")
+            return old, new, len(pool)
+        old, new, size = self._run(scenario)
+        self.assertIsNot(old, new)
+        self.assertTrue(old.closed)
+        self.assertEqual(new.password, "changed")
+        self.assertEqual(size, 1)
+
+    def test_failed_connect_backs_off(self):
+        FakeClient.fail = OSError("unreachable")
+
+        async def scenario(pool):
+            with self.assertRaises(OSError):
+                await pool.acquire(1, "192.0.2.1", "admin", "secret")
+            # Within the backoff: no new connection attempt
+            with self.assertRaises(PoolBackoff):
+                await pool.acquire(1, "192.0.2.1", "admin", "secret")
+            attempts = len(FakeClient.instances)
+            # Explicit user action skips the backoff
+            with self.assertRaises(OSError):
+                await pool.acquire(1, "192.0.2.1", "admin", "secret", retry_now=True)
+            return attempts, pool._sessions[1].failures
+        attempts, failures = self._run(scenario)
+        self.assertEqual(attempts, 1)
+        self.assertEqual(len(FakeClient.instances), 2)
+        self.assertEqual(failures, 2)
+
+    def test_backoff_delay_grows_and_is_capped(self):
+        session = pool_module._PooledSession(("192.0.2.1", DEFAULT_PORT, "admin", "", False))
+        error = OSError("unreachable")
+        pool = ConnectionPool()
+        with patch.object(pool_module.time, "monotonic", return_value=1000.0):
+            delays = []
+            for _attempt in range(12):
+                pool._fail(session, error)
+                delays.append(session.retry_at - 1000.0)
+        for failures, delay in enumerate(delays, start=1):
+            full = min(pool_module.BACKOFF_MAX, pool_module.BACKOFF_BASE * 2 ** (failures - 1))
+            # Equal jitter: between half and the full delay
+            self.assertGreaterEqual(delay, full / 2)
+            self.assertLessEqual(delay, full)
+        self.assertEqual(session.last_error, "unreachable")
+
+    def test_discard_established_session(self):
+        async def scenario(pool):
+            client = await pool.acquire(1, "192.0.2.1", "admin", "secret")
+            # Without an error (e.g. release after settings change): no backoff
+            await pool.discard(1)
+            again = await pool.acquire(1, "192.0.2.1", "admin", "secret")
+            await pool.discard(1, OSError("reset by peer"))
+            with self.assertRaises(PoolBackoff):
+                await pool.acquire(1, "192.0.2.1", "admin", "secret")
+            return client, again
+        client, again = self._run(scenario)
+        self.assertTrue(client.closed)
+        self.assertIsNot(client, again)
+        self.assertTrue(again.closed)
+
+    def test_invalidate_clears_backoff(self):
+        FakeClient.fail = OSError("unreachable")
+
+        async def scenario(pool):
+            with self.assertRaises(OSError):
+                await pool.acquire(1, "192.0.2.1", "admin", "secret")
+            await pool.invalidate(1)
+            FakeClient.fail = None
+            client = await pool.acquire(1, "192.0.2.1", "admin", "secret")
+            return client.connected
+        self.assertTrue(self._run(scenario))
+
+    def test_facade_keeps_session_on_trap(self):
+        collector = MikroTikCollector("192.0.2.1", "admin", "secret", device_id=1)
+
+        async def scenario(pool):
+            with patch.object(base_module, "get_pool", return_value=pool):
+                await collector._call("/system/identity/print")
+                FakeClient.call_error = RouterOSError("no such command")
+                with self.assertRaises(RouterOSError):
+                    await collector._call("/bogus/print")
+                return pool._sessions[1].client
+        client = self._run(scenario)
+        self.assertIs(client, FakeClient.instances[0])
+        self.assertEqual(len(FakeClient.instances), 1)
+
+    def test_facade_discards_session_on_transport_error(self):
+        collector = MikroTikCollector("192.0.2.1", "admin", "secret", device_id=1)
+
+        async def scenario(pool):
+            with patch.object(base_module, "get_pool", return_value=pool):
+                await collector._call("/system/identity/print")
+                FakeClient.call_error = RouterOSConnectionError("fatal")
+                with self.assertRaises(RouterOSConnectionError):
+                    await collector._call("/system/identity/print")
+                return pool._sessions[1].client
+        self.assertIsNone(self._run(scenario))
+        self.assertTrue(FakeClient.instances[0].closed)
+
+    def test_facade_host_key_uses_resolved_port(self):
+        plain = MikroTikCollector("192.0.2.1", "admin", "secret", port=0)
+        self.assertEqual(plain.key, ("host", "192.0.2.1", DEFAULT_PORT, "admin"))
+        self.assertEqual(
+            plain.key, MikroTikCollector("192.0.2.1", "admin", "secret", port=DEFAULT_PORT).key,
+        )
+        tls = MikroTikCollector("192.0.2.1", "admin", "secret", use_ssl=True)
+        self.assertEqual(tls.key, ("host", "192.0.2.1", DEFAULT_SSL_PORT, "admin"))
+
+
+class _OpenWriter:
+    def is_closing(self):
+        return False
+
+
+@tagged("post_install", "-at_install")
+class TestRouterOSClient(BaseCase):
+
+    def test_talk_checks_connection_under_lock(self):
+        async def scenario():
+            client = RouterOSClient("192.0.2.1", "admin", "secret")
+            client._writer = _OpenWriter()
+            await client._lock.acquire()
+            waiting = asyncio.ensure_future(client._talk(["/system/identity/print"]))
+            await asyncio.sleep(0)
+            # Session closed by the call holding the lock
+            client._writer = None
+            client._lock.release()
+            with self.assertRaises(RouterOSConnectionError):
+                await waiting
+        asyncio.run(scenario())
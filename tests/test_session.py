@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+from datetime import datetime, timedelta
+
+from odoo import fields
+from odoo.tests import TransactionCase, tagged
+
+from ..models.mikrotik_session import MikrotikSession
+
+
+@tagged("post_install", "-at_install")
+class TestSessionHelpers(TransactionCase):
+
+    def test_parse_uptime(self):
+        cases = {
+            "": 0,
+            "45s": 45,
+            "3m10s": 190,
+            "1w2d3h4m5s": 604800 + 2 * 86400 + 3 * 3600 + 4 * 60 + 5,
+            "2h500ms": 7200,
+            "01:02:03": 3723,
+            "1d01:00:00": 86400 + 3600,
+        }
+        for value, seconds in cases.items():
+            with self.subTest(uptime=value):
+                self.assertEqual(MikrotikSession._parse_uptime(value), seconds)
+
+    def test_counter_delta(self):
+        self.assertEqual(MikrotikSession._counter_delta(1000, 1500), 500)
+        self.assertEqual(MikrotikSession._counter_delta(None, 1500), 1500)
+        # Counter went backwards: reset after reconnect
+        self.assertEqual(MikrotikSession._counter_delta(1000, 300), 300)
+        # Reconnected and already past the old counter
+        self.assertEqual(MikrotikSession._counter_delta(1000, 1500, restarted=True), 1500)
+
+    def test_session_restarted(self):
+        last_seen = datetime(2024, 5, 1, 10, 0)
+        # Started after the poll that last saw it: reconnected
+        self.assertTrue(MikrotikSession._session_restarted(last_seen, last_seen + timedelta(seconds=30)))
+        # Rounding of whole-second uptimes
+        self.assertFalse(MikrotikSession._session_restarted(last_seen, last_seen + timedelta(seconds=1)))
+        # Start drifting backwards is never a restart
+        self.assertFalse(MikrotikSession._session_restarted(last_seen, last_seen - timedelta(hours=1)))
+        self.assertFalse(MikrotikSession._session_restarted(last_seen, None))
+
+
+@tagged("post_install", "-at_install")
+class TestSessionSync(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.device = cls.env["mikrotik.device"].create({
+            "name": "Test Router",
+            "device_uid": "test-session-sync",
+            "host": "192.0.2.1",
+        })
+        cls.Session = cls.env["mikrotik.session"]
+
+    def _sync(self, uptime, bytes_in, ts=None):
+        return self.Session.sync_sessions(self.device.id, "pppoe", [{
+            "name": "alice",
+            "address": "10.0.0.2",
+            "uptime": uptime,
+            "bytes-in": str(bytes_in),
+            "bytes-out": "0",
+        }], ts=ts)
+
+    def _usage_in(self):
+        self.env.invalidate_all()
+        usage = self.env["mikrotik.session.usage"].search([
+            ("device_id", "=", self.device.id),
+            ("name", "=", "alice"),
+            ("period", "=", "day"),
+        ])
+        return sum(usage.mapped("bytes_in"))
+
+    def _session(self):
+        self.env.invalidate_all()
+        return self.Session.search([("device_id", "=", self.device.id), ("name", "=", "alice")])
+
+    def test_sync_accounting(self):
+        polled = fields.Datetime.now().replace(microsecond=0) - timedelta(minutes=1)
+        self.assertEqual(self._sync("1h", 1000, ts=polled)["created"], 1)
+        self.assertEqual(self._usage_in(), 1000)
+        session = self._session()
+        self.assertEqual(session.started_at, polled - timedelta(hours=1))
+        self.assertAlmostEqual(session.uptime, 3660, delta=5)
+
+        # Same session, counters moved: no field change, only accounting
+        summary = self._sync("1h10s", 2500, ts=polled + timedelta(seconds=10))
+        self.assertEqual((summary["updated"], summary["counters"]), (0, 1))
+        self.assertEqual(self._usage_in(), 2500)
+
+        # Nothing moved
+        summary = self._sync("1h20s", 2500, ts=polled + timedelta(seconds=20))
+        self.assertEqual((summary["updated"], summary["counters"], summary["unchanged"]), (0, 0, 1))
+
+        # Changed attribute
+        self.Session.sync_sessions(self.device.id, "pppoe", [{
+            "name": "alice", "address": "10.0.0.9", "uptime": "1h30s",
+            "bytes-in": "2500", "bytes-out": "0",
+        }], ts=polled + timedelta(seconds=30))
+        self.assertEqual(self._session().address, "10.0.0.9")
+
+        # Gone from the router
+        self.assertEqual(self.Session.sync_sessions(self.device.id, "pppoe", [])["deactivated"], 1)
+        self.assertFalse(self._session().is_active)
+
+    def test_delayed_ingest_is_not_a_restart(self):
+        # Second poll 5s after the first, processed 15s after it was taken
+        polled = fields.Datetime.now().replace(microsecond=0) - timedelta(seconds=15)
+        self._sync("1h", 1000, ts=polled - timedelta(seconds=5))
+        summary = self._sync("1h5s", 1500, ts=polled)
+        self.assertEqual((summary["updated"], summary["counters"]), (0, 1))
+        # Incremental delta, not the whole counter again
+        self.assertEqual(self._usage_in(), 1500)
+        self.assertEqual(self._session().started_at, polled - timedelta(hours=1, seconds=5))
+
+    def test_reconnect_counts_full_counter(self):
+        polled = fields.Datetime.now().replace(microsecond=0) - timedelta(minutes=1)
+        self._sync("1h", 1000, ts=polled)
+        # Reconnected 3s after the previous poll, already past the old counter
+        summary = self._sync("7s", 4000, ts=polled + timedelta(seconds=10))
+        self.assertEqual(summary["updated"], 1)
+        self.assertEqual(self._usage_in(), 5000)
+        session = self._session()
+        self.assertEqual(len(session), 1)
+        self.assertEqual(session.started_at, polled + timedelta(seconds=3))
+        self.assertEqual(session.bytes_in, 4000)
+
+    def test_counter_reset_without_uptime(self):
+        polled = fields.Datetime.now().replace(microsecond=0) - timedelta(minutes=1)
+        self._sync("", 1000, ts=polled)
+        self._sync("", 200, ts=polled + timedelta(seconds=5))
+        self.assertEqual(self._usage_in(), 1200)